@@ -20,6 +20,10 @@ from ggrc.services.common import Resource
 from ggrc.utils import benchmark, with_nop
 
 
+# Number of relationships whose neighbourhoods are loaded with one query
+BATCH_CHUNK_SIZE = 500
+
+
 class Stub(collections.namedtuple("Stub", ["type", "id"])):
 
   @classmethod
@@ -50,6 +54,11 @@ class AutomapperGenerator(object):
     # results in a few steps. This drastically reduces number of queries.
     stubs = {s for rel in self.queue for s in rel}
     stubs.add(obj)
+    self._load_related(stubs)
+    return self.cache[obj]
+
+  def _load_related(self, stubs):
+    """Load the complete neighbourhoods of all stubs into the cache."""
     # Union is here to convince mysql to use two separate indices and
     # merge te results. Just using `or` results in a full-table scan
     # Manual column list avoids loading the full object which would also try to
@@ -68,6 +77,8 @@ class AutomapperGenerator(object):
                        [(s.type, s.id) for s in stubs]))
     ).all()
     batch_requests = collections.defaultdict(set)
+    for stub in stubs:
+      self.cache.setdefault(stub, set())
     for (src_type, src_id, dst_type, dst_id) in relationships:
       src = Stub(src_type, src_id)
       dst = Stub(dst_type, dst_id)
@@ -85,7 +96,6 @@ class AutomapperGenerator(object):
       instances = model.query.filter(model.id.in_(ids))
       for instance in instances:
         self.instance_cache[Stub(type_, instance.id)] = instance
-    return self.cache[obj]
 
   def relate(self, src, dst):
     if src < dst:
@@ -130,6 +140,24 @@ class AutomapperGenerator(object):
             'automapping_limit_exceeded': True
         }
 
+  def generate_automappings_batch(self, relationships):
+    """Generate automappings for many relationships.
+
+    Neighbourhoods of all relationship endpoints are loaded with a query per
+    chunk of relationships instead of a query per relationship.
+    """
+    relationships = list(relationships)
+    for start in xrange(0, len(relationships), BATCH_CHUNK_SIZE):
+      chunk = relationships[start:start + BATCH_CHUNK_SIZE]
+      stubs = {stub for rel in chunk
+               for stub in (Stub.from_source(rel), Stub.from_destination(rel))
+               if stub not in self.cache}
+      if stubs:
+        with self.benchmark("Automapping load related"):
+          self._load_related(stubs)
+      for relationship in chunk:
+        self.generate_automappings(relationship)
+
   def _can_map_to(self, obj, parent_relationship):
     return is_allowed_update(obj.type, obj.id, parent_relationship.context)
 
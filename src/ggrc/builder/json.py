@@ -5,6 +5,8 @@
 
 from datetime import datetime
 
+from flask import g
+from flask import has_app_context
 from sqlalchemy.ext.associationproxy import AssociationProxy
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm.properties import RelationshipProperty
@@ -13,6 +15,7 @@ import iso8601
 import sqlalchemy
 
 from ggrc import db
+from ggrc import settings
 from ggrc.login import get_current_user_id
 from ggrc.models.reflection import AttributeInfo
 from ggrc.models.types import JsonType
@@ -436,6 +439,13 @@ class LazyStubRepresentation(object):
     self.conditions = conditions
     self.condition_key, self.condition_val = zip(*sorted(conditions.items()))
 
+  @property
+  def cache_key(self):
+    """Stub cache key, None for stubs that are not looked up by id."""
+    if self.condition_key != ('id',):
+      return None
+    return get_stub_cache_key(self.type, self.condition_val[0])
+
   def get_matches(self, results):
     return results\
         .get(self.type, {})\
@@ -475,27 +485,110 @@ def walk_representation(obj):  # noqa
         yield v, i, obj
 
 
-def gather_queries(resource):
-  queries = []
-  for val, key, obj in walk_representation(resource):
-    if isinstance(val, LazyStubRepresentation):
-      queries.append((val.type, val.conditions))
-  return queries
+STUB_CACHE_TIMEOUT = 600
 
 
-def reify_representation(resource, results, type_columns):
-  for val, key, obj in walk_representation(resource):
-    if isinstance(val, LazyStubRepresentation):
-      obj[key] = val.render(results, type_columns)
-  return resource
+def get_stub_cache_key(type, id):
+  return 'stub:{}:{}'.format(type, id)
+
+
+def get_stub_cache_keys(obj):
+  """Get the stub cache keys of a model instance.
+
+  Stubs of polymorphic models can be requested by the base type as well.
+  """
+  types = {obj.__class__.__name__,
+           obj._sa_class_manager.mapper.base_mapper.class_.__name__}
+  return [get_stub_cache_key(type, obj.id) for type in types]
+
+
+def _get_local_stub_cache():
+  if not has_app_context():
+    return {}
+  if not hasattr(g, '_stub_cache'):
+    g._stub_cache = {}
+  return g._stub_cache
+
+
+def _get_stub_memcache():
+  if not getattr(settings, 'MEMCACHE_MECHANISM', False):
+    return None
+  from ggrc.services.common import _get_cache_manager
+  return _get_cache_manager().cache_object.memcache_client
+
+
+def get_cached_stubs(keys):
+  """Get the cached stubs from the request cache and from memcache.
+
+  Returns:
+    A tuple of the cached stubs and the invalidation generation read before
+    them, to be passed to cache_stubs.
+  """
+  from ggrc.cache import representation_cache
+  local_cache = _get_local_stub_cache()
+  stubs = {key: local_cache[key] for key in keys if key in local_cache}
+  missing = [key for key in keys if key not in stubs]
+  memcache = _get_stub_memcache() if missing else None
+  generation = None
+  if memcache is not None:
+    generation = representation_cache.get_generation(memcache)
+    shared_stubs = memcache.get_multi(missing)
+    local_cache.update(shared_stubs)
+    stubs.update(shared_stubs)
+  return stubs, generation
+
+
+def cache_stubs(stubs, generation):
+  """Store rendered stubs in the request cache and in memcache.
+
+  Stubs are only added to memcache if no invalidation was broadcast since
+  they were looked up, and only if no commit that deletes them is in
+  progress, so stale stubs rendered before a commit are not written back.
+  """
+  from ggrc.cache import representation_cache
+  _get_local_stub_cache().update(stubs)
+  memcache = _get_stub_memcache()
+  if memcache is None or not stubs or generation is None:
+    return
+  blockers = memcache.get_multi(
+      ['DeleteOp:{}'.format(key) for key in stubs])
+  if representation_cache.get_generation(memcache) != generation:
+    return
+  memcache.add_multi({key: stub for key, stub in stubs.items()
+                      if 'DeleteOp:{}'.format(key) not in blockers},
+                     STUB_CACHE_TIMEOUT)
+
+
+def invalidate_stubs(objects):
+  """Drop the stubs of modified objects from the request cache.
+
+  Returns:
+    The stub cache keys of the objects, to be removed from memcache.
+  """
+  local_cache = _get_local_stub_cache()
+  keys = []
+  for obj in objects:
+    if getattr(obj, 'id', None) is None:
+      continue
+    for key in get_stub_cache_keys(obj):
+      local_cache.pop(key, None)
+      keys.append(key)
+  return keys
 
 
 def publish_representation(resource):
-  queries = gather_queries(resource)
+  lazy_stubs = [val for val, _, _ in walk_representation(resource)
+                if isinstance(val, LazyStubRepresentation)]
 
-  if len(queries) == 0:
+  if len(lazy_stubs) == 0:
     return resource
-  else:
+
+  cache_keys = set(stub.cache_key for stub in lazy_stubs) - {None}
+  cached, generation = get_cached_stubs(cache_keys)
+  queries = [(stub.type, stub.conditions) for stub in lazy_stubs
+             if stub.cache_key not in cached]
+  results, type_columns = {}, {}
+  if queries:
     results, type_columns, query = build_stub_union_query(queries)
     rows = query.all()
     for row in rows:
@@ -505,7 +598,18 @@ def publish_representation(resource):
         if vals in matches:
           matches[vals].append(row)
 
-    return reify_representation(resource, results, type_columns)
+  new_stubs = {}
+  for val, key, obj in walk_representation(resource):
+    if not isinstance(val, LazyStubRepresentation):
+      continue
+    if val.cache_key in cached:
+      obj[key] = dict(cached[val.cache_key])
+      continue
+    obj[key] = val.render(results, type_columns)
+    if val.cache_key is not None and obj[key] is not None:
+      new_stubs[val.cache_key] = dict(obj[key])
+  cache_stubs(new_stubs, generation)
+  return resource
 
 
 class Builder(AttributeInfo):
@@ -0,0 +1,214 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Process local tier of the object representation cache.
+
+Published object representations are kept in a bounded LRU in front of
+memcache. Every process keeps its own copy, so invalidations are broadcast
+through memcache: each commit that marks cache keys for deletion increments a
+generation counter and stores the invalidated keys under that generation.
+Before a lookup, a process applies the invalidations of all generations it
+has not seen yet and flushes the whole tier if any of them are missing.
+"""
+
+import cPickle
+import threading
+import time
+from collections import OrderedDict
+
+
+GENERATION_KEY = 'representations:generation'
+INVALIDATED_KEY = 'representations:invalidated:{}'
+STATS_KEY = 'representations:stats:{}'
+STATS = ('local_hits', 'local_misses', 'memcache_hits', 'memcache_misses',
+         'flushes')
+# Processes lagging more generations behind flush instead of catching up
+MAX_GENERATION_LAG = 100
+
+
+class RepresentationCache(object):
+  """Size and TTL bounded LRU of object representations.
+
+  Entries are stored pickled, so callers get their own copy of a
+  representation, the same as with memcache.
+
+  Attributes:
+    max_size: the maximum number of entries.
+    ttl: seconds after which an entry expires. Invalidation logs are kept in
+        memcache for the same time, so a process that missed a log can not
+        hold any entry it would have invalidated.
+    generation: the last invalidation generation applied to the entries.
+  """
+
+  def __init__(self, max_size, ttl):
+    self.max_size = max_size
+    self.ttl = ttl
+    self.generation = None
+    self.entries = OrderedDict()
+    self.lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.entries)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+
+  def get_multi(self, keys):
+    """Get the unexpired entries for keys and mark them as recently used.
+
+    Returns:
+      A dict with the representations of the cached keys.
+    """
+    result = {}
+    now = time.time()
+    with self.lock:
+      for key in keys:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+          continue
+        expires, value = entry
+        if expires < now:
+          continue
+        self.entries[key] = entry
+        result[key] = value
+    return {key: cPickle.loads(value) for key, value in result.items()}
+
+  def set_multi(self, mapping, generation):
+    """Store representations read while at the given generation.
+
+    Representations read before an invalidation this process has already
+    applied might be stale, so they are not stored.
+    """
+    values = {key: cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+              for key, value in mapping.items()}
+    expires = time.time() + self.ttl
+    with self.lock:
+      if generation is None or generation != self.generation:
+        return
+      for key, value in values.items():
+        self.entries.pop(key, None)
+        self.entries[key] = (expires, value)
+      while len(self.entries) > self.max_size:
+        self.entries.popitem(last=False)
+
+  def delete_multi(self, keys):
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def sync(self, memcache_client):
+    """Apply the invalidations broadcast by other processes.
+
+    Returns:
+      The generation the entries are valid for, to be passed to set_multi.
+    """
+    generation = get_generation(memcache_client)
+    if generation is None:
+      return None
+    current = self.generation
+    if current == generation:
+      return generation
+    keys = None
+    if current is not None and 0 < generation - current <= MAX_GENERATION_LAG:
+      log_keys = [INVALIDATED_KEY.format(i)
+                  for i in range(current + 1, generation + 1)]
+      logs = memcache_client.get_multi(log_keys)
+      if len(logs) == len(log_keys):
+        keys = set().union(*logs.values())
+    with self.lock:
+      if self.generation != current:
+        # Another thread has applied the invalidations in the meantime
+        return self.generation if self.generation == generation else None
+      if keys is None:
+        self.entries.clear()
+        if current is not None:
+          count_events(memcache_client, {'flushes': 1})
+      else:
+        for key in keys:
+          self.entries.pop(key, None)
+      self.generation = generation
+    return generation
+
+  def invalidate(self, memcache_client, keys):
+    """Remove keys locally and broadcast them to all other processes."""
+    keys = list(keys)
+    self.delete_multi(keys)
+    generation = memcache_client.incr(GENERATION_KEY,
+                                      initial_value=_initial_generation())
+    if generation is None:
+      # Without a counter the other processes flush on their next sync
+      return
+    memcache_client.set(INVALIDATED_KEY.format(generation), keys,
+                        time=self.ttl)
+
+
+def _initial_generation():
+  return int(time.time() * 1000)
+
+
+def get_generation(memcache_client):
+  """Get the current invalidation generation.
+
+  Returns:
+    The generation, or None if memcache is not available.
+  """
+  generation = memcache_client.get(GENERATION_KEY)
+  if generation is None:
+    # The counter was evicted, so it restarts far away from any generation
+    # a process could have seen and all processes flush
+    memcache_client.add(GENERATION_KEY, _initial_generation())
+    generation = memcache_client.get(GENERATION_KEY)
+    if generation is None:
+      return None
+  return int(generation)
+
+
+def count_events(memcache_client, deltas):
+  """Increment representation cache statistics counters in memcache.
+
+  Args:
+    memcache_client: the memcache client.
+    deltas: a dict with the increment of each counter in STATS.
+  """
+  deltas = {STATS_KEY.format(event): delta
+            for event, delta in deltas.items() if delta}
+  if deltas:
+    memcache_client.offset_multi(deltas, initial_value=0)
+
+
+def get_stats(memcache_client):
+  """Get the representation cache counters and the hit ratio of each tier.
+
+  Returns:
+    A dict with a value for each counter in STATS, the 'local_hit_ratio' and
+    'memcache_hit_ratio' of lookups in each tier and the number of
+    'local_entries' of this process.
+  """
+  keys = [STATS_KEY.format(event) for event in STATS]
+  counters = memcache_client.get_multi(keys)
+  stats = {event: int(counters.get(key, 0))
+           for event, key in zip(STATS, keys)}
+  for tier in ('local', 'memcache'):
+    hits = stats['{}_hits'.format(tier)]
+    lookups = hits + stats['{}_misses'.format(tier)]
+    stats['{}_hit_ratio'.format(tier)] = (float(hits) / lookups
+                                          if lookups else None)
+  stats['local_entries'] = len(get_representation_cache())
+  return stats
+
+
+_representation_cache = None
+
+
+def get_representation_cache():
+  """Get the representation cache of this process."""
+  global _representation_cache  # pylint: disable=global-statement
+  if _representation_cache is None:
+    from ggrc import settings
+    _representation_cache = RepresentationCache(
+        settings.REPRESENTATION_CACHE_SIZE,
+        settings.REPRESENTATION_CACHE_TTL)
+  return _representation_cache
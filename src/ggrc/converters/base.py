@@ -5,15 +5,30 @@
 
 from collections import defaultdict
 
+from sqlalchemy.orm.attributes import QueryableAttribute
+
+from ggrc import db
 from ggrc import settings
 from ggrc.cache.memcache import MemCache
 from ggrc.converters import get_exportables
+from ggrc.converters import validation
 from ggrc.converters.base_block import BlockConverter
 from ggrc.converters.import_helper import extract_relevant_data
 from ggrc.converters.import_helper import split_array
 from ggrc.fulltext import get_indexer
 
 
+# Number of key values resolved with a single IN query
+PREFETCH_CHUNK_SIZE = 1000
+
+
+def _index_key(value):
+  """Key values are compared case insensitively, like the database does."""
+  if isinstance(value, basestring):
+    return value.strip().lower()
+  return value
+
+
 class Converter(object):
 
   class_order = [
@@ -44,8 +59,12 @@ class Converter(object):
     self.dry_run = kwargs.get("dry_run", True)
     self.csv_data = kwargs.get("csv_data", [])
     self.ids_by_type = kwargs.get("ids_by_type", [])
+    self.task = kwargs.get("task")
+    self.progress = kwargs.get("progress") or {}
     self.block_converters = []
     self.new_objects = defaultdict(dict)
+    self.object_index = defaultdict(dict)
+    self.unique_index = defaultdict(dict)
     self.shared_state = {}
     self.response_data = []
     self.exportable = get_exportables()
@@ -53,34 +72,119 @@ class Converter(object):
 
   def to_array(self):
     self.block_converters_from_ids()
-    self.handle_row_data()
-    return self.to_block_array()
+    return list(self.to_block_rows())
 
-  def to_block_array(self):
+  def to_block_rows(self):
     """ exporting each in it's own block separated by empty lines
 
-    Generate 2d array where each cell represents a cell in a csv file
+    Generate rows of a 2d array where each cell represents a cell in a csv
+    file. Rows are generated one at a time, so that the export can be
+    streamed without holding all exported objects in memory.
     """
-    csv_data = []
     for block_converter in self.block_converters:
-      csv_header, csv_body = block_converter.to_array()
       # multi block csv must have first column empty
-      two_empty_lines = [[], []]
-      block_data = csv_header + csv_body + two_empty_lines
-      [line.insert(0, "") for line in block_data]
-      block_data[0][0] = "Object type"
-      block_data[1][0] = block_converter.name
-      csv_data.extend(block_data)
-    return csv_data
+      csv_header = block_converter.generate_csv_header()
+      csv_header[0].insert(0, "Object type")
+      csv_header[1].insert(0, block_converter.name)
+      for line in csv_header:
+        yield line
+      for line in block_converter.generate_csv_body():
+        yield [""] + line
+      for _ in range(2):
+        yield [""]
+
+  def get_csv_width(self):
+    """ Get the number of columns in the widest exported block """
+    if not self.block_converters:
+      return 0
+    return max(len(b.fields) for b in self.block_converters) + 1
 
   def import_csv(self):
     self.block_converters_from_csv()
-    self.row_converters_from_csv()
-    self.handle_priority_columns()
-    self.import_objects()
-    self.import_secondary_objects()
+    if validation.use_parallel_validation(self):
+      validation.validate(self)
+    else:
+      self.row_converters_from_csv()
+      self.prefetch_objects(self.priority_columns)
+      self.handle_priority_columns()
+      self.import_objects()
+      self.import_secondary_objects()
     self.drop_cache()
 
+  def prefetch_objects(self, field_list=None):
+    for block_converter in self.block_converters:
+      block_converter.prefetch_objects(field_list)
+
+  def prefetch_by_key(self, object_class, key, values):
+    """Load all objects with the given key values into the object index.
+
+    Values that do not match any object are stored in the index as None, so
+    that looking them up does not hit the database again.
+
+    Args:
+      object_class (db.Model): class of the objects to load.
+      key (str): name of the key attribute, such as "slug" or "email".
+      values (iterable): key values to load.
+    """
+    attr = getattr(object_class, key, None)
+    if attr is None:
+      return
+    index = self.object_index[(object_class, key)]
+    values = list(values)
+    for value in values:
+      index[_index_key(value)] = None
+    for start in xrange(0, len(values), PREFETCH_CHUNK_SIZE):
+      chunk = values[start:start + PREFETCH_CHUNK_SIZE]
+      for obj in object_class.query.filter(attr.in_(chunk)):
+        index[_index_key(getattr(obj, key))] = obj
+
+  def find_object(self, object_class, key, value):
+    """Get an existing object by its key value.
+
+    Prefetched values are answered from the object index, all others are
+    queried from the database.
+    """
+    index = self.object_index.get((object_class, key), {})
+    index_key = _index_key(value)
+    if index_key in index:
+      return index[index_key]
+    return object_class.query.filter_by(**{key: value}).first()
+
+  def prefetch_unique_values(self, object_class, key, values):
+    """Load ids of all objects that have any of the given unique values.
+
+    Args:
+      object_class (db.Model): class of the imported objects.
+      key (str): name of the unique attribute, such as "title".
+      values (iterable): values of the unique column in the imported rows.
+    """
+    attr = getattr(object_class, key, None)
+    if not isinstance(attr, QueryableAttribute):
+      return
+    index = self.unique_index[(object_class, key)]
+    values = list(values)
+    for value in values:
+      index[_index_key(value)] = set()
+    for start in xrange(0, len(values), PREFETCH_CHUNK_SIZE):
+      chunk = values[start:start + PREFETCH_CHUNK_SIZE]
+      query = db.session.query(attr, object_class.id).filter(attr.in_(chunk))
+      for value, id_ in query:
+        index.setdefault(_index_key(value), set()).add(id_)
+
+  def find_unique_ids(self, object_class, key, value):
+    """Get ids of existing objects with the given unique value.
+
+    Prefetched values are answered from the unique index, all others are
+    queried from the database.
+    """
+    index = self.unique_index.get((object_class, key), {})
+    index_key = _index_key(value)
+    if index_key in index:
+      return index[index_key]
+    query = db.session.query(object_class.id).filter(
+        getattr(object_class, key) == value)
+    return set(id_ for id_, in query)
+
   def handle_priority_columns(self):
     for attr_name in self.priority_columns:
       for block_converter in self.block_converters:
@@ -108,7 +212,6 @@ class Converter(object):
       block_converter = BlockConverter(self, object_class=object_class,
                                        fields=fields, object_ids=object_ids,
                                        class_name=class_name)
-      block_converter.row_converters_from_ids()
       self.block_converters.append(block_converter)
 
   def block_converters_from_csv(self):
@@ -134,11 +237,16 @@ class Converter(object):
 
   def import_objects(self):
     for converter in self.block_converters:
+      converter.prefetch_objects()
       converter.handle_row_data()
       converter.import_objects()
 
   def import_secondary_objects(self):
     for converter in self.block_converters:
+      if not self.dry_run:
+        # objects created by the import are now in the database and all
+        # prefetched objects have been expired by the commits
+        converter.prefetch_objects()
       converter.import_secondary_objects(self.new_objects)
 
   def get_info(self):
@@ -146,6 +254,53 @@ class Converter(object):
       self.response_data.append(converter.get_info())
     return self.response_data
 
+  def get_committed_rows(self, block_converter):
+    """Get states of block rows committed by an earlier run of the task.
+
+    Returns:
+      dict with the committed state of every row index.
+    """
+    committed = self.progress.get("committed", {})
+    return committed.get(block_converter.offset, {})
+
+  def add_committed_rows(self, block_converter, states):
+    """Record the states of rows that are committed with the progress."""
+    committed = self.progress.setdefault("committed", {})
+    committed.setdefault(block_converter.offset, {}).update(states)
+    self.save_progress()
+
+  def remove_committed_rows(self, block_converter, states):
+    """Forget rows whose commit failed, so a restarted task retries them."""
+    committed = self.get_committed_rows(block_converter)
+    for index in states:
+      committed.pop(index, None)
+
+  def is_block_mapped(self, block_converter):
+    """Check if secondary objects of the block have been committed."""
+    return block_converter.offset in self.progress.get("mapped", set())
+
+  def set_block_mapped(self, block_converter, mapped=True):
+    mapped_blocks = self.progress.setdefault("mapped", set())
+    if mapped:
+      mapped_blocks.add(block_converter.offset)
+      self.save_progress()
+    else:
+      mapped_blocks.discard(block_converter.offset)
+
+  def save_progress(self):
+    """Store the import progress on the task, if the import runs as one.
+
+    Blocks are identified by their offset in the file, which does not change
+    when a task is restarted with the same file.
+    """
+    if self.task is None:
+      return
+    committed = self.progress.get("committed", {})
+    self.progress["rows"] = sum(len(b.rows) for b in self.block_converters)
+    self.progress["processed"] = sum(len(rows) for rows in committed.values())
+    self.progress["info"] = [b.get_info() for b in self.block_converters]
+    self.task.set_progress(self.progress)
+
   def get_object_names(self):
     return [c.object_class.__name__ for c in self.block_converters]
 
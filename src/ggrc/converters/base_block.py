@@ -7,14 +7,20 @@ from collections import defaultdict
 from collections import OrderedDict
 from collections import Counter
 from flask import current_app
+from sqlalchemy.sql.expression import tuple_
 
+import ggrc.services
 from ggrc import db
+from ggrc.automapper import AutomapperGenerator
+from ggrc.automapper import Stub
 from ggrc.converters import errors
 from ggrc.converters import get_shared_unique_rules
 from ggrc.converters.base_row import RowConverter
 from ggrc.converters.import_helper import get_column_order
 from ggrc.converters.import_helper import get_object_column_definitions
-from ggrc.rbac import permissions
+from ggrc.login import get_current_user
+from ggrc.models import Relationship
+from ggrc.services.common import Resource
 from ggrc.services.common import get_modified_objects
 from ggrc.services.common import update_index
 from ggrc.services.common import update_memcache_after_commit
@@ -23,6 +29,20 @@ from ggrc.services.common import update_memcache_before_commit
 
 CACHE_EXPIRY_IMPORT = 600
 
+# Number of objects loaded with a single query during export
+EXPORT_CHUNK_SIZE = 500
+
+# Number of object pairs checked or mapped with a single query
+MAPPING_CHUNK_SIZE = 500
+
+# Number of rows inserted and committed together during import
+IMPORT_CHUNK_SIZE = 500
+
+
+def _get_pair_key(obj1, obj2):
+  """Key of a pair of mapped objects that ignores the mapping direction."""
+  return tuple(sorted([Stub(obj1.type, obj1.id), Stub(obj2.type, obj2.id)]))
+
 
 class BlockConverter(object):
 
@@ -39,6 +59,10 @@ class BlockConverter(object):
     rows (list of list of str): 2D array containg csv data
     row_converters (list of RowConverter): list of row convertor objects with
       data from the coresponding row in rows attribute
+    mappings (list of tuples): (object, mapped object, unmap) entries
+      collected from mapping columns of all rows
+    export_values (dict): exported values of the current chunk of objects
+      by field and object id, for fields that are exported in bulk
     object_headers (dict): A dictionary containing object headers
     headers (dict): A dictionary containing csv headers with additional
       information. Keys are object attributes such as "title", "slug"...
@@ -78,6 +102,8 @@ class BlockConverter(object):
     self.row_errors = []
     self.row_warnings = []
     self.row_converters = []
+    self.mappings = []
+    self.export_values = {}
     self.ignore = False
     if not self.object_class:
       class_name = options.get("class_name", "")
@@ -119,13 +145,10 @@ class BlockConverter(object):
     return map(list, zip(*headers))
 
   def generate_csv_body(self):
-    """ Generate 2D array populated with object values """
-    return [r.to_array(self.fields) for r in self.row_converters]
-
-  def to_array(self):
-    csv_header = self.generate_csv_header()
-    csv_body = self.generate_csv_body()
-    return csv_header, csv_body
+    """ Generate rows populated with object values """
+    for row_converter in self.row_converters_from_ids():
+      row_converter.handle_row_data()
+      yield row_converter.to_array(self.fields)
 
   def get_header_names(self):
     """ Get all posible user column names for current object """
@@ -173,25 +196,90 @@ class BlockConverter(object):
     if self.ignore:
       return
     self.row_converters = []
+    committed = self.converter.get_committed_rows(self)
     for i, row in enumerate(self.rows):
       row = RowConverter(self, self.object_class, row=row,
-                         headers=self.headers, index=i)
+                         headers=self.headers, index=i,
+                         committed=committed.get(i))
       self.row_converters.append(row)
 
   def row_converters_from_ids(self):
-    """ Generate a row converter object for every csv row """
+    """ Generate a row converter object for every exported object
+
+    Objects are eagerly loaded in chunks of ascending ids and the row
+    converters are not stored, so only one chunk of objects is held in memory
+    at a time. Object ids come from the query helper, which only returns ids
+    of readable objects.
+    """
     if self.ignore or not self.object_ids:
       return
-    self.row_converters = []
-    objects = self.object_class.query.filter(
-        self.object_class.id.in_(self.object_ids)).all()
-    # TODO: this needs to be moved to query_helper, but it's here for now,
-    # so we don't have to fetch same objects twice from the database.
-    objects = [o for o in objects if permissions.is_allowed_read_for(o)]
-    for i, obj in enumerate(objects):
-      row = RowConverter(self, self.object_class, obj=obj,
-                         headers=self.headers, index=i)
-      self.row_converters.append(row)
+    ids = sorted(set(self.object_ids))
+    query = self.object_class.eager_query().options(
+        *self.get_export_options())
+    index = 0
+    for start in xrange(0, len(ids), EXPORT_CHUNK_SIZE):
+      objects = query.filter(
+          self.object_class.id.in_(ids[start:start + EXPORT_CHUNK_SIZE])
+      ).order_by(self.object_class.id).all()
+      self.export_values = self.get_export_values([o.id for o in objects])
+      for obj in objects:
+        yield RowConverter(self, self.object_class, obj=obj,
+                           headers=self.headers, index=index)
+        index += 1
+
+  def prefetch_objects(self, field_list=None):
+    """Load all objects that the column handlers will look up by key.
+
+    Lookups of all rows are collected per class and key, so that each of them
+    is resolved with a few IN queries instead of a query per cell. Existing
+    values of unique columns are loaded the same way, once per column.
+
+    Args:
+      field_list (list of strings): list of fields whose lookups should be
+        prefetched. All fields are used if this is not set.
+    """
+    if self.ignore:
+      return
+    lookups = defaultdict(set)
+    for index, (attr_name, header) in enumerate(self.headers.items()):
+      if field_list is not None and attr_name not in field_list:
+        continue
+      raw_values = [row[index] for row in self.rows if len(row) > index]
+      prefetch_lookups = header["handler"].get_prefetch_lookups(
+          self.object_class, raw_values, **header)
+      for object_class, key, values in prefetch_lookups:
+        lookups[(object_class, key)].update(values)
+      if header.get("unique"):
+        unique_values = set(value.strip() for value in raw_values)
+        unique_values.discard("")
+        self.converter.prefetch_unique_values(
+            self.object_class, attr_name, unique_values)
+    for (object_class, key), values in lookups.items():
+      self.converter.prefetch_by_key(object_class, key, values)
+
+  def get_export_options(self):
+    """Get loader options for all exported fields."""
+    options = []
+    for field in self.fields:
+      header = self.object_headers[field]
+      options.extend(header["handler"].get_export_options(
+          self.object_class, field, **header))
+    return options
+
+  def get_export_values(self, ids):
+    """Get values of the fields that are exported in bulk for all ids.
+
+    This costs a few queries per field instead of a few queries per field and
+    exported object.
+    """
+    export_values = {}
+    for field in self.fields:
+      header = self.object_headers[field]
+      values = header["handler"].get_export_values(
+          self.object_class, field, ids, **header)
+      if values is not None:
+        export_values[field] = values
+    return export_values
 
   def handle_row_data(self, field_list=None):
     """Call handle row data on all row converters.
@@ -250,40 +338,219 @@ class BlockConverter(object):
     for row_converter in self.row_converters:
       row_converter.setup_secondary_objects(slugs_dict)
 
-    if not self.converter.dry_run:
-      for row_converter in self.row_converters:
-        row_converter.insert_secondary_objecs()
-      self.save_import()
+    if self.converter.dry_run or self.converter.is_block_mapped(self):
+      return
+    for row_converter in self.row_converters:
+      row_converter.insert_secondary_objecs()
+    self.insert_mappings()
+    self.converter.set_block_mapped(self)
+    if not self.save_import():
+      self.converter.set_block_mapped(self, False)
+
+  def _get_relationships(self, pair_keys):
+    """Get existing relationships between any of the object pairs."""
+    relationships = {}
+    columns = tuple_(Relationship.source_type, Relationship.source_id,
+                     Relationship.destination_type,
+                     Relationship.destination_id)
+    pair_keys = list(pair_keys)
+    for start in xrange(0, len(pair_keys), MAPPING_CHUNK_SIZE):
+      values = []
+      for first, second in pair_keys[start:start + MAPPING_CHUNK_SIZE]:
+        values.append(first + second)
+        values.append(second + first)
+      for relationship in Relationship.query.filter(columns.in_(values)):
+        key = tuple(sorted([Stub.from_source(relationship),
+                            Stub.from_destination(relationship)]))
+        relationships[key] = relationship
+    return relationships
+
+  @staticmethod
+  def _create_relationships(pairs):
+    """Add relationships for all pairs to the session and flush them once.
+
+    The relationships go through the session so that save_import expires
+    the cached representations and permissions they affect.
+
+    Returns:
+      list of the new relationships.
+    """
+    current_user = get_current_user()
+    relationships = []
+    for src, dst in pairs:
+      relationship = Relationship(source=src, destination=dst,
+                                  modified_by_id=current_user.id)
+      db.session.add(relationship)
+      relationships.append(relationship)
+    db.session.flush()
+    return relationships
+
+  def insert_mappings(self):
+    """Create and remove relationships for mapping columns of all rows.
+
+    Existing relationships for all collected object pairs are loaded with
+    tuple IN queries, missing ones are flushed together and the automapper
+    handles all new relationships as one batch. When a pair is both mapped
+    and unmapped in the block, the last entry wins.
+    """
+    if not self.mappings:
+      return
+    mapped = {}
+    sources = {}
+    for obj, mapped_obj, unmap in self.mappings:
+      key = _get_pair_key(obj, mapped_obj)
+      mapped[key] = not unmap
+      sources.setdefault(key, (obj, mapped_obj))
+    self.mappings = []
+
+    existing = self._get_relationships(mapped.keys())
+    new_keys = [pair_key for pair_key, is_mapped in mapped.items()
+                if is_mapped and pair_key not in existing]
+    for key, is_mapped in mapped.items():
+      if not is_mapped and key in existing:
+        db.session.delete(existing[key])
+    if not new_keys:
+      return
+    relationships = self._create_relationships(
+        [sources[pair_key] for pair_key in new_keys])
+    # it is safe to reuse this automapper since no other objects will be
+    # created while creating automappings and cache reuse yields significant
+    # performance boost
+    automapper = AutomapperGenerator(use_benchmark=False)
+    automapper.generate_automappings_batch(relationships)
 
   def import_objects(self):
     """Add all objects to the database.
 
-    This function flushes all objects to the database and if the dry_run flag
-    is not set, the session gets commited and all signals for the imported
-    objects get sent.
+    If the dry_run flag is not set, objects are inserted and committed in
+    chunks of rows and all signals for the imported objects get sent. Rows
+    committed by an earlier run of the same import task are skipped.
     """
     if self.ignore:
       return
 
+    if self.converter.dry_run:
+      for row_converter in self.row_converters:
+        row_converter.setup_object()
+      return
+
+    pending = []
     for row_converter in self.row_converters:
-      row_converter.setup_object()
+      if row_converter.committed is None:
+        pending.append(row_converter)
+      else:
+        row_converter.restore_import_state()
+    for start in xrange(0, len(pending), IMPORT_CHUNK_SIZE):
+      self.import_chunk(pending[start:start + IMPORT_CHUNK_SIZE])
 
-    if not self.converter.dry_run:
-      for row_converter in self.row_converters:
-        row_converter.send_pre_commit_signals()
-        try:
-          row_converter.insert_object()
-          db.session.flush()
-        except Exception as e:
-          db.session.rollback()
-          current_app.logger.error("Import failed with: {}".format(e.message))
-          row_converter.add_error(errors.UNKNOWN_ERROR)
-      self.save_import()
-      for row_converter in self.row_converters:
-        row_converter.send_post_commit_signals()
+  def import_chunk(self, row_converters):
+    """Insert and commit the objects of a chunk of rows.
+
+    States of the rows are committed with the objects, see
+    Converter.save_progress.
+    """
+    failed = set()
+    if not self.insert_chunk(row_converters):
+      failed = self.insert_rows(row_converters)
+    states = {row_converter.index: row_converter.get_import_state(
+        row_converter in failed) for row_converter in row_converters}
+    self.converter.add_committed_rows(self, states)
+    if not self.save_import():
+      self.converter.remove_committed_rows(self, states)
+      return
+    self.send_signals(row_converters, after_commit=True)
+
+  def insert_chunk(self, row_converters):
+    """Write all rows of a chunk in a single savepoint.
+
+    Pre-commit signals are sent once for the whole chunk.
+
+    Returns:
+      True if the rows were written, False if the savepoint was rolled back
+      because any of them failed.
+    """
+    savepoint = db.session.begin_nested()
+    try:
+      for row_converter in row_converters:
+        row_converter.setup_object()
+      self.send_signals(row_converters)
+      for row_converter in row_converters:
+        row_converter.insert_object()
+      db.session.flush()
+    except Exception as e:  # pylint: disable=broad-except
+      savepoint.rollback()
+      current_app.logger.warning(
+          "Import chunk failed, retrying row by row: {}".format(e.message))
+      return False
+    savepoint.commit()
+    return True
+
+  def insert_rows(self, row_converters):
+    """Write every row of a chunk in its own savepoint.
+
+    This is the fallback of insert_chunk: a failing row does not discard the
+    rows flushed before it. Pre-commit signals are sent inside the savepoint
+    of their row, since their listeners flush and inspect attribute history.
+
+    Returns:
+      set of the failed rows.
+    """
+    failed = set()
+    for row_converter in row_converters:
+      savepoint = db.session.begin_nested()
+      try:
+        row_converter.setup_object()
+        self.send_signals([row_converter])
+        row_converter.insert_object()
+        db.session.flush()
+      except Exception as e:  # pylint: disable=broad-except
+        savepoint.rollback()
+        current_app.logger.error("Import failed with: {}".format(e.message))
+        row_converter.add_error(errors.UNKNOWN_ERROR)
+        failed.add(row_converter)
+        self.mappings = [mapping for mapping in self.mappings
+                         if mapping[0] is not row_converter.obj]
+      else:
+        savepoint.commit()
+    return failed
+
+  def send_signals(self, row_converters, after_commit=False):
+    """Send model signals for the objects of the given rows.
+
+    Objects are grouped by the kind of change, so that listeners of batch
+    signals get all objects of the rows at once.
+    Note: signals are only sent for the row objects. Secondary objects such as
+    Relationships do not get any signals triggered.
+
+    Args:
+      row_converters (list of RowConverter): imported rows.
+      after_commit (bool): send the after commit variants of the signals.
+    """
+    objects = OrderedDict(
+        (name, []) for name in ("model_posted", "model_put", "model_deleted"))
+    for row_converter in row_converters:
+      name = row_converter.get_signal_name()
+      if name is not None:
+        objects[name].append(row_converter.obj)
+    service_class = getattr(ggrc.services, self.object_class.__name__)
+    service_class.model = self.object_class
+    for name, name_objects in objects.items():
+      if not name_objects:
+        continue
+      sources = None
+      if name != "model_deleted":
+        sources = [{} for _ in name_objects]
+      if after_commit:
+        name += "_after_commit"
+      Resource.send_batch(name, self.object_class, name_objects, sources,
+                          service_class)
 
   def save_import(self):
-    """Commit all changes in the session and update memcache."""
+    """Commit all changes in the session and update memcache.
+
+    Returns:
+      True if the changes were committed.
+    """
     try:
       modified_objects = get_modified_objects(db.session)
       update_memcache_before_commit(
@@ -295,6 +562,8 @@ class BlockConverter(object):
       db.session.rollback()
       current_app.logger.error("Import failed with: {}".format(e.message))
       self.add_errors(errors.UNKNOWN_ERROR, line=self.offset + 2)
+      return False
+    return True
 
   def add_errors(self, template, **kwargs):
     message = template.format(**kwargs)
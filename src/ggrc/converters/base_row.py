@@ -6,12 +6,10 @@
 """This module is used for handling a single line from a csv file.
 """
 
-import ggrc.services
 from ggrc import db
 from ggrc.converters import errors
 from ggrc.models.reflection import AttributeInfo
 from ggrc.rbac import permissions
-from ggrc.services.common import Resource
 
 
 class RowConverter(object):
@@ -34,6 +32,7 @@ class RowConverter(object):
     offset = 3  # 2 header rows and 1 for 0 based index
     self.line = self.index + self.block_converter.offset + offset
     self.headers = options.get("headers", [])
+    self.committed = options.get("committed")
 
   def add_error(self, template, **kwargs):
     message = template.format(line=self.line, **kwargs)
@@ -98,7 +97,8 @@ class RowConverter(object):
                      column_names=", ".join(missing))
 
   def find_by_key(self, key, value):
-    return self.object_class.query.filter_by(**{key: value}).first()
+    converter = self.block_converter.converter
+    return converter.find_object(self.object_class, key, value)
 
   def get_value(self, key):
     item = self.attrs.get(key) or self.objects.get(key)
@@ -127,6 +127,10 @@ class RowConverter(object):
     """ Get object if the slug is in the system or return a new object """
     value = self.get_value(key)
     self.is_new = False
+    if self.committed and self.committed[0] == "ok":
+      obj = self.object_class.query.get(self.committed[1])
+      if obj is not None:
+        return obj
     obj = self.find_by_key(key, value)
     if not obj:
       obj = self.object_class()
@@ -136,6 +140,37 @@ class RowConverter(object):
       self.add_error(errors.PERMISSION_ERROR)
     return obj
 
+  def get_import_state(self, failed=False):
+    """Get the row state that is stored in the import progress.
+
+    Args:
+      failed (bool): True if inserting the row object failed.
+
+    Returns:
+      tuple with the state name, followed by the object id and the is_new
+      flag for imported objects.
+    """
+    if failed:
+      return ("failed",)
+    if self.ignore:
+      return ("ignored",)
+    if self.is_delete:
+      return ("deleted",)
+    if self.obj is None or self.obj.id is None:
+      return ("failed",)
+    return ("ok", self.obj.id, self.is_new)
+
+  def restore_import_state(self):
+    """Restore the state of a row committed by an earlier run of the task."""
+    state = self.committed[0]
+    if state == "failed":
+      if not self.ignore:
+        self.add_error(errors.UNKNOWN_ERROR)
+    elif state == "ignored":
+      self.set_ignore()
+    elif state == "ok":
+      self.is_new = self.committed[2]
+
   def setup_secondary_objects(self, slugs_dict):
     if not self.obj or self.ignore or self.is_delete:
       return
@@ -155,49 +190,20 @@ class RowConverter(object):
     for item_handler in self.attrs.values():
       item_handler.set_obj_attr()
 
-  def send_post_commit_signals(self):
-    """Send after commit signals for all objects
-
-    This function sends propper signals for all objects depending if the object
-    was created, updated or deleted.
-    Note: signals are only sent for the row objects. Secondary objects such as
-    Relationships do not get any signals triggered.
-    ."""
-    if self.ignore:
-      return
-    service_class = getattr(ggrc.services, self.object_class.__name__)
-    service_class.model = self.object_class
-    if self.is_delete:
-      Resource.model_deleted_after_commit.send(
-          self.object_class, obj=self.obj, service=service_class)
-    elif self.is_new:
-      Resource.model_posted_after_commit.send(
-          self.object_class, obj=self.obj, src={}, service=service_class)
-    else:
-      Resource.model_put_after_commit.send(
-          self.object_class, obj=self.obj, src={}, service=service_class)
-
-  def send_pre_commit_signals(self):
-    """Send before commit signals for all objects.
+  def get_signal_name(self):
+    """Get the name of the model signal for the change of the row object.
 
-    This function sends propper signals for all objects depending if the object
-    was created, updated or deleted.
-    Note: signals are only sent for the row objects. Secondary objects such as
-    Relationships do not get any signals triggered.
+    Returns:
+      "model_deleted", "model_posted" or "model_put", or None for ignored
+      rows.
     """
     if self.ignore:
-      return
-    service_class = getattr(ggrc.services, self.object_class.__name__)
-    service_class.model = self.object_class
+      return None
     if self.is_delete:
-      Resource.model_deleted.send(
-          self.object_class, obj=self.obj, service=service_class)
-    elif self.is_new:
-      Resource.model_posted.send(
-          self.object_class, obj=self.obj, src={}, service=service_class)
-    else:
-      Resource.model_put.send(
-          self.object_class, obj=self.obj, src={}, service=service_class)
+      return "model_deleted"
+    if self.is_new:
+      return "model_posted"
+    return "model_put"
 
   def insert_object(self):
     """Add the row object to the current database session."""
@@ -10,11 +10,12 @@ from dateutil.parser import parse
 from flask import current_app
 from sqlalchemy import and_
 from sqlalchemy import or_
+from sqlalchemy import orm
+from sqlalchemy.orm.properties import RelationshipProperty
 import re
 import traceback
 
 from ggrc import db
-from ggrc.automapper import AutomapperGenerator
 from ggrc.converters import errors
 from ggrc.converters import get_exportables
 from ggrc.login import get_current_user
@@ -28,7 +29,6 @@ from ggrc.models import Person
 from ggrc.models import Policy
 from ggrc.models import Program
 from ggrc.models import Regulation
-from ggrc.models import Relationship
 from ggrc.models import Request
 from ggrc.models import Standard
 from ggrc.models import all_models
@@ -41,6 +41,15 @@ MAPPING_PREFIX = "__mapping__:"
 CUSTOM_ATTR_PREFIX = "__custom__:"
 
 
+def get_lines(raw_values):
+  """Get all distinct non empty lines from a list of cell values."""
+  lines = set()
+  for raw_value in raw_values:
+    lines.update(line.strip() for line in raw_value.splitlines())
+  lines.discard("")
+  return lines
+
+
 class ColumnHandler(object):
 
   def __init__(self, row_converter, key, **options):
@@ -59,19 +68,73 @@ class ColumnHandler(object):
     if options.get("parse"):
       self.set_value()
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    """Get the objects this handler looks up by key when parsing a column.
+
+    Args:
+      object_class (db.Model): class of the objects in the imported block.
+      raw_values (list of str): values of all cells in the column.
+      options: column definition, same as the handler options.
+
+    Returns:
+      List of (class, key, values) tuples. Objects of the class with the key
+      values get prefetched before the column is parsed.
+    """
+    # pylint: disable=unused-argument
+    return []
+
+  @classmethod
+  def get_export_options(cls, object_class, key, **options):
+    """Get loader options that the export query needs for this column."""
+    # pylint: disable=unused-argument
+    return []
+
+  @classmethod
+  def get_export_values(cls, object_class, key, ids, **options):
+    """Get the exported values of many objects at once.
+
+    Args:
+      object_class (db.Model): class of the exported objects.
+      key (str): exported column key.
+      ids (list of int): ids of the exported objects.
+      options: column definition, same as the handler options.
+
+    Returns:
+      dict with the exported value for every object id, or None if the values
+      are exported one object at a time by get_value.
+    """
+    # pylint: disable=unused-argument
+    return None
+
+  def get_exported_value(self):
+    """Get the value precomputed by get_export_values, if any.
+
+    Returns:
+      The value of the current row, or None if the column values were not
+      precomputed.
+    """
+    values = self.row_converter.block_converter.export_values.get(self.key)
+    if values is None:
+      return None
+    return values.get(self.row_converter.obj.id, "")
+
   def check_unique_consistency(self):
-    """Returns true if no object exists with the same unique field."""
+    """Returns true if no object exists with the same unique field.
+
+    Existing values are prefetched for the whole block, see
+    BlockConverter.prefetch_objects.
+    """
     if not self.unique:
       return
     if not self.value:
       return
     if not self.row_converter.obj:
       return
-    nr_duplicates = self.row_converter.object_class.query.filter(and_(
-        getattr(self.row_converter.object_class, self.key) == self.value,
-        self.row_converter.object_class.id != self.row_converter.obj.id
-    )).count()
-    if nr_duplicates > 0:
+    converter = self.row_converter.block_converter.converter
+    ids = converter.find_unique_ids(
+        self.row_converter.object_class, self.key, self.value)
+    if ids - {self.row_converter.obj.id}:
       self.add_error(errors.DUPLICATE_VALUE,
                      column_name=self.key,
                      value=self.value)
@@ -159,8 +222,9 @@ class DeleteColumnHandler(ColumnHandler):
       else:
         indexer = self.row_converter.block_converter.converter.indexer
         if indexer is not None:
-          for o in tr.session.deleted:
-            indexer.delete_record(o.id, o.__class__.__name__, commit=False)
+          indexer.delete_records(
+              [(o.id, o.__class__.__name__) for o in tr.session.deleted],
+              commit=False)
         tr.commit()
 
 
@@ -208,10 +272,17 @@ class UserColumnHandler(ColumnHandler):
         self.add_warning(errors.UNKNOWN_USER_WARNING, email=email)
     return list(users)
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    emails = set(email.lower() for email in get_lines(raw_values))
+    return [(Person, "email", emails)]
+
   def get_person(self, email):
-    new_objects = self.row_converter.block_converter.converter.new_objects
+    converter = self.row_converter.block_converter.converter
+    new_objects = converter.new_objects
     if email not in new_objects[Person]:
-      new_objects[Person][email] = Person.query.filter_by(email=email).first()
+      new_objects[Person][email] = converter.find_object(
+          Person, "email", email)
     return new_objects[Person].get(email)
 
   def parse_item(self):
@@ -225,6 +296,13 @@ class UserColumnHandler(ColumnHandler):
                        column_name=self.display_name)
     return person
 
+  @classmethod
+  def get_export_options(cls, object_class, key, **options):
+    prop = getattr(getattr(object_class, key, None), "property", None)
+    if isinstance(prop, RelationshipProperty):
+      return [orm.joinedload(key)]
+    return []
+
   def get_value(self):
     person = getattr(self.row_converter.obj, self.key)
     if person:
@@ -234,6 +312,12 @@ class UserColumnHandler(ColumnHandler):
 
 class OwnerColumnHandler(UserColumnHandler):
 
+  @classmethod
+  def get_export_options(cls, object_class, key, **options):
+    if not hasattr(object_class, "object_owners"):
+      return []
+    return [orm.subqueryload("object_owners").joinedload("person")]
+
   def parse_item(self):
     owners = set()
     email_lines = self.raw_value.splitlines()
@@ -274,6 +358,10 @@ class OwnerColumnHandler(UserColumnHandler):
 
 class SlugColumnHandler(ColumnHandler):
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    return [(object_class, "slug", get_lines(raw_values))]
+
   def parse_item(self):
     if self.raw_value:
       return self.raw_value
@@ -298,6 +386,11 @@ class DateColumnHandler(ColumnHandler):
 
 class EmailColumnHandler(ColumnHandler):
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    emails = set(email.lower() for email in get_lines(raw_values))
+    return [(object_class, "email", emails)]
+
   def parse_item(self):
     """ emails are case insensitive """
     email = self.raw_value.lower()
@@ -364,14 +457,22 @@ class MappingColumnHandler(ColumnHandler):
     self.unmap = self.key.startswith(AttributeInfo.UNMAPPING_PREFIX)
     super(MappingColumnHandler, self).__init__(row_converter, key, **options)
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    mapping_object = get_exportables().get(options.get("attr_name", ""))
+    if mapping_object is None:
+      return []
+    return [(mapping_object, "slug", get_lines(raw_values))]
+
   def parse_item(self):
     """ Remove multiple spaces and new lines from text """
     class_ = self.mapping_object
+    converter = self.row_converter.block_converter.converter
     lines = set(self.raw_value.splitlines())
     slugs = filter(unicode.strip, lines)  # noqa
     objects = []
     for slug in slugs:
-      obj = class_.query.filter(class_.slug == slug).first()
+      obj = converter.find_object(class_, "slug", slug)
       if obj:
         if permissions.is_allowed_update_for(obj):
           objects.append(obj)
@@ -391,31 +492,50 @@ class MappingColumnHandler(ColumnHandler):
     self.value = self.parse_item()
 
   def insert_object(self):
-    """ Create a new mapping object """
+    """ Add the mappings to the mapping stage of the block
+
+    Relationships of the whole block are created and removed together by
+    BlockConverter.insert_mappings.
+    """
     if self.dry_run or not self.value:
       return
     current_obj = self.row_converter.obj
-    relationships = []
+    mappings = self.row_converter.block_converter.mappings
     for obj in self.value:
-      mapping = Relationship.find_related(current_obj, obj)
-      if not self.unmap and not mapping:
-        mapping = Relationship(source=current_obj, destination=obj)
-        relationships.append(mapping)
-        db.session.add(mapping)
-      elif self.unmap and mapping:
-        db.session.delete(mapping)
-    db.session.flush()
-    # it is safe to reuse this automapper since no other objects will be
-    # created while creating automappings and cache reuse yields significant
-    # performance boost
-    automapper = AutomapperGenerator(use_benchmark=False)
-    for relation in relationships:
-      automapper.generate_automappings(relation)
+      mappings.append((current_obj, obj, self.unmap))
     self.dry_run = True
 
+  @classmethod
+  def get_export_values(cls, object_class, key, ids, **options):
+    if key.startswith(AttributeInfo.UNMAPPING_PREFIX):
+      return None
+    mapping_object = get_exportables().get(options.get("attr_name", ""))
+    if mapping_object is None:
+      return None
+    related = RelationshipHelper.get_ids_related_to_each(
+        mapping_object.__name__, object_class.__name__, ids)
+    if related is None:
+      return None
+    slug_attr = getattr(mapping_object, "slug", None)
+    if slug_attr is None:
+      slug_attr = getattr(mapping_object, "email")
+    mapped_ids = set().union(*related.values())
+    slugs = {}
+    if mapped_ids:
+      slugs = dict(db.session.query(mapping_object.id, slug_attr).filter(
+          mapping_object.id.in_(mapped_ids)))
+    return {
+        id_: "\n".join(slugs[mapped_id] for mapped_id in sorted(mapped_ids)
+                       if slugs.get(mapped_id) is not None)
+        for id_, mapped_ids in related.items()
+    }
+
   def get_value(self):
     if self.unmap:
       return ""
+    value = self.get_exported_value()
+    if value is not None:
+      return value
     related_slugs = []
     related_ids = RelationshipHelper.get_ids_related_to(
         self.mapping_object.__name__,
@@ -505,6 +625,12 @@ class ParentColumnHandler(ColumnHandler):
   def __init__(self, row_converter, key, **options):
     super(ParentColumnHandler, self).__init__(row_converter, key, **options)
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    if cls.parent is None:
+      return []
+    return [(cls.parent, "slug", get_lines(raw_values))]
+
   def parse_item(self):
     """ get parent object """
     # pylint: disable=protected-access
@@ -514,7 +640,8 @@ class ParentColumnHandler(ColumnHandler):
     slug = self.raw_value
     obj = self.new_objects.get(self.parent, {}).get(slug)
     if obj is None:
-      obj = self.parent.query.filter(self.parent.slug == slug).first()
+      converter = self.row_converter.block_converter.converter
+      obj = converter.find_object(self.parent, "slug", slug)
     if obj is None:
       self.add_error(errors.UNKNOWN_OBJECT,
                      object_type=self.parent._inflector.human_singular.title(),
@@ -553,31 +680,41 @@ class ParentColumnHandler(ColumnHandler):
 
 class ProgramColumnHandler(ParentColumnHandler):
 
-  def __init__(self, row_converter, key, **options):
-    self.parent = Program
-    super(ProgramColumnHandler, self).__init__(row_converter, key, **options)
+  parent = Program
 
 
 class SectionDirectiveColumnHandler(MappingColumnHandler):
 
+  allowed_directives = [Policy, Regulation, Standard, Contract]
+
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    slugs = get_lines(raw_values)
+    return [(directive_class, "slug", slugs)
+            for directive_class in cls.allowed_directives]
+
   def get_directive_from_slug(self, directive_class, slug):
     if slug in self.new_objects[directive_class]:
       return self.new_objects[directive_class][slug]
-    return directive_class.query.filter_by(slug=slug).first()
+    converter = self.row_converter.block_converter.converter
+    return converter.find_object(directive_class, "slug", slug)
 
   def parse_item(self):
     """ get a directive from slug """
-    allowed_directives = [Policy, Regulation, Standard, Contract]
     if self.raw_value == "":
       return None
     slug = self.raw_value
-    for directive_class in allowed_directives:
+    for directive_class in self.allowed_directives:
       directive = self.get_directive_from_slug(directive_class, slug)
       if directive is not None:
         return [directive]
     self.add_error(errors.UNKNOWN_OBJECT, object_type="Program", slug=slug)
     return None
 
+  @classmethod
+  def get_export_values(cls, object_class, key, ids, **options):
+    return None
+
   def get_value(self):
     # Legacy field. With the new mapping system it is not possible to determine
     # which was the primary directive that has been mapped
@@ -603,8 +740,9 @@ class AuditColumnHandler(MappingColumnHandler):
 
 class RequestAuditColumnHandler(ParentColumnHandler):
 
+  parent = Audit
+
   def __init__(self, row_converter, key, **options):
-    self.parent = Audit
     super(RequestAuditColumnHandler, self) \
         .__init__(row_converter, "audit", **options)
 
@@ -734,9 +872,7 @@ class ControlAssertionColumnHandler(CategoryColumnHandler):
 
 class RequestColumnHandler(ParentColumnHandler):
 
-  def __init__(self, row_converter, key, **options):
-    self.parent = Request
-    super(RequestColumnHandler, self).__init__(row_converter, key, **options)
+  parent = Request
 
 
 class DocumentsColumnHandler(ColumnHandler):
@@ -52,6 +52,34 @@ def generate_csv_string(csv_data):
   return body
 
 
+# Number of csv lines in a chunk of a streamed csv file
+CSV_LINES_PER_CHUNK = 100
+
+
+def generate_csv_stream(csv_rows, width, lines_per_chunk=CSV_LINES_PER_CHUNK):
+  """ Turn rows of csv data into chunks of a csv file
+
+  Args:
+    csv_rows (iterable): rows of unicode cell values.
+    width (int): number of columns, shorter rows are padded to it.
+    lines_per_chunk (int): number of csv lines in a generated chunk.
+
+  Yields:
+    utf-8 encoded strings that together form the csv file.
+  """
+  output_buffer = StringIO()
+  writer = csv.writer(output_buffer)
+  for index, row in enumerate(csv_rows, 1):
+    row = row + [""] * (width - len(row))
+    writer.writerow([val.encode("utf-8") for val in row])
+    if index % lines_per_chunk == 0:
+      yield output_buffer.getvalue()
+      output_buffer.seek(0)
+      output_buffer.truncate()
+  yield output_buffer.getvalue()
+  output_buffer.close()
+
+
 def extract_relevant_data(csv_data):
   """ Split csv data into data and metadata """
   striped_data = [map(unicode.strip, line) for line in csv_data]  # noqa
@@ -7,14 +7,18 @@
 
 import datetime
 import collections
+import json
+import threading
 from sqlalchemy import and_
 from sqlalchemy import not_
 from sqlalchemy import or_
 
+from ggrc import db
 from ggrc.models.custom_attribute_value import CustomAttributeValue
 from ggrc.models.reflection import AttributeInfo
 from ggrc.models.relationship_helper import RelationshipHelper
 from ggrc.converters import get_exportables
+from ggrc.rbac import permissions
 
 
 class BadQueryException(Exception):
@@ -190,110 +194,64 @@ class QueryHelper(object):
     Returns:
       list of dicts: same query as the input with all ids that match the filter
     """
+    self.id_queries = []
     for object_query in self.query:
       object_query["ids"] = self.get_object_ids(object_query)
     return self.query
 
   def get_object_ids(self, object_query):
-    """ get a set of object ids described in the filters """
-    object_name = object_query["object_name"]
-    expression = object_query.get("filters", {}).get("expression")
+    """ get a set of object ids described in the filters
 
-    if expression is None:
-      return set()
-    object_class = self.object_map[object_name]
+    Only ids of objects the current user can read are returned. The read
+    permissions are applied as a SQL filter, so objects are only loaded when
+    they have permission conditions that can't be expressed in SQL.
 
-    def autocast(o_key, value):
-      if type(o_key) not in [str, unicode]:
-        return value
-      key, _ = self.attr_name_map[object_class].get(o_key, (o_key, None))
-      # handle dates
-      if ("date" in key and "relative" not in key) or \
-         key in ["end_date", "start_date"]:
-        if isinstance(value, datetime.date):
-          return value
-        try:
-          month, day, year = map(int, value.split("/"))
-          return datetime.date(year, month, day)
-        except Exception:
-          raise BadQueryException("Field \"{}\" expects a MM/DD/YYYY date"
-                                  .format(o_key))
-      # fallback
-      return value
-
-    def build_expression(exp):
-      if "op" not in exp:
-        return None
-
-      def relevant():
-        query = (self.query[exp["ids"][0]]
-                 if exp["object_name"] == "__previous__" else exp)
-        return object_class.id.in_(
-            RelationshipHelper.get_ids_related_to(
-                object_name,
-                query["object_name"],
-                query["ids"],
-            )
-        )
-
-      def unknown():
-        raise BadQueryException("Unknown operator \"{}\""
-                                .format(exp["op"]["name"]))
-
-      def with_key(key, p):
-        key = key.lower()
-        key, filter_by = self.attr_name_map[object_class].get(key, (key, None))
-        if hasattr(filter_by, "__call__"):
-          return filter_by(p)
-        else:
-          attr = getattr(object_class, key, None)
-          if attr is None:
-            raise BadQueryException("Bad query: object '{}' does "
-                                    "not have attribute '{}'."
-                                    .format(object_class.__name__, key))
-          return p(attr)
-
-      with_left = lambda p: with_key(exp["left"], p)
-
-      lift_bin = lambda f: f(build_expression(exp["left"]),
-                             build_expression(exp["right"]))
-
-      def text_search():
-        existing_fields = self.attr_name_map[object_class]
-        text = "%{}%".format(exp["text"])
-        p = lambda f: f.ilike(text)
-        return or_(*(
-            with_key(field, p)
-            for field in object_query.get("fields", [])
-            if field in existing_fields
-        ))
-
-      rhs = lambda: autocast(exp["left"], exp["right"])
-
-      ops = {
-          "AND": lambda: lift_bin(and_),
-          "OR": lambda: lift_bin(or_),
-          "=": lambda: with_left(lambda l: l == rhs()),
-          "!=": lambda: not_(with_left(
-                             lambda l: l == rhs())),
-          "~": lambda: with_left(lambda l:
-                                 l.ilike("%{}%".format(rhs()))),
-          "!~": lambda: not_(with_left(
-                             lambda l: l.ilike("%{}%".format(rhs())))),
-          "<": lambda: with_left(lambda l: l < rhs()),
-          ">": lambda: with_left(lambda l: l > rhs()),
-          "relevant": relevant,
-          "text_search": text_search
-      }
+    The id query is kept for relevant filters of later object queries that
+    reference this one with "__previous__".
+    """
+    query, check_permissions = self.get_ids_query(object_query)
+    if query is None:
+      ids = set()
+    elif check_permissions:
+      ids = [o.id for o in query if permissions.is_allowed_read_for(o)]
+    else:
+      ids = [id_ for id_, in query]
+    self.id_queries.append(ids if query is None or check_permissions
+                           else query)
+    return ids
 
-      return ops.get(exp["op"]["name"], unknown)()
+  def get_ids_query(self, object_query):
+    """ build the query for ids of objects described in the filters
 
-    query = object_class.query
-    filter_expression = build_expression(expression)
+    Returns:
+      tuple of the query and a flag that is True if read permissions must be
+      checked on the loaded objects. The query selects only object ids if the
+      flag is False, and is None if the object query has no filters.
+    """
+    expression = object_query.get("filters", {}).get("expression")
+    if expression is None:
+      return None, False
+    object_class = self.object_map[object_query["object_name"]]
+    plan, values = get_plan(expression)
+    filter_expression = plan(_PlanContext(self, object_class, object_query,
+                                          values))
+
+    read_filter = permissions.read_filter_for(object_class)
+    if read_filter is None:
+      # permissions with conditions that can't be expressed in SQL
+      query = object_class.query
+    else:
+      query = db.session.query(object_class.id).filter(read_filter)
     if filter_expression is not None:
       query = query.filter(filter_expression)
-    object_ids = [o.id for o in query.all()]
-    return object_ids
+    return query, read_filter is None
+
+  def get_previous_ids(self, index):
+    """ get ids of a previous object query as a query or a list """
+    try:
+      return self.id_queries[index]
+    except (AttributeError, IndexError):
+      raise BadQueryException("Invalid relevant filter for __previous__")
 
   def slugs_to_ids(self, object_name, slugs):
     object_class = self.object_map.get(object_name)
@@ -302,3 +260,176 @@ class QueryHelper(object):
     ids = [c.id for c in object_class.query.filter(
         object_class.slug.in_(slugs)).all()]
     return ids
+
+
+class _PlanContext(object):
+  """Values needed to build the filter of a compiled plan.
+
+  Compiled plans only depend on the shape of the filter expression. The
+  values of the expression and everything that depends on the query helper,
+  such as attribute names of custom attributes or ids of previous object
+  queries, are resolved through the context.
+  """
+
+  def __init__(self, helper, object_class, object_query, values):
+    self.helper = helper
+    self.object_class = object_class
+    self.object_query = object_query
+    self.values = values
+    self.attr_name_map = helper.attr_name_map[object_class]
+
+  def autocast(self, o_key, value):
+    if type(o_key) not in [str, unicode]:
+      return value
+    key, _ = self.attr_name_map.get(o_key, (o_key, None))
+    # handle dates
+    if ("date" in key and "relative" not in key) or \
+       key in ["end_date", "start_date"]:
+      if isinstance(value, datetime.date):
+        return value
+      try:
+        month, day, year = map(int, value.split("/"))
+        return datetime.date(year, month, day)
+      except Exception:
+        raise BadQueryException("Field \"{}\" expects a MM/DD/YYYY date"
+                                .format(o_key))
+    # fallback
+    return value
+
+  def with_key(self, key, p):
+    key = key.lower()
+    key, filter_by = self.attr_name_map.get(key, (key, None))
+    if hasattr(filter_by, "__call__"):
+      return filter_by(p)
+    else:
+      attr = getattr(self.object_class, key, None)
+      if attr is None:
+        raise BadQueryException("Bad query: object '{}' does "
+                                "not have attribute '{}'."
+                                .format(self.object_class.__name__, key))
+      return p(attr)
+
+  def compare(self, key, value, predicate):
+    value = self.autocast(key, value)
+    return self.with_key(key, lambda attr: predicate(attr, value))
+
+  def relevant(self, related_name, related_ids):
+    return self.object_class.id.in_(
+        RelationshipHelper.get_ids_related_to(
+            self.object_class.__name__,
+            related_name,
+            related_ids,
+        )
+    )
+
+  def relevant_to_previous(self, index):
+    previous = self.helper.query[index]
+    return self.relevant(previous["object_name"],
+                         self.helper.get_previous_ids(index))
+
+  def text_search(self, text):
+    p = lambda f: f.ilike(text)
+    return or_(*(
+        self.with_key(field, p)
+        for field in self.object_query.get("fields", [])
+        if field in self.attr_name_map
+    ))
+
+
+# Comparison operators with their predicates and a flag for negation that is
+# applied outside of custom attribute filters
+_COMPARISONS = {
+    "=": (lambda l, r: l == r, False),
+    "!=": (lambda l, r: l == r, True),
+    "~": (lambda l, r: l.ilike("%{}%".format(r)), False),
+    "!~": (lambda l, r: l.ilike("%{}%".format(r)), True),
+    "<": (lambda l, r: l < r, False),
+    ">": (lambda l, r: l > r, False),
+}
+
+# Maximum number of compiled plans kept in the plan cache
+PLAN_CACHE_SIZE = 1000
+
+_plan_cache = collections.OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def _get_shape(exp, values):
+  """Split a filter expression into its shape and its values.
+
+  Values of the expression are appended to values and replaced by their
+  index in the shape, so that expressions that only differ in their values
+  share a compiled plan.
+  """
+  if type(exp) is not dict or "op" not in exp:
+    return None
+  op = exp["op"]["name"]
+  if op in ("AND", "OR"):
+    return {"op": op, "left": _get_shape(exp["left"], values),
+            "right": _get_shape(exp["right"], values)}
+  if op == "relevant":
+    if exp["object_name"] == "__previous__":
+      values.append(exp["ids"][0])
+      return {"op": op, "previous": len(values) - 1}
+    values.extend((exp["object_name"], exp["ids"]))
+    return {"op": op, "object_name": len(values) - 2, "ids": len(values) - 1}
+  if op == "text_search":
+    values.append(exp["text"])
+    return {"op": op, "text": len(values) - 1}
+  if op in _COMPARISONS:
+    values.append(exp["right"])
+    return {"op": op, "key": exp["left"], "value": len(values) - 1}
+  raise BadQueryException("Unknown operator \"{}\"".format(op))
+
+
+def _compile(shape):
+  """Compile the shape of a filter expression into a plan.
+
+  A plan is a function that gets a _PlanContext with the values of the
+  expression and returns the SQL filter for it. Relevant filters are
+  subqueries, including the ones that reference ids of a previous object
+  query.
+  """
+  if shape is None:
+    return lambda ctx: None
+  op = shape["op"]
+  if op in ("AND", "OR"):
+    left, right = _compile(shape["left"]), _compile(shape["right"])
+    join = and_ if op == "AND" else or_
+    return lambda ctx: join(left(ctx), right(ctx))
+  if op == "relevant":
+    if "previous" in shape:
+      index = shape["previous"]
+      return lambda ctx: ctx.relevant_to_previous(ctx.values[index])
+    name, ids = shape["object_name"], shape["ids"]
+    return lambda ctx: ctx.relevant(ctx.values[name], ctx.values[ids])
+  if op == "text_search":
+    text = shape["text"]
+    return lambda ctx: ctx.text_search("%{}%".format(ctx.values[text]))
+  key, value = shape["key"], shape["value"]
+  predicate, negate = _COMPARISONS[op]
+  if negate:
+    return lambda ctx: not_(ctx.compare(key, ctx.values[value], predicate))
+  return lambda ctx: ctx.compare(key, ctx.values[value], predicate)
+
+
+def get_plan(expression):
+  """Get the compiled plan for a filter expression from the plan cache.
+
+  Returns:
+    The plan for the shape of the expression and the values it is used with.
+  """
+  values = []
+  shape = _get_shape(expression, values)
+  key = json.dumps(shape, sort_keys=True, default=unicode)
+  with _plan_cache_lock:
+    plan = _plan_cache.pop(key, None)
+    if plan is not None:
+      _plan_cache[key] = plan
+      return plan, values
+  plan = _compile(shape)
+  with _plan_cache_lock:
+    _plan_cache[key] = plan
+    while len(_plan_cache) > PLAN_CACHE_SIZE:
+      _plan_cache.popitem(last=False)
+  return plan, values
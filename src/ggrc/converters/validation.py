@@ -0,0 +1,394 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Parallel validation of dry run imports.
+
+The rows of every block are split into partitions that are validated by a
+pool of worker threads. Every worker runs the dry run import steps for its
+rows in a copy of the request context, with its own database session that is
+rolled back at the end, so nothing validated by a worker is ever written.
+
+Keys of the objects created by the import are collected from the whole file
+beforehand, so that mappings to objects from other blocks or partitions are
+valid in every worker. Keys of rows that fail in one worker are merged after
+every run, and partitions that used any of them are validated again without
+them. Checks that need all rows of a block, such as duplicate values in the
+csv, run in the request thread on the merged results. Messages are merged
+by import step and partition, so their order does not depend on the order in
+which workers finish.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+from flask import _request_ctx_stack
+from flask import g
+from flask import has_request_context
+
+from ggrc import db
+from ggrc import settings
+from ggrc.converters.base_block import BlockConverter
+
+
+# Number of rows validated by a single worker task
+DRY_RUN_CHUNK_SIZE = 1000
+
+# Columns that identify the objects of a block
+KEY_COLUMNS = ("slug", "email")
+
+# Import steps that produce row messages, in the order they are merged
+COLUMNS_STEP = "columns"
+ROWS_STEP = "rows"
+OBJECTS_STEP = "objects"
+
+
+def get_workers():
+  """Number of worker threads, IMPORT_DRY_RUN_WORKERS by default."""
+  if getattr(settings, "APP_ENGINE", False):
+    return 1
+  return getattr(settings, "IMPORT_DRY_RUN_WORKERS", 1)
+
+
+def use_parallel_validation(converter):
+  """Check if a dry run import is large enough to be validated in parallel."""
+  rows = sum(len(block.rows) for block in converter.block_converters)
+  return (converter.dry_run and
+          get_workers() > 1 and
+          rows > DRY_RUN_CHUNK_SIZE and
+          has_request_context())
+
+
+def _get_key_value(key, raw_value):
+  """Get the key value of a row as the key column handler parses it."""
+  value = raw_value.strip()
+  if key == "email":
+    value = value.lower()
+  return value
+
+
+def get_new_keys(converter):
+  """Get the keys of all objects that the import would create.
+
+  Returns:
+    dict with a set of new key values for every (class, key) pair.
+  """
+  keys = {}
+  for block in converter.block_converters:
+    if block.ignore:
+      continue
+    for index, attr_name in enumerate(block.headers):
+      if attr_name not in KEY_COLUMNS:
+        continue
+      values = set(_get_key_value(attr_name, row[index])
+                   for row in block.rows if len(row) > index)
+      values.discard("")
+      keys.setdefault((block.object_class, attr_name), set()).update(values)
+      break
+  new_keys = {}
+  for (object_class, key), values in keys.items():
+    converter.prefetch_by_key(object_class, key, values)
+    new_keys[(object_class, key)] = frozenset(
+        value for value in values
+        if converter.find_object(object_class, key, value) is None)
+  return new_keys
+
+
+class NewObjects(dict):
+  """New objects of a class, including the objects of other partitions.
+
+  Placeholder objects for keys of other partitions are only created when a
+  handler asks for them.
+
+  Attributes:
+    removed (set): keys deleted because their rows have errors.
+    placeholders (set): pending keys that handlers asked for.
+  """
+
+  def __init__(self, object_class, key, new_keys):
+    super(NewObjects, self).__init__()
+    self.object_class = object_class
+    self.key = key
+    self.new_keys = new_keys
+    self.removed = set()
+    self.placeholders = set()
+
+  def _is_pending(self, value):
+    if dict.__contains__(self, value):
+      return False
+    pending = value in self.new_keys and value not in self.removed
+    if pending:
+      self.placeholders.add(value)
+    return pending
+
+  def __contains__(self, value):
+    return dict.__contains__(self, value) or self._is_pending(value)
+
+  def __getitem__(self, value):
+    if self._is_pending(value):
+      self[value] = self.object_class(**{self.key: value})
+    return dict.__getitem__(self, value)
+
+  def get(self, value, default=None):
+    if value in self:
+      return self[value]
+    return default
+
+  def __delitem__(self, value):
+    self.removed.add(value)
+    if dict.__contains__(self, value):
+      dict.__delitem__(self, value)
+
+
+class ValidatedRow(object):
+  """Validation result of a single csv row.
+
+  It stands in for the row converter in the blocks of the request thread,
+  which only need the row state for the duplicate checks and get_info.
+  """
+
+  def __init__(self, row_converter, unique_keys):
+    self.line = row_converter.line
+    self.ignore = row_converter.ignore
+    self.is_delete = row_converter.is_delete
+    self.is_new = row_converter.is_new
+    self.values = {key: row_converter.get_value(key) for key in unique_keys}
+    self.duplicate = False
+
+  def get_value(self, key):
+    return self.values.get(key)
+
+  def set_ignore(self, ignore=True):
+    self.ignore = ignore
+    self.duplicate = True
+
+
+class Partition(object):
+  """A range of rows of a block that is validated by one worker task.
+
+  Attributes:
+    rows (list of ValidatedRow): results of the validated rows.
+    messages (dict): row errors and warnings of every import step.
+    block_errors (list of str): block errors of the validation.
+    block_warnings (list of str): block warnings of the validation.
+    duplicate_lines (set of int): lines that are ignored as duplicates in
+      the csv, or None if duplicates within the partition were checked by
+      the worker.
+    unique_ignored (set of int): lines ignored by the duplicate check.
+    excluded (dict): keys of rows with errors in other partitions for every
+      (class, key) pair, that are not valid placeholders.
+    removed (dict): keys of rows with errors for every (class, key) pair.
+    placeholders (dict): pending keys used by the validation for every
+      (class, key) pair.
+  """
+
+  def __init__(self, block_converter, start, new_keys):
+    self.object_class = block_converter.object_class
+    self.headers = [unicode(header["display_name"])
+                    for header in block_converter.headers.values()]
+    self.offset = block_converter.offset + start
+    self.raw_rows = block_converter.rows[start:start + DRY_RUN_CHUNK_SIZE]
+    self.new_keys = new_keys
+    self.duplicate_lines = None
+    self.unique_ignored = set()
+    self.ignored_before_unique = set()
+    self.excluded = {}
+    self.removed = {}
+    self.placeholders = {}
+    self.rows = []
+    self.messages = {}
+    self.block_errors = []
+    self.block_warnings = []
+
+  def needs_revalidation(self):
+    """Check if rows found in the merged duplicate check were not ignored."""
+    duplicates = set(row.line for row in self.rows if row.duplicate)
+    return duplicates - self.ignored_before_unique != self.unique_ignored
+
+  def validate(self, converter_class):
+    """Run the dry run import steps for the rows of the partition."""
+    converter = converter_class(dry_run=True)
+    for (object_class, key), values in self.new_keys.items():
+      converter.new_objects[object_class] = NewObjects(
+          object_class, key, values - self.excluded.get((object_class, key),
+                                                        set()))
+    block = BlockConverter(converter, object_class=self.object_class,
+                           rows=self.raw_rows, raw_headers=self.headers,
+                           offset=self.offset)
+    converter.block_converters = [block]
+    counts = [0, 0]
+
+    def collect(step):
+      self.messages[step] = (block.row_errors[counts[0]:],
+                             block.row_warnings[counts[1]:])
+      counts[:] = [len(block.row_errors), len(block.row_warnings)]
+
+    block.row_converters_from_csv()
+    converter.prefetch_objects(converter.priority_columns)
+    converter.handle_priority_columns()
+    collect(COLUMNS_STEP)
+    block.prefetch_objects()
+    for row_converter in block.row_converters:
+      row_converter.handle_row_data()
+    block.check_mandatory_fields()
+    collect(ROWS_STEP)
+
+    self.ignored_before_unique = set(
+        row.line for row in block.row_converters if row.ignore)
+    if self.duplicate_lines is None:
+      block.check_uniq_columns()
+    else:
+      for row_converter in block.row_converters:
+        if row_converter.line in self.duplicate_lines:
+          row_converter.set_ignore()
+    self.unique_ignored = set(
+        row.line for row in block.row_converters
+        if row.ignore) - self.ignored_before_unique
+    # duplicates are reported by the block of the request thread
+    counts[:] = [len(block.row_errors), len(block.row_warnings)]
+
+    block.import_objects()
+    block.import_secondary_objects(converter.new_objects)
+    collect(OBJECTS_STEP)
+
+    unique_keys = [key for key, header in block.object_headers.items()
+                   if header["unique"]]
+    self.rows = [ValidatedRow(row_converter, unique_keys)
+                 for row_converter in block.row_converters]
+    self.block_errors = block.block_errors
+    self.block_warnings = block.block_warnings
+    new_objects = [objects for objects in converter.new_objects.values()
+                   if isinstance(objects, NewObjects)]
+    self.removed = {(objects.object_class, objects.key): objects.removed
+                    for objects in new_objects}
+    self.placeholders = {(objects.object_class, objects.key):
+                         objects.placeholders for objects in new_objects}
+    return self
+
+  def exclude(self, removed):
+    """Exclude keys of rows with errors from the placeholders.
+
+    Args:
+      removed (dict): keys of rows with errors in all partitions for every
+        (class, key) pair.
+
+    Returns:
+      True if the validation used placeholders for newly excluded keys.
+    """
+    stale = False
+    for class_key, keys in removed.items():
+      excluded = self.excluded.setdefault(class_key, set())
+      # the partition's own failed rows are never used as placeholders
+      new_keys = keys - excluded - self.removed.get(class_key, set())
+      if new_keys & self.placeholders.get(class_key, set()):
+        stale = True
+      excluded.update(keys)
+    return stale
+
+
+def _validate_in_worker(args):
+  request_context, request_permissions, partition, converter_class = args
+  with request_context:
+    g._request_permissions = request_permissions
+    try:
+      with db.session.no_autoflush:
+        return partition.validate(converter_class)
+    finally:
+      db.session.rollback()
+
+
+def _run(converter, partitions):
+  """Validate partitions in the worker pool, keeping their order."""
+  request_permissions = getattr(g, "_request_permissions", None)
+  tasks = [(_request_ctx_stack.top.copy(), request_permissions, partition,
+            converter.__class__) for partition in partitions]
+  pool = ThreadPool(min(get_workers(), len(tasks)))
+  try:
+    return pool.map(_validate_in_worker, tasks)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def _validate_partitions(converter, partitions, all_partitions):
+  """Validate partitions until no placeholder of a failed row is used."""
+  while partitions:
+    _run(converter, partitions)
+    removed = {}
+    for partition in all_partitions:
+      for class_key, keys in partition.removed.items():
+        removed.setdefault(class_key, set()).update(keys)
+    partitions = [partition for partition in all_partitions
+                  if partition.exclude(removed)]
+
+
+def _check_uniq_columns(block, partitions):
+  """Run the duplicate check of a block on the validated rows.
+
+  Returns:
+    The row errors and warnings of the duplicate check, and the partitions
+    that have to be validated again because rows were not ignored.
+  """
+  block.row_converters = [row for partition in partitions
+                          for row in partition.rows]
+  errors_count, warnings_count = len(block.row_errors), len(block.row_warnings)
+  block.check_uniq_columns()
+  messages = (block.row_errors[errors_count:],
+              block.row_warnings[warnings_count:])
+  del block.row_errors[errors_count:]
+  del block.row_warnings[warnings_count:]
+  revalidate = []
+  for partition in partitions:
+    if partition.needs_revalidation():
+      partition.duplicate_lines = set(
+          row.line for row in partition.rows if row.duplicate)
+      revalidate.append(partition)
+  return messages, revalidate
+
+
+def _merge_results(block, partitions, uniq_messages):
+  """Set the validated rows and merged messages of all steps on a block."""
+  block.row_converters = []
+  for partition in partitions:
+    block.row_converters.extend(partition.rows)
+    for step in (COLUMNS_STEP, ROWS_STEP):
+      block.row_errors.extend(partition.messages[step][0])
+      block.row_warnings.extend(partition.messages[step][1])
+  block.row_errors.extend(uniq_messages[0])
+  block.row_warnings.extend(uniq_messages[1])
+  for partition in partitions:
+    block.row_errors.extend(partition.messages[OBJECTS_STEP][0])
+    block.row_warnings.extend(partition.messages[OBJECTS_STEP][1])
+    for message in partition.block_errors:
+      if message not in block.block_errors:
+        block.block_errors.append(message)
+    for message in partition.block_warnings:
+      if message not in block.block_warnings:
+        block.block_warnings.append(message)
+
+
+def validate(converter):
+  """Validate all blocks of a dry run import in parallel.
+
+  The blocks of the converter get the validated rows as row converters and
+  the merged messages, so that get_info returns the same structure as for a
+  sequential dry run.
+  """
+  new_keys = get_new_keys(converter)
+  blocks = [(block, [Partition(block, start, new_keys) for start in
+                     xrange(0, len(block.rows), DRY_RUN_CHUNK_SIZE)])
+            for block in converter.block_converters if not block.ignore]
+  all_partitions = [partition for _, partitions in blocks
+                    for partition in partitions]
+  _validate_partitions(converter, all_partitions, all_partitions)
+
+  uniq_messages = {}
+  revalidate = []
+  for block, partitions in blocks:
+    uniq_messages[block], block_revalidate = _check_uniq_columns(
+        block, partitions)
+    revalidate.extend(block_revalidate)
+  _validate_partitions(converter, revalidate, all_partitions)
+
+  for block, partitions in blocks:
+    _merge_results(block, partitions, uniq_messages[block])
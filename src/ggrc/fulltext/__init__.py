@@ -18,9 +18,21 @@ class Indexer(object):
   def delete_record(self, key):
     raise NotImplementedError()
 
+  def create_records(self, records):
+    raise NotImplementedError()
+
+  def update_records(self, records):
+    raise NotImplementedError()
+
+  def delete_records(self, keys):
+    raise NotImplementedError()
+
   def search(self, terms):
     raise NotImplementedError()
 
+  def search_objects(self, terms, **kwargs):
+    raise NotImplementedError()
+
 class Record(object):
   def __init__(self, key, type, context_id, tags, **kwargs):
     self.key = key
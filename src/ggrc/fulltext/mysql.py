@@ -3,7 +3,10 @@
 # Created By: david@reciprocitylabs.com
 # Maintained By: david@reciprocitylabs.com
 
+import re
+
 from ggrc import db
+from ggrc import settings
 from ggrc.login import get_current_user
 from ggrc.models import all_models
 from ggrc.models.object_person import ObjectPerson
@@ -14,9 +17,14 @@ from ggrc_basic_permissions import objects_via_assignable_query
 from ggrc_basic_permissions import program_relationship_query
 from ggrc_basic_permissions import backlog_workflows
 from ggrc.rbac import permissions, context_query_filter
+from ggrc.rbac import resource_query_filter
 from sqlalchemy import \
-    event, and_, or_, literal, union, alias, case, func, distinct
+    event, and_, or_, literal, union, union_all, alias, case, func, distinct
+from sqlalchemy import exists
+from sqlalchemy import Float
 from sqlalchemy.sql import false
+from sqlalchemy.sql import literal_column
+from sqlalchemy.sql.expression import type_coerce
 from sqlalchemy.schema import DDL
 from sqlalchemy.ext.declarative import declared_attr
 from .sql import SqlIndexer
@@ -59,6 +67,7 @@ event.listen(
 
 class MysqlIndexer(SqlIndexer):
   record_type = MysqlRecordProperty
+  TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
 
   def _get_type_query(self, model_names, permission_type='read',
                       permission_model=None):
@@ -99,7 +108,7 @@ class MysqlIndexer(SqlIndexer):
         if resources:
           resource_sql = and_(
               MysqlRecordProperty.type == model_name,
-              MysqlRecordProperty.key.in_(resources))
+              resource_query_filter(MysqlRecordProperty.key, resources))
         else:
           resource_sql = false()
 
@@ -117,6 +126,55 @@ class MysqlIndexer(SqlIndexer):
         MysqlRecordProperty.type.in_(model_names),
         or_(*type_queries))
 
+  def _tokenize(self, terms):
+    """Split search terms into fulltext words and short substrings.
+
+    Words shorter than the MySQL `ft_min_word_len` are not in the FULLTEXT
+    index, so they can only be searched with LIKE.
+
+    Returns:
+      A tuple with the list of words searchable with MATCH and the list of
+      short tokens.
+    """
+    tokens = self.TOKEN_PATTERN.findall(terms)
+    min_length = getattr(settings, 'FULLTEXT_MIN_WORD_LENGTH', 4)
+    words = [t for t in tokens if len(t) >= min_length]
+    short_tokens = [t for t in tokens if len(t) < min_length]
+    return words, short_tokens
+
+  def _get_match_against(self, words):
+    """Boolean mode expression that requires every word as a prefix"""
+    return ' '.join('+{}*'.format(word) for word in words)
+
+  def _use_match(self):
+    return getattr(settings, 'FULLTEXT_MATCH_SEARCH', True)
+
+  def _get_relevance_column(self, terms):
+    """Relevance of a record property for the search terms.
+
+    Properties of records that were not matched with MATCH ... AGAINST get a
+    relevance of 0.
+    """
+    if terms and self._use_match():
+      words, _ = self._tokenize(terms)
+      if words:
+        return type_coerce(MysqlRecordProperty.content.match(
+            self._get_match_against(words)), Float).label('relevance')
+    return literal_column('0').label('relevance')
+
+  def _get_terms_query(self, terms):
+    if not self._use_match():
+      return MysqlRecordProperty.content.contains(terms)
+    words, short_tokens = self._tokenize(terms)
+    if not words and not short_tokens:
+      return MysqlRecordProperty.content.contains(terms)
+    filters = [MysqlRecordProperty.content.contains(token)
+               for token in short_tokens]
+    if words:
+      filters.append(MysqlRecordProperty.content.match(
+          self._get_match_against(words)))
+    return and_(*filters)
+
   def _get_filter_query(self, terms):
     whitelist = or_(
         # Because property values for custom attributes are
@@ -127,14 +185,7 @@ class MysqlIndexer(SqlIndexer):
     )
     if not terms:
       return whitelist
-    elif terms:
-      return and_(whitelist, MysqlRecordProperty.content.contains(terms))
-
-    # FIXME: Temporary (slow) fix for words shorter than MySQL default limit
-    # elif len(terms) < 4:
-    #   return MysqlRecordProperty.content.contains(terms)
-    # else:
-    #   return MysqlRecordProperty.content.match(terms)
+    return and_(whitelist, self._get_terms_query(terms))
 
   def _get_type_select_column(self, model):
     mapper = model._sa_class_manager.mapper
@@ -372,12 +423,17 @@ class MysqlIndexer(SqlIndexer):
       model_names = [m for m in model_names if m not in extra_params]
     return model_names
 
-  def search(self, terms, types=None, permission_type='read',
-             permission_model=None, contact_id=None, extra_params={}):
+  def _get_search_queries(self, columns, terms, types=None,
+                          permission_type='read', permission_model=None,
+                          contact_id=None, extra_params={}):
+    """Queries for all record properties matching the search.
+
+    Returns:
+      A list of queries selecting the given columns, the base query and one
+      for every type with extra params.
+    """
     model_names = self._get_grouped_types(types, extra_params)
-    query = db.session.query(
-        self.record_type.key, self.record_type.type,
-        self.record_type.property, self.record_type.content)
+    query = db.session.query(*columns)
     query = query.filter(
         self._get_type_query(model_names, permission_type, permission_model))
     query = query.filter(self._get_filter_query(terms))
@@ -387,28 +443,110 @@ class MysqlIndexer(SqlIndexer):
     if types is not None:
       model_names = [m for m in model_names if m in types]
 
-    unions = []
+    queries = [query]
     # Add extra_params and extra_colums:
     for k, v in extra_params.iteritems():
       if k not in model_names:
         continue
-      q = db.session.query(
-          self.record_type.key, self.record_type.type,
-          self.record_type.property, self.record_type.content)
+      q = db.session.query(*columns)
       q = q.filter(
           self._get_type_query([k], permission_type, permission_model))
       q = q.filter(self._get_filter_query(terms))
       q = self._add_owner_query(q, [k], contact_id)
       q = self._add_extra_params_query(q, k, v)
-      unions.append(q)
-    # Sort by title:
+      queries.append(q)
+    return queries
+
+  def search(self, terms, types=None, permission_type='read',
+             permission_model=None, contact_id=None, extra_params={}):
+    relevance = self._get_relevance_column(terms)
+    columns = (self.record_type.key, self.record_type.type,
+               self.record_type.property, self.record_type.content, relevance)
+    queries = self._get_search_queries(
+        columns, terms, types, permission_type, permission_model,
+        contact_id, extra_params)
+    # Sort by relevance and then by title:
     # FIXME: This only orders by `title` if title was the matching property
-    query = query.union(*unions)
-    query = query.order_by(case(
+    query = queries[0].union(*queries[1:])
+    query = query.order_by(relevance.desc(), case(
         [(self.record_type.property == "title", self.record_type.content)],
         else_=literal("ZZZZZ")))
     return query
 
+  @staticmethod
+  def _get_relevant_objects_filter(records, relevant_objects):
+    """Filter for records mapped to all of the relevant objects.
+
+    Every relevant object adds a semi-join against relationships in both
+    directions, which use the source and destination relationship indexes.
+
+    Args:
+      records: selectable with type and key columns.
+      relevant_objects: list of (type, id) pairs.
+    """
+    filters = []
+    for relevant_type, relevant_id in relevant_objects:
+      filters.append(or_(
+          exists().where(and_(
+              Relationship.source_type == records.c.type,
+              Relationship.source_id == records.c.key,
+              Relationship.destination_type == relevant_type,
+              Relationship.destination_id == relevant_id,
+          )),
+          exists().where(and_(
+              Relationship.destination_type == records.c.type,
+              Relationship.destination_id == records.c.key,
+              Relationship.source_type == relevant_type,
+              Relationship.source_id == relevant_id,
+          )),
+      ))
+    return and_(*filters)
+
+  def search_objects(self, terms, types=None, permission_type='read',
+                     permission_model=None, contact_id=None,
+                     extra_params={}, group_by_type=False, limit=None,
+                     offset=None, relevant_objects=None):
+    """Search for distinct objects instead of record properties.
+
+    Objects are de-duplicated in the database, so limit and offset apply to
+    objects and not to their matching properties. If relevant_objects is
+    given, only objects mapped to all of them are returned.
+
+    Returns:
+      A query for (key, type) rows ordered by relevance and then by title. If
+      group_by_type is set, rows are ordered by type first.
+    """
+    columns = (self.record_type.key.label('key'),
+               self.record_type.type.label('type'),
+               self.record_type.property.label('property'),
+               self.record_type.content.label('content'),
+               self._get_relevance_column(terms))
+    queries = self._get_search_queries(
+        columns, terms, types, permission_type, permission_model,
+        contact_id, extra_params)
+    if len(queries) == 1:
+      records = queries[0].statement.alias('records')
+    else:
+      records = union_all(*[q.statement for q in queries]).alias('records')
+
+    title = case([(records.c.property == "title", records.c.content)],
+                 else_=literal("ZZZZZ"))
+    order_by = [func.max(records.c.relevance).desc(), func.min(title),
+                records.c.type, records.c.key]
+    if group_by_type:
+      order_by.insert(0, records.c.type)
+    query = db.session.query(records.c.key, records.c.type)
+    if relevant_objects:
+      query = query.filter(
+          self._get_relevant_objects_filter(records, relevant_objects))
+    query = query.group_by(records.c.type, records.c.key)\
+        .order_by(*order_by)
+    if limit is not None:
+      query = query.limit(limit)
+    if offset:
+      query = query.offset(offset)
+    return query
+
   def counts(self, terms, group_by_type=True, types=None, contact_id=None,
              extra_params={}, extra_columns={}):
     model_names = self._get_grouped_types(types, extra_params)
@@ -0,0 +1,296 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: dan@reciprocitylabs.com
+# Maintained By: dan@reciprocitylabs.com
+
+"""Full text index rebuilding.
+
+A full reindex builds the records into a shadow table and swaps it with the
+live table at the end, so search keeps working while the reindex runs. Every
+model is indexed in id order and the last indexed id of every model is stored
+in a checkpoint table, so an interrupted reindex resumes where it stopped.
+Models can be indexed in parallel worker processes.
+
+An incremental reindex only rewrites the records of the objects updated since
+a given time, directly in the live table.
+"""
+
+import multiprocessing
+from collections import defaultdict
+
+from sqlalchemy import and_
+from sqlalchemy import Boolean
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import or_
+from sqlalchemy import String
+from sqlalchemy import Table
+
+from ggrc import db
+from ggrc import settings
+from ggrc.fulltext import get_indexer
+from ggrc.fulltext.recordbuilder import fts_record_for
+from ggrc.fulltext.recordbuilder import model_is_indexed
+from ggrc.models import all_models
+from ggrc.utils import benchmark
+
+
+SHADOW_SUFFIX = "_shadow"
+OLD_SUFFIX = "_old"
+
+# Tables of a reindex run are not a part of the application schema
+_metadata = MetaData()
+
+checkpoints_table = Table(
+    "fulltext_reindex_checkpoints", _metadata,
+    Column("model", String(64), primary_key=True),
+    Column("last_id", Integer, nullable=False, default=0),
+    Column("finished", Boolean, nullable=False, default=False),
+    Column("started_at", DateTime, nullable=False),
+)
+
+
+def get_indexed_models():
+  """Get the models that have full text records."""
+  # If we don't remove base classes, we get duplicates in the index.
+  inheritance_base_models = [
+      all_models.Directive, all_models.SystemOrProcess
+  ]
+  models_ = set(all_models.all_models) - set(inheritance_base_models)
+  return sorted((model for model in models_ if model_is_indexed(model)),
+                key=lambda model: model.__name__)
+
+
+def _get_record_table(name=None):
+  """Get the record table or a table with the same columns and a new name."""
+  table = get_indexer().record_type.__table__
+  if name is None:
+    return table
+  return Table(name, MetaData(), *[Column(column.name, column.type)
+                                   for column in table.columns])
+
+
+def _get_shadow_table():
+  return _get_record_table(_get_record_table().name + SHADOW_SUFFIX)
+
+
+def _get_custom_attribute_values(instances):
+  """Get the custom attribute values of instances.
+
+  Their properties are stored in the records of the instances.
+  """
+  ids_by_type = defaultdict(list)
+  for instance in instances:
+    ids_by_type[instance.__class__.__name__].append(instance.id)
+  value_model = all_models.CustomAttributeValue
+  return value_model.query.filter(or_(*[
+      and_(value_model.attributable_type == type_,
+           value_model.attributable_id.in_(ids))
+      for type_, ids in ids_by_type.items()])).all()
+
+
+def _get_rows(instances):
+  """Get the record property rows of instances and of their custom attribute
+  values."""
+  rows = []
+  for instance in instances + _get_custom_attribute_values(instances):
+    record = fts_record_for(instance)
+    for property_, content in record.properties.items():
+      rows.append({
+          "key": record.key,
+          "type": record.type,
+          "context_id": record.context_id,
+          "tags": record.tags,
+          "property": property_,
+          "content": content,
+      })
+  return rows
+
+
+def _get_model_query(model):
+  mapper_class = model._sa_class_manager.mapper.base_mapper.class_
+  return model.query.options(
+      db.undefer_group(mapper_class.__name__ + '_complete'),
+  )
+
+
+def _get_chunk_size():
+  return getattr(settings, "FULLTEXT_REINDEX_CHUNK_SIZE", 500)
+
+
+def _delete_records(table, instances):
+  """Delete all existing record properties of instances.
+
+  Properties the instances no longer have, such as the ones of deleted
+  custom attribute values, are removed as well.
+  """
+  conditions = [and_(table.c.key == instance.id,
+                     table.c.type == instance.__class__.__name__)
+                for instance in instances]
+  db.session.execute(table.delete().where(or_(*conditions)))
+
+
+def _index_objects(model, table, last_id=0, since=None, checkpoint=None):
+  """Write the records of a model in chunks of increasing ids.
+
+  Args:
+    model: model to index.
+    table: table to write the records to.
+    last_id: only objects with higher ids are indexed.
+    since: if given, only objects updated after this time are indexed and
+      their existing record properties are replaced.
+    checkpoint: callable that gets the last indexed id after every chunk,
+      before the chunk is committed.
+
+  Returns:
+    The last indexed id.
+  """
+  chunk_size = _get_chunk_size()
+  while True:
+    query = _get_model_query(model).filter(model.id > last_id)
+    if since is not None:
+      query = query.filter(model.updated_at >= since)
+    instances = query.order_by(model.id).limit(chunk_size).all()
+    if not instances:
+      return last_id
+    rows = _get_rows(instances)
+    if since is not None:
+      _delete_records(table, instances)
+    if rows:
+      # executemany is sent as a single multi-row INSERT by MySQLdb
+      db.session.execute(table.insert(), rows)
+    last_id = instances[-1].id
+    if checkpoint is not None:
+      checkpoint(last_id)
+    db.session.commit()
+
+
+def update_model(model_name, since, table_name=None):
+  """Reindex the objects of a model updated since the given time."""
+  with benchmark("Update index for {}".format(model_name)):
+    _index_objects(getattr(all_models, model_name),
+                   _get_record_table(table_name), since=since)
+
+
+def reindex_model(model_name, table_name):
+  """Index all objects of a model, resuming from its checkpoint."""
+  checkpoint = db.session.execute(
+      checkpoints_table.select().where(
+          checkpoints_table.c.model == model_name)).first()
+  if checkpoint.finished:
+    return
+
+  def save_checkpoint(last_id, finished=False):
+    db.session.execute(
+        checkpoints_table.update().where(
+            checkpoints_table.c.model == model_name
+        ).values(last_id=last_id, finished=finished))
+
+  table = _get_record_table(table_name)
+  # The shadow table is a MyISAM copy of the live table, so the rows of a
+  # chunk are kept when a crash loses the checkpoint committed with them
+  db.session.execute(table.delete().where(and_(
+      table.c.type == model_name,
+      table.c.key > checkpoint.last_id,
+  )))
+  db.session.commit()
+  with benchmark("Reindex {}".format(model_name)):
+    last_id = _index_objects(getattr(all_models, model_name), table,
+                             last_id=checkpoint.last_id,
+                             checkpoint=save_checkpoint)
+    save_checkpoint(last_id, finished=True)
+    db.session.commit()
+
+
+def _init_worker():
+  """Drop the database connections inherited from the parent process."""
+  db.engine.dispose()
+
+
+def _reindex_model_in_worker(args):
+  from ggrc.app import app
+  with app.app_context():
+    reindex_model(*args)
+
+
+def _start_run(model_names):
+  """Create the shadow and checkpoint tables unless a run is resumed.
+
+  Returns:
+    The time the (possibly resumed) run started.
+  """
+  checkpoints_table.create(db.engine, checkfirst=True)
+  live_name = _get_record_table().name
+  db.session.execute("CREATE TABLE IF NOT EXISTS {} LIKE {}".format(
+      live_name + SHADOW_SUFFIX, live_name))
+  started_at = db.session.query(
+      db.func.min(checkpoints_table.c.started_at)).scalar()
+  if started_at is None:
+    # updated_at is set by the database, so its clock has to be used
+    started_at = db.session.query(db.func.current_timestamp()).scalar()
+    # A shadow table without checkpoints is left over from a failed swap
+    db.session.execute("TRUNCATE TABLE {}".format(live_name + SHADOW_SUFFIX))
+  existing = set(model for model, in db.session.query(
+      checkpoints_table.c.model))
+  new_checkpoints = [{"model": name, "last_id": 0, "finished": False,
+                      "started_at": started_at}
+                     for name in model_names if name not in existing]
+  if new_checkpoints:
+    db.session.execute(checkpoints_table.insert(), new_checkpoints)
+  db.session.commit()
+  return started_at
+
+
+def _swap_tables():
+  """Replace the live table with the shadow table in one atomic rename."""
+  live_name = _get_record_table().name
+  db.session.execute("DROP TABLE IF EXISTS {}".format(live_name + OLD_SUFFIX))
+  db.session.execute("RENAME TABLE {live} TO {old}, {shadow} TO {live}".format(
+      live=live_name,
+      old=live_name + OLD_SUFFIX,
+      shadow=live_name + SHADOW_SUFFIX,
+  ))
+  db.session.execute("DROP TABLE {}".format(live_name + OLD_SUFFIX))
+  checkpoints_table.drop(db.engine)
+  db.session.commit()
+
+
+def reindex(since=None, workers=None):
+  """Rebuild the full text index.
+
+  Objects deleted while a full reindex runs may be left in the index until
+  they are reindexed again.
+
+  Args:
+    since: if given, only the objects updated after this time are reindexed
+      in the live table.
+    workers: number of worker processes, FULLTEXT_REINDEX_WORKERS by default.
+  """
+  model_names = [model.__name__ for model in get_indexed_models()]
+  if since is not None:
+    for model_name in model_names:
+      update_model(model_name, since)
+    return
+
+  started_at = _start_run(model_names)
+  shadow_name = _get_shadow_table().name
+  if workers is None:
+    workers = getattr(settings, "FULLTEXT_REINDEX_WORKERS", 1)
+  if workers > 1 and not getattr(settings, "APP_ENGINE", False):
+    pool = multiprocessing.Pool(workers, _init_worker)
+    try:
+      pool.map(_reindex_model_in_worker,
+               [(model_name, shadow_name) for model_name in model_names])
+    finally:
+      pool.close()
+      pool.join()
+  else:
+    for model_name in model_names:
+      reindex_model(model_name, shadow_name)
+
+  # Catch up with the objects changed while the shadow table was built
+  for model_name in model_names:
+    update_model(model_name, started_at, shadow_name)
+  _swap_tables()
@@ -3,34 +3,199 @@
 # Created By: david@reciprocitylabs.com
 # Maintained By: david@reciprocitylabs.com
 
+import datetime
+from collections import defaultdict
+
+from sqlalchemy import and_
+from sqlalchemy import or_
+
 from ggrc import db
 from . import Indexer
 
+# Custom attribute values are indexed as properties of the objects they belong
+# to, but every value has a record of its own (see RecordBuilder.as_record)
+ATTRIBUTE_VALUE_PREFIX = "attribute_value_"
+
+
+def _owns_property(record, property_):
+  """Check if a stored property is written by records like the given one.
+
+  Records of custom attribute values own only their own property, the
+  records of objects own all properties that are not custom attribute values.
+  """
+  if any(name.startswith(ATTRIBUTE_VALUE_PREFIX)
+         for name in record.properties):
+    return property_ in record.properties
+  return not property_.startswith(ATTRIBUTE_VALUE_PREFIX)
+
+
 class SqlIndexer(Indexer):
-  def create_record(self, record, commit=True):
-    for k,v in record.properties.items():
-      db.session.add(self.record_type(
-        key=record.key,
-        type=record.type,
-        context_id=record.context_id,
-        tags=record.tags,
-        property=k,
-        content=v,
-        ))
+  """Indexer that stores every record property as a table row.
+
+  All writes are batched: the records of a whole commit are written with a
+  single multi-row DELETE and a single executemany INSERT.
+  """
+
+  def _get_rows(self, records):
+    return [{
+        "key": record.key,
+        "type": record.type,
+        "context_id": record.context_id,
+        "tags": record.tags,
+        "property": k,
+        "content": v,
+    } for record in records for k, v in record.properties.items()]
+
+  def _get_keys_filter(self, keys):
+    """Filter for the records with any of the (key, type) pairs."""
+    keys_by_type = defaultdict(set)
+    for key, type_ in keys:
+      keys_by_type[type_].add(key)
+    return or_(*[and_(self.record_type.type == type_,
+                      self.record_type.key.in_(type_keys))
+                 for type_, type_keys in keys_by_type.items()])
+
+  def _get_properties_filter(self, properties):
+    """Filter for the (key, type, property) triples."""
+    return or_(*[and_(self.record_type.key == key,
+                      self.record_type.type == type_,
+                      self.record_type.property == property_)
+                 for key, type_, property_ in properties])
+
+  @staticmethod
+  def _normalize(value):
+    """Convert a property value to the text stored in the content column."""
+    if value is None or isinstance(value, unicode):
+      return value
+    if isinstance(value, str):
+      return value.decode("utf-8")
+    if isinstance(value, bool):
+      return unicode(int(value))
+    if isinstance(value, datetime.datetime):
+      return unicode(value.strftime("%Y-%m-%d %H:%M:%S"))
+    return unicode(value)
+
+  @classmethod
+  def _content_changed(cls, old, new):
+    return cls._normalize(old) != cls._normalize(new)
+
+  def create_records(self, records, commit=True):
+    rows = self._get_rows(records)
+    if rows:
+      db.session.execute(self.record_type.__table__.insert(), rows)
     if commit:
       db.session.commit()
 
-  def update_record(self, record, commit=True):
-    self.delete_record(record.key, record.type, commit=False)
-    self.create_record(record, commit=commit)
+  def update_records(self, records, commit=True, diff=False):
+    """Rewrite the index of the given records.
 
-  def delete_record(self, key, type, commit=True):
-    db.session.query(self.record_type).filter(\
-        self.record_type.key == key,
-        self.record_type.type == type).delete()
+    Args:
+      records: records to update.
+      commit: commit the session after the update.
+      diff: only rewrite the properties whose content changed and delete
+        the properties the records no longer have. Only the properties
+        owned by a record are compared, so that the record of a custom
+        attribute value does not touch the properties of its object.
+        Records whose context or tags changed are rewritten completely,
+        since search permissions are checked on the context of every
+        property row.
+    """
+    records = list(records)
+    if not diff:
+      self.delete_records([(r.key, r.type) for r in records], commit=False)
+      self.create_records(records, commit=commit)
+      return
+    if records:
+      stale, changed = self._get_changes(records)
+      if stale:
+        db.session.query(self.record_type).filter(
+            self._get_properties_filter(stale)
+        ).delete(synchronize_session=False)
+      if changed:
+        db.session.execute(self.record_type.__table__.insert(), changed)
     if commit:
       db.session.commit()
 
+  def _get_stored(self, records):
+    """Get the stored (context_id, tags, content) of all record properties.
+
+    Returns:
+      dict with the stored values of every property for each (key, type).
+    """
+    existing = db.session.query(
+        self.record_type.key, self.record_type.type,
+        self.record_type.context_id, self.record_type.tags,
+        self.record_type.property, self.record_type.content,
+    ).filter(self._get_keys_filter((r.key, r.type) for r in records))
+    stored = defaultdict(dict)
+    for key, type_, context_id, tags, property_, content in existing:
+      stored[(key, type_)][property_] = (context_id, tags, content)
+    return stored
+
+  def _get_changes(self, records):
+    """Get the properties to delete and the rows to insert for the records.
+
+    Returns:
+      A list of stale (key, type, property) triples and a list of rows.
+    """
+    stored = self._get_stored(records)
+    stale = []
+    changed = []
+    for record in records:
+      old = {property_: value for property_, value
+             in stored.get((record.key, record.type), {}).items()
+             if _owns_property(record, property_)}
+      record_stale, record_changed = self._diff_record(record, old)
+      stale.extend(record_stale)
+      changed.extend(record_changed)
+    return stale, changed
+
+  def _diff_record(self, record, old):
+    """Compare a record with its stored properties.
+
+    Args:
+      record: the updated record.
+      old: dict with the stored (context_id, tags, content) of every
+        property owned by the record.
+
+    Returns:
+      A list of stale (key, type, property) triples and a list of rows.
+    """
+    rows = self._get_rows([record])
+    if any((context_id, tags) != (record.context_id, record.tags)
+           for context_id, tags, _ in old.values()):
+      return [(record.key, record.type, property_) for property_ in old], rows
+    stale = [(record.key, record.type, property_) for property_ in old
+             if property_ not in record.properties]
+    changed = []
+    for row in rows:
+      old_row = old.get(row["property"])
+      if old_row is None:
+        changed.append(row)
+      elif self._content_changed(old_row[2], row["content"]):
+        stale.append((row["key"], row["type"], row["property"]))
+        changed.append(row)
+    return stale, changed
+
+  def delete_records(self, keys, commit=True):
+    """Delete the records with the given (key, type) pairs."""
+    keys = list(keys)
+    if keys:
+      db.session.query(self.record_type).filter(
+          self._get_keys_filter(keys)
+      ).delete(synchronize_session=False)
+    if commit:
+      db.session.commit()
+
+  def create_record(self, record, commit=True):
+    self.create_records([record], commit=commit)
+
+  def update_record(self, record, commit=True):
+    self.update_records([record], commit=commit)
+
+  def delete_record(self, key, type, commit=True):
+    self.delete_records([(key, type)], commit=commit)
+
   def delete_all_records(self, commit=True):
     db.session.query(self.record_type).delete()
     if commit:
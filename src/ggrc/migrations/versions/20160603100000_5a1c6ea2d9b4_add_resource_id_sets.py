@@ -0,0 +1,37 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""
+Add resource id sets
+
+Create Date: 2016-06-03 10:00:00.000000
+"""
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1c6ea2d9b4'
+down_revision = '2b8d7c0e5f13'
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.create_table(
+      "resource_id_sets",
+      sa.Column("set_key", sa.String(length=32), nullable=False),
+      sa.Column("resource_id", sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.PrimaryKeyConstraint("set_key", "resource_id"),
+  )
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_table("resource_id_sets")
@@ -17,6 +17,8 @@ from ggrc.utils import html_cleaner
 
 def create_db_with_create_all():
   import ggrc.models.all_models  # noqa
+  # tables that are not mapped to any model
+  import ggrc.rbac.resource_sets  # noqa
 
   db.create_all()
 
@@ -35,6 +37,7 @@ def create_db_with_migrations(quiet=False):
 
 def drop_db_with_drop_all():
   import ggrc.models.all_models  # noqa
+  import ggrc.rbac.resource_sets  # noqa
 
   if 'mysql' in settings.SQLALCHEMY_DATABASE_URI:
     db.engine.execute('SET FOREIGN_KEY_CHECKS = 0')
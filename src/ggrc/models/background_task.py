@@ -3,6 +3,7 @@
 # Created By: anze@reciprocitylabs.com
 # Maintained By: anze@reciprocitylabs.com
 
+import copy
 from functools import wraps
 from time import time
 from flask import request
@@ -14,6 +15,7 @@ from ggrc.login import get_current_user
 from ggrc.models.mixins import Base
 from ggrc.models.mixins import deferred
 from ggrc.models.mixins import Stateful
+from ggrc.models.reflection import PublishOnly
 from ggrc.models.types import CompressedType
 
 
@@ -29,12 +31,33 @@ class BackgroundTask(Base, Stateful, db.Model):
   name = deferred(db.Column(db.String), 'BackgroundTask')
   parameters = deferred(db.Column(CompressedType), 'BackgroundTask')
   result = deferred(db.Column(CompressedType), 'BackgroundTask')
+  progress = deferred(db.Column(CompressedType), 'BackgroundTask')
+
+  # Progress entries that are published, the rest is used to resume the task
+  PUBLISHED_PROGRESS = ('rows', 'processed', 'info')
 
   _publish_attrs = [
       'name',
-      'result'
+      'result',
+      PublishOnly('progress_info'),
   ]
 
+  @property
+  def progress_info(self):
+    if not self.progress:
+      return None
+    return {key: value for key, value in self.progress.items()
+            if key in self.PUBLISHED_PROGRESS}
+
+  def set_progress(self, progress):
+    """Store the progress of a running task in the current transaction.
+
+    The progress is committed together with the work it describes, so a
+    restarted task knows exactly what has already been done.
+    """
+    self.progress = copy.deepcopy(progress)
+    db.session.add(self)
+
   def start(self):
     self.status = "Running"
     db.session.add(self)
@@ -135,7 +135,27 @@ class RelationshipHelper(object):
       return None
 
   @classmethod
-  def get_special_mappings(cls, object_type, related_type, related_ids):
+  def custom_attribute_mapping_by_id(cls, object_type, related_type,
+                                     related_ids):
+    """ Same as custom_attribute_mapping with related ids as first column """
+    cav = models.CustomAttributeValue
+    return db.session.query(cav.attribute_object_id, cav.attributable_id)\
+        .filter(
+            (cav.attributable_type == object_type) &
+            (cav.attribute_value == related_type) &
+            cav.attribute_object_id.in_(related_ids))\
+        .union_all(
+        db.session.query(cav.attributable_id, cav.attribute_object_id)
+        .filter(
+            (cav.attribute_value == object_type) &
+            (cav.attributable_type == related_type) &
+            cav.attributable_id.in_(related_ids)
+        )
+    )
+
+  @classmethod
+  def get_type_mappings(cls, object_type, related_type, related_ids):
+    """ Mappings stored outside of the relationships table for some types """
     return [
         cls.audit_request(object_type, related_type, related_ids),
         cls.person_object(object_type, related_type, related_ids),
@@ -144,6 +164,11 @@ class RelationshipHelper(object):
         cls.program_audit(object_type, related_type, related_ids),
         cls.program_risk_assessment(object_type, related_type, related_ids),
         cls.task_group_object(object_type, related_type, related_ids),
+    ]
+
+  @classmethod
+  def get_special_mappings(cls, object_type, related_type, related_ids):
+    return cls.get_type_mappings(object_type, related_type, related_ids) + [
         cls.custom_attribute_mapping(object_type, related_type, related_ids),
     ]
 
@@ -204,3 +229,52 @@ class RelationshipHelper(object):
         object_type, related_type, related_ids))
 
     return cls._array_union(queries)
+
+  @classmethod
+  def get_ids_related_to_each(cls, object_type, related_type, related_ids):
+    """ get ids of objects related to each of the given objects
+
+    This is the grouped variant of get_ids_related_to that loads mappings of
+    many objects with a single query. It only supports mappings stored in
+    relationships and custom attributes.
+
+    Returns:
+      dict with a set of ids of objects with object_type for every related
+      id, or None if the types have other kinds of mappings.
+    """
+    if not related_ids:
+      return {}
+    type_mappings = cls.get_type_mappings(
+        object_type, related_type, related_ids)
+    type_mappings.extend(cls.get_extension_mappings(
+        object_type, related_type, related_ids))
+    if any(query is not None for query in type_mappings):
+      return None
+
+    destination_ids = db.session.query(
+        Relationship.source_id, Relationship.destination_id
+    ).filter(
+        and_(
+            Relationship.destination_type == object_type,
+            Relationship.source_type == related_type,
+            Relationship.source_id.in_(related_ids),
+        )
+    )
+    source_ids = db.session.query(
+        Relationship.destination_id, Relationship.source_id
+    ).filter(
+        and_(
+            Relationship.source_type == object_type,
+            Relationship.destination_type == related_type,
+            Relationship.destination_id.in_(related_ids),
+        )
+    )
+    query = destination_ids.union_all(
+        source_ids,
+        cls.custom_attribute_mapping_by_id(
+            object_type, related_type, related_ids),
+    )
+    related = {related_id: set() for related_id in related_ids}
+    for related_id, object_id in query:
+      related[related_id].add(object_id)
+    return related
@@ -86,16 +86,44 @@ def handle_assignable_modified(obj):
 
 
 def handle_assignable_created(obj):
-  name = "{}_open".format(obj._inflector.table_singular)
-  notif_type = models.NotificationType.query.filter_by(name=name).first()
-  _add_notification(obj, notif_type)
+  handle_assignables_created([obj])
+
+
+def handle_assignables_created(objects):
+  """Add open notifications for new assignable objects.
+
+  Args:
+    objects (list of Assignable): new objects of a single request or import.
+  """
+  # pylint: disable=protected-access
+  notif_types = {}
+  for obj in objects:
+    name = "{}_open".format(obj._inflector.table_singular)
+    if name not in notif_types:
+      notif_types[name] = models.NotificationType.query.filter_by(
+          name=name).first()
+    _add_notification(obj, notif_types[name])
 
 
 def handle_assignable_deleted(obj):
-  models.Notification.query.filter_by(
-      object_id=obj.id,
-      object_type=obj.type,
-  ).delete()
+  handle_assignables_deleted([obj])
+
+
+def handle_assignables_deleted(objects):
+  """Remove all notifications of deleted assignable objects.
+
+  Args:
+    objects (list of Assignable): deleted objects of a single request or
+      import.
+  """
+  ids_by_type = {}
+  for obj in objects:
+    ids_by_type.setdefault(obj.type, set()).add(obj.id)
+  for object_type, ids in ids_by_type.items():
+    models.Notification.query.filter(
+        models.Notification.object_type == object_type,
+        models.Notification.object_id.in_(ids),
+    ).delete(synchronize_session="fetch")
 
 
 def handle_reminder(obj, reminder_type):
@@ -132,20 +160,21 @@ def register_handlers():
   # functions.
   # pylint: disable=unused-argument,unused-variable
 
-  @Resource.model_deleted.connect_via(models.Request)
-  @Resource.model_deleted.connect_via(models.Assessment)
-  def assignable_deleted_listener(sender, obj=None, src=None, service=None):
-    handle_assignable_deleted(obj)
+  @Resource.model_deleted_batch.connect_via(models.Request)
+  @Resource.model_deleted_batch.connect_via(models.Assessment)
+  def assignable_deleted_listener(sender, objects=None, service=None):
+    handle_assignables_deleted(objects)
 
   @Resource.model_put.connect_via(models.Request)
   @Resource.model_put.connect_via(models.Assessment)
   def assignable_modified_listener(sender, obj=None, src=None, service=None):
     handle_assignable_modified(obj)
 
-  @Resource.model_posted_after_commit.connect_via(models.Request)
-  @Resource.model_posted_after_commit.connect_via(models.Assessment)
-  def assignable_created_listener(sender, obj=None, src=None, service=None):
-    handle_assignable_created(obj)
+  @Resource.model_posted_after_commit_batch.connect_via(models.Request)
+  @Resource.model_posted_after_commit_batch.connect_via(models.Assessment)
+  def assignable_created_listener(sender, objects=None, sources=None,
+                                  service=None):
+    handle_assignables_created(objects)
 
   @Resource.model_put.connect_via(models.Assessment)
   def assessment_send_reminder(sender, obj=None, src=None, service=None):
@@ -32,3 +32,15 @@ def context_query_filter(context_column, contexts):
       # No valid contexts
       return False
     return filter_expr
+
+
+def resource_query_filter(id_column, resources):
+  '''
+  Intended for use by `model.query.filter(...)` with the ids of single
+  resources a user has permissions for.
+  Large lists of ids are materialized in a table instead of being inlined,
+  see `ggrc.rbac.resource_sets`.
+  '''
+  from ggrc.rbac.resource_sets import resource_filter
+
+  return resource_filter(id_column, resources)
@@ -104,6 +104,11 @@ def read_resources_for(resource_type):
   """All resources in which the user has read permission."""
   return permissions_for(get_user()).read_resources_for(resource_type)
 
+def read_filter_for(model):
+  """SQL filter for the instances of the model the user can read, or None if
+  every instance must be checked with is_allowed_read_for."""
+  return permissions_for(get_user()).read_filter_for(model)
+
 def update_resources_for(resource_type):
   """All resources in which the user has update permission."""
   return permissions_for(get_user()).update_resources_for(resource_type)
@@ -5,8 +5,17 @@
 
 from collections import namedtuple
 from flask import g
+from flask import has_app_context
 from flask.ext.login import current_user
+from sqlalchemy import and_
+from sqlalchemy import false
+from sqlalchemy import or_
+from sqlalchemy import true
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.orm.attributes import QueryableAttribute
+from werkzeug.local import LocalProxy
 from .user_permissions import UserPermissions
+from ggrc.rbac import resource_query_filter
 from ggrc.rbac.permissions import permissions_for as find_permissions
 from ggrc.rbac.permissions import is_allowed_create
 from ggrc.models import get_model
@@ -129,6 +138,225 @@ _CONDITIONS_MAP = {
 }
 
 
+def _get_filter_attr(model, name):
+  """Get a model attribute that can be used in a SQL filter, or None."""
+  if "." in name:
+    return None
+  attr = getattr(model, name, None)
+  if isinstance(attr, (QueryableAttribute, AssociationProxy)):
+    return attr
+  return None
+
+
+def _get_filter_value(value):
+  value = resolve_permission_variable(value)
+  if isinstance(value, LocalProxy):
+    # pylint: disable=protected-access
+    value = value._get_current_object()
+  return value
+
+
+def contains_condition_filter(model, value, list_property):
+  """SQL form of `contains_condition`."""
+  attr = _get_filter_attr(model, list_property)
+  if attr is None:
+    return None
+  return attr.contains(_get_filter_value(value))
+
+
+def is_condition_filter(model, value, property_name):
+  """SQL form of `is_condition`."""
+  attr = _get_filter_attr(model, property_name)
+  if not isinstance(attr, QueryableAttribute):
+    return None
+  return attr == _get_filter_value(value)
+
+
+def in_condition_filter(model, value, property_name):
+  """SQL form of `in_condition`."""
+  attr = _get_filter_attr(model, property_name)
+  if not isinstance(attr, QueryableAttribute):
+    return None
+  return attr.in_(_get_filter_value(value))
+
+"""
+SQL forms of the condition functions, with a signature
+
+..
+
+  func(model, **kwargs)
+
+that return None when the condition can't be expressed for the model.
+Conditions without an entry (such as 'relationship') can only be checked on
+loaded instances.
+"""
+_CONDITION_FILTERS_MAP = {
+    contains_condition: contains_condition_filter,
+    is_condition: is_condition_filter,
+    in_condition: in_condition_filter,
+}
+
+
+def _conditions_filter(model, conditions):
+  """Filter for the instances that match any of the conditions.
+
+  Returns:
+    A filter expression, or None if a condition can't be expressed in SQL.
+  """
+  condition_filters = []
+  for func, terms in conditions:
+    filter_func = _CONDITION_FILTERS_MAP.get(func)
+    condition_filter = filter_func and filter_func(model, **terms)
+    if condition_filter is None:
+      return None
+    condition_filters.append(condition_filter)
+  return or_(*condition_filters)
+
+
+def _plain_context_clauses(context_column, contexts, all_conditions):
+  """Filters for the contexts in which all instances are allowed.
+
+  Returns:
+    A list of filter expressions, or None if all instances are allowed.
+  """
+  if None in all_conditions:
+    return []
+  conditional = [c for c in all_conditions if c is not None]
+  if None in contexts:
+    if context_column is None or not conditional:
+      return None
+    return [or_(context_column == None,  # noqa
+                ~context_column.in_(conditional))]
+  plain = contexts.difference(conditional)
+  if context_column is None or not plain:
+    return []
+  return [context_column.in_(plain)]
+
+
+def _condition_clauses(model, context_column, all_conditions):
+  """Filters for the instances allowed by the conditions of each context.
+
+  Returns:
+    A list of filter expressions, or None if a condition can't be expressed
+    in SQL.
+  """
+  clauses = []
+  for context_id, conditions in all_conditions.items():
+    if context_id is not None and context_column is None:
+      continue
+    condition_filter = _conditions_filter(model, conditions)
+    if condition_filter is None:
+      return None
+    if context_id is not None:
+      condition_filter = and_(context_column == context_id,
+                              condition_filter)
+    clauses.append(condition_filter)
+  return clauses
+
+
+class CompiledPermissions(object):
+  """Indexed form of a permissions dictionary.
+
+  The permissions dictionary from `load_permissions_for` keeps contexts and
+  resources as plain lists, so every membership test is linear in the number
+  of ids the user has access to. This structure is built once per permissions
+  dictionary and stores frozensets for every action and resource type, so
+  that all permission checks are constant time set lookups.
+  """
+
+  def __init__(self, permissions, admin_permission):
+    self.source = permissions
+    permissions = permissions or {}
+    self._contexts = {}
+    self._resources = {}
+    self._conditions = {}
+    for action, types in permissions.items():
+      if not isinstance(types, dict):
+        continue
+      for resource_type, type_permissions in types.items():
+        if not type_permissions:
+          continue
+        key = (action, resource_type)
+        self._contexts[key] = frozenset(
+            type_permissions.get('contexts', ()))
+        self._resources[key] = frozenset(
+            type_permissions.get('resources', ()))
+        conditions = {}
+        for context_id, context_conditions in \
+                type_permissions.get('conditions', {}).items():
+          conditions[context_id] = tuple(
+              (_CONDITIONS_MAP[str(condition['condition'])],
+               condition.get('terms') or {})
+              for condition in context_conditions)
+        self._conditions[key] = conditions
+    admin_key = (admin_permission.action, admin_permission.resource_type)
+    self._admin_contexts = self._contexts.get(admin_key, frozenset())
+    self.is_admin = (
+        None in self._admin_contexts or
+        admin_permission.context_id in self._admin_contexts or
+        None in self._resources.get(admin_key, frozenset()))
+    self._all_type = admin_permission.resource_type
+    self._contexts_for = {}
+    self._resources_for = {}
+
+  def has_type(self, action, resource_type):
+    """Check if there are any permissions for the action and resource type"""
+    return (action, resource_type) in self._contexts
+
+  def contexts(self, action, resource_type):
+    return self._contexts.get((action, resource_type), frozenset())
+
+  def resources(self, action, resource_type):
+    return self._resources.get((action, resource_type), frozenset())
+
+  def conditions(self, action, resource_type, context_id):
+    """Conditions that apply to resources in the given context"""
+    conditions = self._conditions.get((action, resource_type), {})
+    return conditions.get(None, ()) + conditions.get(context_id, ())
+
+  def all_conditions(self, action, resource_type):
+    """Conditions indexed by context, with None for global conditions"""
+    return self._conditions.get((action, resource_type), {})
+
+  def match(self, action, resource_type, resource_id, context_id):
+    """Check if the action is allowed on a single resource or context"""
+    contexts = self.contexts(action, resource_type)
+    return (None in contexts or
+            context_id in contexts or
+            resource_id in self.resources(action, resource_type) or
+            context_id in self.contexts(action, self._all_type))
+
+  def is_admin_in(self, context_id):
+    """Check for admin permissions in the given context"""
+    return self.is_admin or context_id in self._admin_contexts
+
+  def contexts_for(self, action, resource_types):
+    """All contexts for the action on any of the resource types.
+
+    Returns:
+      A frozenset of context ids, including the contexts in which the user is
+      an admin, or None if any context is allowed.
+    """
+    key = (action, tuple(resource_types))
+    if key not in self._contexts_for:
+      contexts = set(self._admin_contexts)
+      for resource_type in resource_types:
+        contexts.update(self.contexts(action, resource_type))
+      self._contexts_for[key] = None if None in contexts \
+          else frozenset(contexts)
+    return self._contexts_for[key]
+
+  def resources_for(self, action, resource_types):
+    """All resource ids for the action on any of the resource types."""
+    key = (action, tuple(resource_types))
+    if key not in self._resources_for:
+      resources = set()
+      for resource_type in resource_types:
+        resources.update(self.resources(action, resource_type))
+      self._resources_for[key] = frozenset(resources)
+    return self._resources_for[key]
+
+
 class DefaultUserPermissions(UserPermissions):
   # super user, context_id 0 indicates all contexts
   ADMIN_PERMISSION = Permission(
@@ -148,92 +376,112 @@ class DefaultUserPermissions(UserPermissions):
 
   def _permission_match(self, permission, permissions):
     """Check if the user has the given permission"""
-
-    if None in \
-      permissions\
-        .get(permission.action, {})\
-        .get(permission.resource_type, {})\
-        .get('contexts', []):
-      return True
-    return \
-        permission.resource_id in permissions\
-            .get(permission.action, {})\
-            .get(permission.resource_type, {})\
-            .get('resources', [])\
-        or permission.context_id in \
-          permissions\
-            .get(permission.action, {})\
-            .get(permission.resource_type, {})\
-            .get('contexts', [])\
-        or permission.context_id in \
-          permissions\
-            .get(permission.action, {})\
-            .get(self.ADMIN_PERMISSION.resource_type, {})\
-            .get('contexts', [])
+    return self._compile(permissions).match(
+        permission.action, permission.resource_type,
+        permission.resource_id, permission.context_id)
 
   def _permissions(self):
     """Returns request permission from the global scope"""
     return getattr(g, '_request_permissions', {})
 
+  def _compile(self, permissions):
+    """Get the compiled form of a permissions dictionary.
+
+    The compiled permissions are kept for the duration of the request (or on
+    this object outside of requests) and rebuilt only when the permissions
+    dictionary itself is replaced.
+    """
+    holder = g if has_app_context() else self
+    compiled = getattr(holder, '_compiled_permissions', None)
+    if compiled is None or compiled.source is not permissions:
+      compiled = CompiledPermissions(permissions, self.ADMIN_PERMISSION)
+      setattr(holder, '_compiled_permissions', compiled)
+    return compiled
+
+  def _compiled_permissions(self):
+    return self._compile(self._permissions())
+
   def _is_allowed(self, permission):
-    permissions = self._permissions()
-    if permission.resource_type != '/admin' \
-       and permission.context_id \
-       and self._is_allowed(permission._replace(context_id=None)):
+    permissions = self._compiled_permissions()
+    if permissions.is_admin:
       return True
-    if self._permission_match(permission, permissions):
+    if permissions.match(permission.action, permission.resource_type,
+                         permission.resource_id, permission.context_id):
       return True
-    if self._permission_match(self.ADMIN_PERMISSION, permissions):
+    if permission.resource_type != '/admin' \
+       and permission.context_id \
+       and permissions.match(permission.action, permission.resource_type,
+                             permission.resource_id, None):
       return True
-    return self._permission_match(
-        self._admin_permission_for_context(permission.context_id),
-        permissions)
+    return permissions.is_admin_in(permission.context_id)
 
   def _is_allowed_for(self, instance, action):
+    permissions = self._compiled_permissions()
     # Check for admin permission
-    if self._permission_match(self.ADMIN_PERMISSION, self._permissions()):
+    if permissions.is_admin:
       return True
-    permissions = self._permissions()
-    if not permissions.get(action) or not permissions[action].get(instance._inflector.model_singular):
+    resource_type = instance._inflector.model_singular
+    if not permissions.has_type(action, resource_type):
       return False
-    resources = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('resources', [])
-    contexts = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('contexts', [])
+    if instance.id in permissions.resources(action, resource_type):
+      return True
     # We can't use instance.context_id, because it requires the
     # object <-> context mapping to be created,
     # which isn't the case when creating objects
     context_id = None
     if hasattr(instance, 'context') and hasattr(instance.context, 'id'):
       context_id = instance.context.id
-    if instance.id in resources:
-      return True
-    no_context_conditions = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('conditions', {})\
-        .setdefault(None, [])
-
-    context_conditions = self._permissions()\
-        .setdefault(action, {})\
-        .setdefault(instance._inflector.model_singular, {})\
-        .setdefault('conditions', {})\
-        .setdefault(context_id, [])
-    conditions = no_context_conditions + context_conditions
+    contexts = permissions.contexts(action, resource_type)
+    conditions = permissions.conditions(action, resource_type, context_id)
     # Check any conditions applied per resource
     if (None in contexts or context_id in contexts) and not conditions:
       return True
-    for condition in conditions:
-      func = _CONDITIONS_MAP[str(condition['condition'])]
-      terms = condition.setdefault('terms', {})
+    for func, terms in conditions:
       if func(instance, **terms):
         return True
     return False
 
+  def _filter_for(self, model, action):
+    """SQL form of `_is_allowed_for` for all instances of a model.
+
+    Returns:
+      A filter expression for the model query, or None if the permissions
+      contain conditions that can only be checked on loaded instances.
+    """
+    permissions = self._compiled_permissions()
+    if permissions.is_admin:
+      return true()
+    resource_type = model._inflector.model_singular
+    if not permissions.has_type(action, resource_type):
+      return false()
+    context_column = getattr(model, 'context_id', None)
+    contexts = permissions.contexts(action, resource_type)
+    resources = permissions.resources(action, resource_type)
+    all_conditions = {
+        context_id: conditions for context_id, conditions in
+        permissions.all_conditions(action, resource_type).items()
+        if conditions
+    }
+
+    plain_clauses = _plain_context_clauses(context_column, contexts,
+                                           all_conditions)
+    if plain_clauses is None:
+      return true()
+    condition_clauses = _condition_clauses(model, context_column,
+                                           all_conditions)
+    if condition_clauses is None:
+      return None
+    clauses = plain_clauses + condition_clauses
+    if resources:
+      clauses.insert(0, resource_query_filter(model.id, resources))
+    if not clauses:
+      return false()
+    return or_(*clauses)
+
+  def read_filter_for(self, model):
+    """SQL filter for the instances of the model the user can read"""
+    return self._filter_for(model, 'read')
+
   def is_allowed_create(self, resource_type, resource_id, context_id):
     """Whether or not the user is allowed to create a resource of the specified
     type in the context."""
@@ -271,53 +519,36 @@ class DefaultUserPermissions(UserPermissions):
     return self._is_allowed_for(instance, 'delete')
 
   def _get_resources_for(self, action, resource_type):
-    """Get resources resources (object ids) for a given action and resource_type"""
-    permissions = self._permissions()
+    """Get resources resources (object ids) for a given action and resource_type
 
-    if self._permission_match(self.ADMIN_PERMISSION, permissions):
+    Returns a frozenset of ids, or None if the user is an admin.
+    """
+    permissions = self._compiled_permissions()
+
+    if permissions.is_admin:
       return None
 
-    # Get the list of resources for a given resource type and any
+    # Get the set of resources for a given resource type and any
     #   superclasses
-    resource_types = get_contributing_resource_types(resource_type)
-
-    ret = []
-    for resource_type in resource_types:
-      ret.extend(
-          permissions
-          .get(action, {})
-          .get(resource_type, {})
-          .get('resources', []))
-    return ret
+    return permissions.resources_for(
+        action, get_contributing_resource_types(resource_type))
 
   def _get_contexts_for(self, action, resource_type):
     # FIXME: (Security) When applicable, we should explicitly assert that no
     #   permissions are expected (e.g. that every user has ADMIN_PERMISSION).
-    permissions = self._permissions()
+    permissions = self._compiled_permissions()
 
-    if self._permission_match(self.ADMIN_PERMISSION, permissions):
+    if permissions.is_admin:
       return None
 
     # Get the list of contexts for a given resource type and any
-    #   superclasses
-    resource_types = get_contributing_resource_types(resource_type)
-
-    ret = []
-    for resource_type in resource_types:
-      ret.extend(permissions\
-          .get(action, {})\
-          .get(resource_type, {})\
-          .get('contexts', []))
-
-    # Extend with the list of all contexts for which the user is an ADMIN
-    admin_list = list(
-        permissions.get(self.ADMIN_PERMISSION.action, {})\
-            .get(self.ADMIN_PERMISSION.resource_type, {})\
-            .get('contexts', ()))
-    ret.extend(admin_list)
-    if None in ret:
+    #   superclasses, extended with all contexts for which the user is an ADMIN
+    contexts = permissions.contexts_for(
+        action, get_contributing_resource_types(resource_type))
+    if contexts is None:
       return None
-    return ret
+    # Callers are allowed to modify the returned list
+    return list(contexts)
 
   def create_contexts_for(self, resource_type):
     """All contexts in which the user has create permission."""
@@ -0,0 +1,96 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Materialized sets of permission resource ids.
+
+Users that own or are assigned to many objects get read permissions for
+tens of thousands of single resources. Inlining such id lists in every query
+of a request makes the SQL text huge, so large lists are inserted once into
+the resource_id_sets table and queries select the ids from there.
+
+The rows are written in the transaction of the session, so they are only
+visible to queries of the same session. They are deleted before the session
+commits and forgotten when it rolls back.
+"""
+
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy import select
+from sqlalchemy.orm.session import Session
+
+from ggrc import db
+from ggrc import settings
+
+
+# Number of rows inserted with a single statement
+INSERT_CHUNK_SIZE = 5000
+
+# Key of the materialized sets in the session info
+SESSION_KEY = "resource_id_sets"
+
+resource_id_sets = db.Table(
+    "resource_id_sets",
+    db.Column("set_key", db.String(32), primary_key=True),
+    db.Column("resource_id", db.Integer, primary_key=True,
+              autoincrement=False),
+)
+
+
+def get_threshold():
+  """Largest list of ids that is inlined, RESOURCE_ID_SET_THRESHOLD."""
+  return getattr(settings, "RESOURCE_ID_SET_THRESHOLD", 1000)
+
+
+def _materialize(session, resources):
+  """Get the key of the set with the given ids, inserting it if needed."""
+  sets = session.info.setdefault(SESSION_KEY, {})
+  resources = frozenset(resources)
+  set_key = sets.get(resources)
+  if set_key is None:
+    set_key = uuid.uuid4().hex
+    ids = sorted(resources)
+    for start in xrange(0, len(ids), INSERT_CHUNK_SIZE):
+      session.execute(resource_id_sets.insert(), [
+          {"set_key": set_key, "resource_id": id_}
+          for id_ in ids[start:start + INSERT_CHUNK_SIZE]
+      ])
+    sets[resources] = set_key
+  return set_key
+
+
+def resource_filter(column, resources):
+  """Filter for column values in a list of resource ids.
+
+  Args:
+    column: id column of the filtered objects.
+    resources (iterable of int): ids of the readable resources.
+
+  Returns:
+    An IN filter with the ids, or with a subquery of the materialized set if
+    there are more than RESOURCE_ID_SET_THRESHOLD ids.
+  """
+  if len(resources) <= get_threshold():
+    return column.in_(resources)
+  set_key = _materialize(db.session(), resources)
+  return column.in_(
+      select([resource_id_sets.c.resource_id]).where(
+          resource_id_sets.c.set_key == set_key))
+
+
+def delete_sets_before_commit(session):
+  sets = session.info.get(SESSION_KEY)
+  if sets:
+    session.execute(resource_id_sets.delete().where(
+        resource_id_sets.c.set_key.in_(sets.values())))
+
+
+def clear_sets(session):
+  session.info.pop(SESSION_KEY, None)
+
+
+event.listen(Session, "before_commit", delete_sets_before_commit)
+event.listen(Session, "after_commit", clear_sets)
+event.listen(Session, "after_rollback", clear_sets)
@@ -69,6 +69,14 @@ class UserPermissions(object):
     """All contexts in which the user has delete permission."""
     raise NotImplementedError()
 
+  def read_filter_for(self, model):
+    """SQL filter for the instances of ``model`` the user can read.
+
+    Providers return None when the permissions can't be expressed in SQL, in
+    which case ``is_allowed_read_for`` is checked for every instance.
+    """
+    return None
+
 class BasicUserPermissions(UserPermissions):
   """Basic implementation of a UserPermissions object."""
 
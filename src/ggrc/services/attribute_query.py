@@ -13,8 +13,29 @@ from sqlalchemy.types import TypeEngine, Boolean, Date, DateTime, Integer
 from werkzeug.exceptions import BadRequest
 
 AttributeQuery = namedtuple('AttributeQuery', 'filter joinlist options')
+PropertyPath = namedtuple('PropertyPath', 'kind attr joinlist')
+
+# Maximum number of entries in each of the compiled path caches
+MAX_CACHE_SIZE = 10000
+
+# Marks keys missing from the path caches, which also cache None values
+_MISSING = object()
+
+
+def _cache_set(cache, key, value):
+  # parameter names come from requests, so the caches must stay bounded
+  if len(cache) >= MAX_CACHE_SIZE:
+    cache.clear()
+  cache[key] = value
+
 
 class AttributeQueryBuilder(object):
+  # Compiled property paths by model and parameter name, None for names that
+  # are not valid property paths
+  _paths = {}
+  # Compiled property paths of valid parameters by model and parameter names
+  _signatures = {}
+
   def __init__(self, model):
     self.model = model
 
@@ -64,16 +85,20 @@ class AttributeQueryBuilder(object):
         not isinstance(attr.type, TypeEngine):
       raise self.bad_query_parameter(attrname)
 
-  def process_property_path(self, arg, value):
+  def compile_property_path(self, arg):
+    """Resolve the model attribute and joins of a query parameter name.
+
+    Returns:
+      PropertyPath with the kind of the filter, which is one of "in", "null",
+      "eq" or "include", and the resolved attribute and joins.
+    """
     joinlist = []
-    filters = []
-    options = []
     if arg.endswith('__in'):
-      clean_arg = arg[0:-4]
+      kind, clean_arg = 'in', arg[0:-4]
     elif arg.endswith('__null'):
-      clean_arg = arg[0:-6]
+      kind, clean_arg = 'null', arg[0:-6]
     else:
-      clean_arg = arg
+      kind, clean_arg = 'eq', arg
     segments = clean_arg.split('.')
     if len(segments) > 1:
       current_model = self.model
@@ -85,20 +110,44 @@ class AttributeQueryBuilder(object):
         attr = self.get_attr_for_model(segment, current_model)
       self.check_valid_property(attr, segment)
     elif clean_arg == '__include':
-      pass
+      return PropertyPath('include', None, joinlist)
     else:
       attr = self.get_attr_for_model(clean_arg, self.model)
       self.check_valid_property(attr, clean_arg)
-    if arg.endswith('__in'):
+    return PropertyPath(kind, attr, joinlist)
+
+  def get_property_path(self, arg):
+    """Get the compiled property path of a query parameter name.
+
+    Returns:
+      PropertyPath, or None if the name is not a valid property path.
+    """
+    key = (self.model, arg)
+    path = self._paths.get(key, _MISSING)
+    if path is not _MISSING:
+      return path
+    try:
+      path = self.compile_property_path(arg)
+    except BadRequest:
+      path = None
+    _cache_set(self._paths, key, path)
+    return path
+
+  def build_filters(self, path, arg, value):
+    """Build the filters of a compiled property path for a parameter value."""
+    filters = []
+    options = []
+    attr = path.attr
+    if path.kind == 'in':
       value = value.split(',')
       value = [self.coerce_value_for_query_param(attr, arg, v) for v in value]
       filters.append(attr.in_(value))
-    elif arg.endswith('__null'):
+    elif path.kind == 'null':
       if(value in [0, 'false', 'False', 'FALSE', False]):
         filters.append(attr != None)
       else:
         filters.append(attr == None)
-    elif clean_arg == '__include':
+    elif path.kind == 'include':
       options.extend(self.process_eager_loading(value))
     else:
       value = self.coerce_value_for_query_param(attr, arg, value)
@@ -106,7 +155,12 @@ class AttributeQueryBuilder(object):
         filters.append(attr == cast(value, attr.type))
       else:
         filters.append(attr == None)
-    return joinlist, filters, options
+    return filters, options
+
+  def process_property_path(self, arg, value):
+    path = self.compile_property_path(arg)
+    filters, options = self.build_filters(path, arg, value)
+    return list(path.joinlist), filters, options
 
   def resolve_path_segment(self, segment, model):
     attr = self.get_attr_for_model(segment, model)
@@ -135,16 +189,33 @@ class AttributeQueryBuilder(object):
       options.append(joinedload_all(realized_path))
     return options
 
+  def get_signature_paths(self, args):
+    """Get the compiled property paths of all valid query parameters.
+
+    Paths are cached by the model and the parameter names, so requests with
+    the same parameters skip resolving and validating the names.
+
+    Returns:
+      list of (parameter name, PropertyPath) tuples.
+    """
+    key = (self.model, tuple(sorted(args.keys())))
+    paths = self._signatures.get(key, _MISSING)
+    if paths is _MISSING:
+      paths = [(arg, self.get_property_path(arg)) for arg in key[1]]
+      paths = [(arg, path) for arg, path in paths if path is not None]
+      _cache_set(self._signatures, key, paths)
+    return paths
+
   def collection_filters(self, args):
     """Create filter expressions using ``request.args``"""
     filter = None
     joinlist = []
     filter_expressions = []
     optionlist = []
-    for arg, value in args.items():
+    for arg, path in self.get_signature_paths(args):
       try:
-        joins, filters, options = self.process_property_path(arg, value)
-        joinlist.extend(joins)
+        filters, options = self.build_filters(path, arg, args[arg])
+        joinlist.extend(path.joinlist)
         optionlist.extend(options)
         filter_expressions.extend(filters)
       except BadRequest:
@@ -8,6 +8,8 @@
 resources.
 """
 
+import base64
+import collections
 import datetime
 import hashlib
 import json
@@ -20,7 +22,7 @@ from urllib import urlencode
 from blinker import Namespace
 from flask import url_for, request, current_app, g, has_request_context
 from flask.views import View
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, tuple_
 from sqlalchemy.exc import IntegrityError
 import sqlalchemy.orm.exc
 from werkzeug.exceptions import BadRequest, Forbidden
@@ -30,20 +32,26 @@ import ggrc.models
 from flask.ext.sqlalchemy import Pagination
 from ggrc import db, utils
 from ggrc.utils import as_json, UnicodeSafeJsonWrapper, benchmark
+from ggrc.extensions import get_extension_modules
 from ggrc.fulltext import get_indexer
 from ggrc.fulltext.recordbuilder import fts_record_for
 from ggrc.login import get_current_user_id, get_current_user
 from ggrc.models.cache import Cache
 from ggrc.models.event import Event
+from ggrc.models.reflection import AttributeInfo
 from ggrc.models.revision import Revision
 from ggrc.models.exceptions import ValidationError, translate_message
 from ggrc.rbac import permissions, context_query_filter
+from ggrc.rbac import resource_query_filter
 from .attribute_query import AttributeQueryBuilder
 from ggrc.models.background_task import BackgroundTask, create_task
 from ggrc import settings
+from ggrc.cache import representation_cache
 
 
 CACHE_EXPIRY_COLLECTION = 60
+PERMISSION_CACHE_TIMEOUT = 1800  # 30 minutes
+PERMISSION_CACHE_STATS = ('hits', 'misses', 'user_flushes', 'full_flushes')
 
 
 def get_oauth_credentials():
@@ -165,6 +173,7 @@ def update_memcache_before_commit(context, modified_objects, expiry_time):
   Preparing the memccache entries to be updated before DB commit
   Also update the memcache to indicate the status cache operation
   'InProgress' waiting for DB commit
+  Cached stubs of modified objects are marked for deletion as well
   Raises Exception on failures, cannot proceed with DB commit
 
   Args:
@@ -175,10 +184,15 @@ def update_memcache_before_commit(context, modified_objects, expiry_time):
     None
 
   """
+  stub_keys = []
+  for objects in (modified_objects.dirty, modified_objects.deleted):
+    stub_keys.extend(ggrc.builder.json.invalidate_stubs(objects))
+
   if getattr(settings, 'MEMCACHE_MECHANISM', False) is False:
     return
 
   context.cache_manager = _get_cache_manager()
+  context.cache_manager.marked_for_delete.extend(stub_keys)
 
   if len(modified_objects.new) > 0:
     memcache_mark_for_deletion(context, modified_objects.new.items())
@@ -189,6 +203,9 @@ def update_memcache_before_commit(context, modified_objects, expiry_time):
   if len(modified_objects.deleted) > 0:
     memcache_mark_for_deletion(context, modified_objects.deleted.items())
 
+  context.stale_permission_users = get_users_with_stale_permissions(
+      modified_objects)
+
   status_entries = {}
   for key in context.cache_manager.marked_for_delete:
     build_cache_status(status_entries, 'DeleteOp:' + key,
@@ -233,6 +250,9 @@ def update_memcache_after_commit(context):
     #            currently we log errors
     if delete_result is not True:
       current_app.logger.error("CACHE: Failed to remove collection from cache")
+    representation_cache.get_representation_cache().invalidate(
+        cache_manager.cache_object.memcache_client,
+        cache_manager.marked_for_delete)
 
   status_entries = []
   for key in cache_manager.marked_for_delete:
@@ -245,7 +265,7 @@ def update_memcache_after_commit(context):
       current_app.logger.error(
           "CACHE: Failed to remove status entries from cache")
 
-  clear_permission_cache()
+  clear_permission_cache(getattr(context, 'stale_permission_users', None))
   cache_manager.clear_cache()
 
 
@@ -297,12 +317,14 @@ def get_modified_objects(session):
 def update_index(session, cache):
   if cache:
     indexer = get_indexer()
-    for obj in cache.new:
-      indexer.create_record(fts_record_for(obj), commit=False)
-    for obj in cache.dirty:
-      indexer.update_record(fts_record_for(obj), commit=False)
-    for obj in cache.deleted:
-      indexer.delete_record(obj.id, obj.__class__.__name__, commit=False)
+    indexer.delete_records(
+        [(obj.id, obj.__class__.__name__) for obj in cache.deleted],
+        commit=False)
+    indexer.create_records(
+        [fts_record_for(obj) for obj in cache.new], commit=False)
+    indexer.update_records(
+        [fts_record_for(obj) for obj in cache.dirty], commit=False,
+        diff=True)
     session.commit()
 
 
@@ -342,15 +364,98 @@ def log_event(session, obj=None, current_user_id=None):
     session.add(event)
 
 
-def clear_permission_cache():
+def get_users_with_stale_permissions(modified_objects):
+  """
+  Find the users whose cached permissions are invalidated by the changes in
+  the current session. Permission extensions contribute the dependency
+  tracking with `contributed_get_users_with_stale_permissions`.
+
+  Args:
+    modified_objects: new, dirty and deleted objects of the session
+  Returns:
+    A set of user ids or None if the permissions of all users are stale.
+  """
+  user_ids = None
+  for extension in get_extension_modules():
+    get_users = getattr(
+        extension, "contributed_get_users_with_stale_permissions", None)
+    if not callable(get_users):
+      continue
+    extension_user_ids = get_users(modified_objects)
+    if extension_user_ids is None:
+      return None
+    user_ids = (user_ids or set()) | extension_user_ids
+  return user_ids
+
+
+def count_permission_cache_event(cache, event, delta=1):
+  """Increment a permission cache statistics counter in memcache."""
+  cache.incr('permissions:stats:{}'.format(event), delta=delta,
+             initial_value=0)
+
+
+def get_permission_cache_stats():
+  """
+  Get the permission cache counters and the hit ratio.
+
+  Returns:
+    A dict with a value for each counter in PERMISSION_CACHE_STATS and the
+    'hit_ratio' of permission lookups.
+  """
+  if not getattr(settings, 'MEMCACHE_MECHANISM', False):
+    return {}
+  cache = _get_cache_manager().cache_object.memcache_client
+  keys = ['permissions:stats:{}'.format(event)
+          for event in PERMISSION_CACHE_STATS]
+  counters = cache.get_multi(keys)
+  stats = {event: int(counters.get(key, 0))
+           for event, key in zip(PERMISSION_CACHE_STATS, keys)}
+  lookups = stats['hits'] + stats['misses']
+  stats['hit_ratio'] = float(stats['hits']) / lookups if lookups else None
+  return stats
+
+
+def get_representation_cache_stats():
+  """Get the hit ratios of the local and memcache object representation
+  cache tiers.
+  """
+  if not getattr(settings, 'MEMCACHE_MECHANISM', False):
+    return {}
+  return representation_cache.get_stats(
+      _get_cache_manager().cache_object.memcache_client)
+
+
+def clear_permission_cache(user_ids=None):
+  """
+  Remove cached user permissions from memcache
+
+  Args:
+    user_ids: ids of users whose cached permissions are removed. If None, the
+      permissions of all users are removed.
+  Returns:
+    None
+  """
   if not getattr(settings, 'MEMCACHE_MECHANISM', False):
     return
   cache = _get_cache_manager().cache_object.memcache_client
   cached_keys_set = cache.get('permissions:list') or set()
-  cached_keys_set.add('permissions:list')
-  # We delete all the cached user permissions as well as
-  # the permissions:list value itself
-  cache.delete_multi(cached_keys_set)
+  if user_ids is None:
+    cached_keys_set.add('permissions:list')
+    # We delete all the cached user permissions as well as
+    # the permissions:list value itself
+    cache.delete_multi(cached_keys_set)
+    count_permission_cache_event(cache, 'full_flushes')
+    return
+  keys = {'permissions:{}'.format(user_id) for user_id in user_ids}
+  stale_keys = keys & cached_keys_set
+  if not stale_keys:
+    return
+  # Removing the keys from permissions:list first prevents permissions that
+  # are being loaded concurrently from being stored after the delete
+  cache.set('permissions:list', cached_keys_set - stale_keys,
+            PERMISSION_CACHE_TIMEOUT)
+  cache.delete_multi(stale_keys)
+  count_permission_cache_event(cache, 'user_flushes', len(stale_keys))
 
 
 class ModelView(View):
@@ -471,7 +576,8 @@ class ModelView(View):
       resources = permissions.read_resources_for(self.model.__name__)
       filter_expr = context_query_filter(self.model.context_id, contexts)
       if resources:
-        filter_expr = or_(filter_expr, self.model.id.in_(resources))
+        filter_expr = or_(filter_expr,
+                          resource_query_filter(self.model.id, resources))
       query = query.filter(filter_expr)
       for j in joinlist:
         j_class = j.property.mapper.class_
@@ -480,10 +586,13 @@ class ModelView(View):
         if j_contexts is not None:
           j_filter_expr = context_query_filter(j_class.context_id, j_contexts)
           if resources:
-            j_filter_expr = or_(j_filter_expr, self.model.id.in_(j_resources))
+            j_filter_expr = or_(
+                j_filter_expr,
+                resource_query_filter(self.model.id, j_resources))
           query = query.filter(j_filter_expr)
         elif resources:
-          query = query.filter(self.model.id.in_(resources))
+          query = query.filter(
+              resource_query_filter(self.model.id, resources))
     if '__search' in request.args:
       terms = request.args['__search']
       types = self._get_matching_types(self.model)
@@ -498,7 +607,28 @@ class ModelView(View):
             search_query, models, get_current_user_id())
       search_subquery = search_query.subquery()
       query = query.filter(self.model.id.in_(search_subquery))
-    order_properties = []
+    order_properties = [attr.desc() if desc else attr
+                        for attr, desc in self.get_sort_keys()]
+    query = query.order_by(*order_properties)
+    if '__limit' in request.args:
+      try:
+        limit = int(request.args['__limit'])
+        query = query.limit(limit)
+      except (TypeError, ValueError):
+        pass
+    query = query.distinct()
+    return query
+
+  def get_sort_keys(self):
+    """Get the attributes that collections are sorted by.
+
+    The keys always end with the modification time and the id, so every
+    object has a unique position in the collection.
+
+    Returns:
+      list of (attribute, desc) tuples.
+    """
+    sort_keys = []
     if '__sort' in request.args:
       sort_attrs = request.args['__sort'].split(",")
       sort_desc = request.args.get('__sort_desc', False)
@@ -509,24 +639,14 @@ class ModelView(View):
           sort_attr = sort_attr[1:]
         order_property = getattr(self.model, sort_attr, None)
         if order_property and hasattr(order_property, 'desc'):
-          if attr_desc:
-            order_property = order_property.desc()
-          order_properties.append(order_property)
+          sort_keys.append((order_property, bool(attr_desc)))
         else:
           # Possibly throw an exception instead,
           # if sorting by invalid attribute?
           pass
-    order_properties.append(self.modified_attr.desc())
-    order_properties.append(self.model.id.desc())
-    query = query.order_by(*order_properties)
-    if '__limit' in request.args:
-      try:
-        limit = int(request.args['__limit'])
-        query = query.limit(limit)
-      except (TypeError, ValueError):
-        pass
-    query = query.distinct()
-    return query
+    sort_keys.append((self.modified_attr, True))
+    sort_keys.append((self.model.id, True))
+    return sort_keys
 
   def get_object(self, id):
     # This could also use `self.pk`
@@ -545,6 +665,29 @@ class ModelView(View):
   def not_found_response(self):
     return current_app.make_response((self.not_found_message(), 404, []))
 
+  def collection_version(self, matches_query):
+    """Get a version etag and the last modification time of a collection.
+
+    The version changes whenever the collection query returns a different
+    set of rows, or any object is changed through a logged event, which
+    covers the changes of mapped objects included in the representations.
+    It is computed without loading or serializing the collection.
+
+    Returns:
+      A tuple with the etag and the last modified time of the collection.
+    """
+    matches = matches_query.order_by(None).subquery()
+    if 'updated_at' in matches.c:
+      max_updated_at = sqlalchemy.func.max(matches.c.updated_at)
+    else:
+      max_updated_at = sqlalchemy.literal(None)
+    count, last_modified = db.session.query(
+        sqlalchemy.func.count(), max_updated_at).select_from(matches).one()
+    last_event_id = db.session.query(sqlalchemy.func.max(Event.id)).scalar()
+    version = (last_event_id, count, last_modified, get_current_user_id(),
+               self.request.full_path)
+    return etag(version), last_modified
+
   def collection_last_modified(self):
     """Calculate the last time a member of the collection was modified. This
     method relies on the fact that the collection table has an `updated_at` or
@@ -687,6 +830,93 @@ class Resource(ModelView):
         :service: The instance of Resource handling the DELETE request.
       """,)
 
+  # Batch variants of the model signals. They are sent once for all objects
+  # of a request or an import chunk, before the signals for single objects.
+  # Listeners should connect to either the batch or the single object signal.
+  model_posted_batch = signals.signal(
+      "Model POSTed - batch",
+      """
+      Indicates that model objects were created and will be committed to the
+      database. The sender in the signal will be the model class of the
+      created objects. The following arguments will be sent along with the
+      signal:
+
+        :objects: The list of created model instances.
+        :sources: The list of source JSON dictionaries, in the same order.
+        :service: The instance of Resource handling the request.
+      """,)
+  model_posted_after_commit_batch = signals.signal(
+      "Model POSTed - after - batch",
+      """
+      Indicates that model objects were created and have been committed to the
+      database. Arguments are the same as for model_posted_batch.
+      """,)
+  model_put_batch = signals.signal(
+      "Model PUT - batch",
+      """
+      Indicates that model objects were updated and will be committed to the
+      database. The sender in the signal will be the model class of the
+      updated objects. The following arguments will be sent along with the
+      signal:
+
+        :objects: The list of updated model instances.
+        :sources: The list of source JSON dictionaries, in the same order.
+        :service: The instance of Resource handling the request.
+      """,)
+  model_put_after_commit_batch = signals.signal(
+      "Model PUT - after - batch",
+      """
+      Indicates that model objects were updated and have been committed to the
+      database. Arguments are the same as for model_put_batch.
+      """,)
+  model_deleted_batch = signals.signal(
+      "Model DELETEd - batch",
+      """
+      Indicates that model objects were deleted and will be removed from the
+      database. The sender in the signal will be the model class of the
+      deleted objects. The following arguments will be sent along with the
+      signal:
+
+        :objects: The list of removed model instances.
+        :service: The instance of Resource handling the request.
+      """,)
+  model_deleted_after_commit_batch = signals.signal(
+      "Model DELETEd - after - batch",
+      """
+      Indicates that model objects were deleted and have been removed from the
+      database. Arguments are the same as for model_deleted_batch.
+      """,)
+
+  @classmethod
+  def send_batch(cls, signal_name, sender, objects, sources=None,
+                 service=None):
+    """Send a model signal for a list of objects.
+
+    The batch variant of the signal is sent once with all objects, followed
+    by the signal for every single object for listeners that handle objects
+    one by one.
+
+    Args:
+      signal_name (str): name of the single object signal, such as
+        "model_posted".
+      sender (db.Model): model class of the objects.
+      objects (list): model instances.
+      sources (list): source JSON dictionaries of the objects, or None for
+        signals that have no source, such as "model_deleted".
+      service: Resource class or instance handling the objects.
+    """
+    batch_signal = getattr(cls, signal_name + "_batch")
+    signal = getattr(cls, signal_name)
+    if sources is None:
+      batch_signal.send(sender, objects=objects, service=service)
+      for obj in objects:
+        signal.send(sender, obj=obj, service=service)
+    else:
+      batch_signal.send(sender, objects=objects, sources=sources,
+                        service=service)
+      for obj, src in zip(objects, sources):
+        signal.send(sender, obj=obj, src=src, service=service)
+
   def dispatch_request(self, *args, **kwargs):  # noqa
     with benchmark("Dispatch request"):
       with benchmark("dispatch_request > Check Headers"):
@@ -822,7 +1052,7 @@ class Resource(ModelView):
     obj.modified_by_id = get_current_user_id()
     db.session.add(obj)
     with benchmark("Send PUTed event"):
-      self.model_put.send(obj.__class__, obj=obj, src=src, service=self)
+      self.send_batch("model_put", obj.__class__, [obj], [src], self)
     with benchmark("Get modified objects"):
       modified_objects = get_modified_objects(db.session)
     with benchmark("Log event"):
@@ -839,8 +1069,8 @@ class Resource(ModelView):
     with benchmark("Update memcache after commit for collection PUT"):
       update_memcache_after_commit(self.request)
     with benchmark("Send PUT - after commit event"):
-      self.model_put_after_commit.send(obj.__class__, obj=obj,
-                                       src=src, service=self)
+      self.send_batch("model_put_after_commit", obj.__class__, [obj], [src],
+                      self)
     with benchmark("Serialize collection"):
       object_for_json = self.object_for_json(obj)
     with benchmark("Make response"):
@@ -875,7 +1105,7 @@ class Resource(ModelView):
         return header_error
       db.session.delete(obj)
       with benchmark("Send DELETEd event"):
-        self.model_deleted.send(obj.__class__, obj=obj, service=self)
+        self.send_batch("model_deleted", obj.__class__, [obj], service=self)
       with benchmark("Get modified objects"):
         modified_objects = get_modified_objects(db.session)
       with benchmark("Log event"):
@@ -890,8 +1120,8 @@ class Resource(ModelView):
       with benchmark("Update memcache after commit for collection DELETE"):
         update_memcache_after_commit(self.request)
       with benchmark("Send DELETEd - after commit event"):
-        self.model_deleted_after_commit.send(obj.__class__, obj=obj,
-                                             service=self)
+        self.send_batch("model_deleted_after_commit", obj.__class__, [obj],
+                        service=self)
       with benchmark("Query for object"):
         object_for_json = self.object_for_json(obj)
       with benchmark("Make response"):
@@ -932,6 +1162,110 @@ class Resource(ModelView):
     }
     return matches, collection_extras
 
+  def apply_cursor_paging(self, matches_query):
+    """Get a page of matches that follows or precedes the __cursor position.
+
+    Instead of skipping rows with an offset, the page is sought by the sort
+    keys of the last row of the previous page, which keeps deep pages as fast
+    as the first one. An empty cursor selects the first page. The total
+    count is only queried if the __total argument is given.
+    """
+    if '__limit' in request.args:
+      raise BadRequest('__cursor can not be combined with __limit.')
+    page_size = min(
+        int(request.args.get('__page_size', self.DEFAULT_PAGE_SIZE)),
+        self.MAX_PAGE_SIZE)
+    sort_keys = self.get_sort_keys()
+    values, direction = None, 'next'
+    if request.args['__cursor']:
+      values, direction = _decode_cursor(request.args['__cursor'])
+      if len(values) != len(sort_keys):
+        raise BadRequest('Invalid __cursor.')
+    if direction == 'prev':
+      # walk the collection backwards and reverse the page
+      sort_keys = [(attr, not desc) for attr, desc in sort_keys]
+    query = matches_query.add_columns(*[
+        attr.label('__cursor_{}'.format(i))
+        for i, (attr, _) in enumerate(sort_keys)])
+    if values is not None:
+      query = query.filter(_seek_filter(sort_keys, values))
+    query = query.order_by(None).order_by(
+        *[attr.desc() if desc else attr for attr, desc in sort_keys])
+    rows = query.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+      rows.reverse()
+
+    match_width = len(rows[0]) - len(sort_keys) if rows else 0
+    matches = [tuple(row[:match_width]) for row in rows]
+    paging_obj = {'first': self.cursor_page_url('')}
+    if rows and (has_more or direction == 'prev'):
+      paging_obj['next'] = self.cursor_page_url(_encode_cursor(
+          rows[-1][match_width:], 'next'))
+    if rows and values is not None and (has_more or direction == 'next'):
+      paging_obj['prev'] = self.cursor_page_url(_encode_cursor(
+          rows[0][match_width:], 'prev'))
+    if '__total' in request.args:
+      paging_obj['total'] = matches_query.order_by(None).count()
+    return matches, {'paging': paging_obj}
+
+  def cursor_page_url(self, cursor):
+    args = dict([(k, unicode(v)) for k, v in request.args.items()])
+    args.pop('__page', None)
+    args['__cursor'] = cursor
+    return self.url_for() + '?' + urlencode(utils.encoded_dict(args))
+
+  def get_field_columns(self, fields):
+    """Get the model columns of the requested fields.
+
+    Returns:
+      A dict of field names and columns, or None if any of the fields is not
+      a published column and the full resources have to be built.
+    """
+    # Creator permissions for these are checked on the full resources
+    if self.model.__name__ in ("Relationship", "Revision"):
+      return None
+    if not hasattr(self.model, 'context_id'):
+      return None
+    publish_attrs = AttributeInfo.gather_publish_attrs(self.model)
+    columns = {}
+    for field in fields:
+      if field in ('id', 'type'):
+        continue
+      if field not in publish_attrs:
+        return None
+      class_attr = getattr(self.model, field, None)
+      prop = getattr(class_attr, 'property', None)
+      if not isinstance(prop, sqlalchemy.orm.ColumnProperty) or \
+         len(prop.columns) != 1:
+        return None
+      columns[field] = class_attr
+    return columns
+
+  def get_field_resources(self, matches, columns):
+    """Build resources with only the given columns of the matches.
+
+    The columns are queried directly, so no model instances are loaded and
+    no stubs are published.
+    """
+    names = columns.keys()
+    ids = [m[0] for m in matches]
+    rows = {}
+    if ids and names:
+      query = db.session.query(
+          self.model.id, *[columns[name] for name in names]
+      ).filter(self.model.id.in_(ids))
+      rows = {row[0]: row[1:] for row in query}
+    resources = []
+    for match in matches:
+      if names and match[0] not in rows:
+        continue
+      resource = dict(zip(names, rows.get(match[0], ())))
+      resource.update(id=match[0], type=match[1], context_id=match[2])
+      resources.append(resource)
+    return resources
+
   def get_matched_resources(self, matches):
     cache_objs = {}
     if self.has_cache():
@@ -967,17 +1301,36 @@ class Resource(ModelView):
       )
       matches_query = self.get_collection_matches(
           self.model, filter_by_contexts)
+    with benchmark("dispatch_request > collection_get > Collection version"):
+      version_etag, last_modified = self.collection_version(matches_query)
+      if self.request.headers.get('If-None-Match') == version_etag:
+        return current_app.make_response(('', 304, [('Etag', version_etag)]))
+      if last_modified is None:
+        last_modified = self.collection_last_modified()
     with benchmark("dispatch_request > collection_get > Query Data"):
-      if '__page' in request.args or '__page_only' in request.args:
+      if '__cursor' in request.args:
+        with benchmark("Query matches with cursor paging"):
+          matches, extras = self.apply_cursor_paging(matches_query)
+      elif '__page' in request.args or '__page_only' in request.args:
         with benchmark("Query matches with paging"):
           matches, extras = self.apply_paging(matches_query)
       else:
         with benchmark("Query matches"):
           matches = matches_query.all()
           extras = {}
+    custom_fields = None
+    field_columns = None
+    if '__fields' in request.args:
+      custom_fields = request.args['__fields'].split(',')
+      field_columns = self.get_field_columns(custom_fields)
     with benchmark("dispatch_request > collection_get > Matched resources"):
       cache_op = None
-      if '__stubs_only' in request.args:
+      if field_columns is not None:
+        with benchmark("Query field columns"):
+          objs = self.get_field_resources(matches, field_columns)
+        with benchmark("Filter resources based on permissions"):
+          objs = filter_resource(objs)
+      elif '__stubs_only' in request.args:
         objs = [{
             'id': m[0],
             'type': m[1],
@@ -998,52 +1351,60 @@ class Resource(ModelView):
         cache_op = 'Hit' if len(cache_objs) > 0 else 'Miss'
     with benchmark("dispatch_request > collection_get > Create Response"):
       # Return custom fields specified via `__fields=id,title,description` etc.
-      # TODO this can be optimized by filter_resource() not retrieving
-      # the other fields to being with
-      if '__fields' in request.args:
-        custom_fields = request.args['__fields'].split(',')
+      if custom_fields is not None:
         objs = [{f: o[f] for f in custom_fields if f in o} for o in objs]
       with benchmark("Serialize collection"):
         collection = self.build_collection_representation(
             objs, extras=extras)
 
-      if 'If-None-Match' in self.request.headers and \
-         self.request.headers['If-None-Match'] == etag(collection):
-        return current_app.make_response((
-            '', 304, [('Etag', etag(collection))]))
-
       with benchmark("Make response"):
         return self.json_success_response(
-            collection, self.collection_last_modified(), cache_op=cache_op)
+            collection, last_modified, cache_op=cache_op,
+            etag_value=version_etag)
 
   def get_resources_from_cache(self, matches):
-    """Get resources from cache for specified matches"""
+    """Get resources from the local cache tier and then from memcache for
+    specified matches"""
     resources = {}
     # Disable caching for background tasks
     # Setting background task status circumvents our memcache
     # invalidation logic so we have to disabling memcache.
     if self.model.__name__ == 'BackgroundTask':
       return resources
-    # Skip right to memcache
     memcache_client = self.request.cache_manager.cache_object.memcache_client
+    local_cache = representation_cache.get_representation_cache()
+    generation = local_cache.sync(memcache_client)
+    self.request.representation_generation = generation
     key_matches = {}
-    keys = []
     for match in matches:
       key = get_cache_key(None, id=match[0], type=match[1])
       key_matches[key] = match
-      keys.append(key)
+    result = local_cache.get_multi(key_matches.keys())
+    for key, value in result.items():
+      resources[key_matches[key]] = value
+    keys = [key for key in key_matches if key not in result]
+    local_misses = len(keys)
+    memcache_hits = {}
     while len(keys) > 0:
       slice_keys = keys[:32]
       keys = keys[32:]
       result = memcache_client.get_multi(slice_keys)
       for key in result:
         if 'selfLink' in result[key]:
+          memcache_hits[key] = result[key]
           resources[key_matches[key]] = result[key]
+    local_cache.set_multi(memcache_hits, generation)
+    representation_cache.count_events(memcache_client, {
+        'local_hits': len(key_matches) - local_misses,
+        'local_misses': local_misses,
+        'memcache_hits': len(memcache_hits),
+        'memcache_misses': local_misses - len(memcache_hits),
+    })
     return resources
 
   def add_resources_to_cache(self, match_obj_pairs):
-    """Add resources to cache if they are not blocked by DeleteOp entries"""
-    # Skip right to memcache
+    """Add resources to both cache tiers if they are not blocked by DeleteOp
+    entries"""
     memcache_client = self.request.cache_manager.cache_object.memcache_client
     key_objs = {}
     key_blockers = {}
@@ -1065,6 +1426,9 @@ class Resource(ModelView):
           if key_blockers[slice_key] not in result]
       memcache_client.add_multi(
           {key: key_objs[key] for key in slice_keys})
+      representation_cache.get_representation_cache().set_multi(
+          {key: key_objs[key] for key in slice_keys},
+          getattr(self.request, 'representation_generation', None))
 
   def json_create(self, obj, src):
     ggrc.builder.json.create(obj, src)
@@ -1114,7 +1478,7 @@ class Resource(ModelView):
           db.session.expunge_all()
           raise Forbidden()
       with benchmark("Send model POSTed event"):
-        self.model_posted.send(obj.__class__, obj=obj, src=src, service=self)
+        self.send_batch("model_posted", obj.__class__, [obj], [src], self)
       obj.modified_by_id = get_current_user_id()
       db.session.add(obj)
       with benchmark("Get modified objects"):
@@ -1133,8 +1497,8 @@ class Resource(ModelView):
       with benchmark("Update memcache after commit for collection POST"):
         update_memcache_after_commit(self.request)
       with benchmark("Send model POSTed - after commit event"):
-        self.model_posted_after_commit.send(obj.__class__, obj=obj,
-                                            src=src, service=self)
+        self.send_batch("model_posted_after_commit", obj.__class__, [obj],
+                        [src], self)
       with benchmark("Serialize object"):
         object_for_json = {} if no_result else self.object_for_json(obj)
       with benchmark("Make response"):
@@ -1154,6 +1518,220 @@ class Resource(ModelView):
       current_app.logger.warn(message)
       return (403, message)
 
+  def batch_post_item(self, src, create_contexts):
+    """Deserialize and check permissions of a single batch POST item.
+
+    Args:
+      src (dict): the POSTed JSON of the item.
+      create_contexts (dict): cache of create permissions by context id,
+        shared by all items of the batch.
+
+    Returns:
+      tuple of the new object and the source JSON of its root attribute.
+    """
+    obj = self.model()
+    root_attribute = self.model._inflector.table_singular
+    if root_attribute not in src:
+      raise BadRequest('Required attribute "{0}" not found'.format(
+          root_attribute))
+    src = src[root_attribute]
+    context_id = self.get_context_id_from_json(src)
+    if context_id not in create_contexts:
+      create_contexts[context_id] = permissions.is_allowed_create(
+          self.model.__name__, None, context_id) or \
+          permissions.has_conditions('create', self.model.__name__)
+    if not create_contexts[context_id]:
+      raise Forbidden()
+    if src.get('private') is True and src.get('context') is not None \
+       and src['context'].get('id') is not None:
+      raise BadRequest(
+          'context MUST be "null" when creating a private resource.')
+    elif 'context' not in src:
+      raise BadRequest('context MUST be specified.')
+    self.json_create(obj, src)
+    if not permissions.is_allowed_create_for(obj):
+      raise Forbidden()
+    return obj, src
+
+  def merge_existing_relationships(self, items):
+    """Find relationships of a batch that already exist.
+
+    The single object POST updates the attributes of an existing
+    relationship instead of failing on the unique constraint. A batch does
+    the same with a single query for all of its relationships.
+
+    Returns:
+      dict with the existing relationship for the index of every item that
+      is already mapped, or is a repeated mapping within the batch.
+    """
+    rel = ggrc.models.Relationship
+    columns = tuple_(rel.source_type, rel.source_id,
+                     rel.destination_type, rel.destination_id)
+    keys = {}
+    for i, (obj, _) in enumerate(items):
+      key = (obj.source_type, obj.source_id,
+             obj.destination_type, obj.destination_id)
+      if None not in key:
+        keys[i] = key
+    if not keys:
+      return {}
+    reverse = {(d_type, d_id, s_type, s_id)
+               for s_type, s_id, d_type, d_id in keys.values()}
+    merged = {}
+    updates = {}
+    first = {}
+    # json_create has added the new relationships to the session through the
+    # backrefs of their ends, so nothing may be flushed before the merged
+    # ones are removed from it again
+    with db.session.no_autoflush:
+      existing = set(db.session.query(columns).filter(
+          columns.in_(list(set(keys.values()) | reverse))))
+      for i, key in sorted(keys.items()):
+        reverse_key = (key[2], key[3], key[0], key[1])
+        obj, _ = items[i]
+        if key in existing or reverse_key in existing:
+          updates[i] = (obj.source, obj.destination, dict(obj.attrs))
+        elif key in first or reverse_key in first:
+          merged[i] = items[first.get(key, first.get(reverse_key))][0]
+        else:
+          first[key] = i
+          continue
+        self._detach_relationship(obj)
+      for i, (source, destination, attrs) in updates.items():
+        merged[i] = rel.update_attributes(source, destination, attrs)
+    return merged
+
+  @staticmethod
+  def _detach_relationship(obj):
+    """Remove a new relationship from the session and from the collections
+    of its ends, so that it is not cascaded back into the session."""
+    setattr(obj, obj.source_attr, None)
+    setattr(obj, obj.destination_attr, None)
+    if obj in db.session:
+      db.session.expunge(obj)
+
+  def collection_post_batch(self, body, no_result):
+    """Create all items of a collection POST in a single transaction.
+
+    All items are deserialized and checked before anything is written.
+    Signals, revisions, memcache and full text index updates are done once
+    for the whole batch, which is committed once. If any item fails, none
+    of them are created.
+
+    Returns:
+      list of (status, response body) tuples, one for every item.
+    """
+    if not body:
+      return []
+    items, res = self._deserialize_batch(body)
+    if any(res):
+      db.session.rollback()
+      return [src_res or (424, "Not created, other items of the batch "
+                               "failed.") for src_res in res]
+    try:
+      merged, by_class = self._prepare_batch(items)
+      self._commit_batch(items, merged, by_class)
+    except (IntegrityError, ValidationError) as e:
+      db.session.rollback()
+      message = translate_message(e)
+      current_app.logger.warn(message)
+      return [(403, message) for _ in items]
+    except Exception as e:
+      db.session.rollback()
+      current_app.logger.warn("Batch collection POST failed:")
+      current_app.logger.exception(e)
+      return [(getattr(e, "code", 500),
+               getattr(e, "description", None) or e.message)
+              for _ in items]
+    with benchmark("Serialize objects"):
+      res = []
+      for i, (obj, _) in enumerate(items):
+        status = 200 if i in merged else 201
+        obj = merged.get(i, obj)
+        res.append((status, {} if no_result else self.object_for_json(obj)))
+    return res
+
+  def _deserialize_batch(self, body):
+    """Deserialize and check all items of a batch.
+
+    Returns:
+      list of (object, source) tuples of the valid items and a list with
+      the (status, message) of every failed item or None.
+    """
+    items = []
+    res = []
+    create_contexts = {}
+    for src in body:
+      try:
+        with benchmark("Deserialize batch item"):
+          items.append(self.batch_post_item(
+              UnicodeSafeJsonWrapper(src), create_contexts))
+        res.append(None)
+      except Exception as e:
+        current_app.logger.warn("Batch collection POST item failed:")
+        current_app.logger.exception(e)
+        res.append((getattr(e, "code", 500),
+                    getattr(e, "description", None) or e.message))
+    return items, res
+
+  def _prepare_batch(self, items):
+    """Merge existing relationships and send the model POSTed signals.
+
+    Returns:
+      dict with the existing object for the index of every merged item, and
+      an ordered dict with the new (object, source) items of every class.
+    """
+    merged = {}
+    if self.model.__name__ == "Relationship":
+      with benchmark("Merge existing relationships"):
+        merged = self.merge_existing_relationships(items)
+    by_class = collections.OrderedDict()
+    for i, (obj, src) in enumerate(items):
+      if i not in merged:
+        by_class.setdefault(obj.__class__, []).append((obj, src))
+    with benchmark("Send model POSTed event"):
+      for model, class_items in by_class.items():
+        self.send_batch("model_posted", model,
+                        [obj for obj, _ in class_items],
+                        [src for _, src in class_items], self)
+    return merged, by_class
+
+  def _commit_batch(self, items, merged, by_class):
+    """Write and commit the new objects of a batch."""
+    new_objects = [obj for class_items in by_class.values()
+                   for obj, _ in class_items]
+    current_user_id = get_current_user_id()
+    for obj in new_objects:
+      obj.modified_by_id = current_user_id
+      db.session.add(obj)
+    with benchmark("Flush batch"):
+      db.session.flush()
+    with benchmark("Get modified objects"):
+      modified_objects = get_modified_objects(db.session)
+    with benchmark("Update custom attribute values"):
+      for obj in new_objects:
+        values = [value for value in
+                  getattr(obj, "custom_attribute_values", ())
+                  if value.attributable_id is None]
+        if values:
+          set_ids_for_new_custom_attributes(values, obj)
+    with benchmark("Log event"):
+      log_event(db.session, merged.get(0, items[0][0]))
+    with benchmark("Update memcache before commit for collection POST"):
+      update_memcache_before_commit(
+          self.request, modified_objects, CACHE_EXPIRY_COLLECTION)
+    with benchmark("Commit"):
+      db.session.commit()
+    with benchmark("Update index"):
+      update_index(db.session, modified_objects)
+    with benchmark("Update memcache after commit for collection POST"):
+      update_memcache_after_commit(self.request)
+    with benchmark("Send model POSTed - after commit event"):
+      for model, class_items in by_class.items():
+        self.send_batch("model_posted_after_commit", model,
+                        [obj for obj, _ in class_items],
+                        [src for _, src in class_items], self)
+
   def collection_post(self):  # noqa
     if self.request.mimetype != 'application/json':
       return current_app.make_response((
@@ -1183,21 +1761,25 @@ class Resource(ModelView):
     if wrap:
       body = [body]
     res = []
-    for src in body:
-      try:
-        src_res = None
-        src_res = self.collection_post_step(
-            UnicodeSafeJsonWrapper(src), no_result)
-        db.session.commit()
-        if running_async:
-          time.sleep(settings.BACKGROUND_COLLECTION_POST_SLEEP)
-      except Exception as e:
-        if not src_res or 200 <= src_res[0] < 300:
-          src_res = (getattr(e, "code", 500), e.message)
-        current_app.logger.warn("Collection POST commit failed:")
-        current_app.logger.exception(e)
-        db.session.rollback()
-      res.append(src_res)
+    if 'X-GGRC-Batch' in request.headers:
+      with benchmark("Batch collection POST"):
+        res = self.collection_post_batch(body, no_result)
+    else:
+      for src in body:
+        try:
+          src_res = None
+          src_res = self.collection_post_step(
+              UnicodeSafeJsonWrapper(src), no_result)
+          db.session.commit()
+          if running_async:
+            time.sleep(settings.BACKGROUND_COLLECTION_POST_SLEEP)
+        except Exception as e:
+          if not src_res or 200 <= src_res[0] < 300:
+            src_res = (getattr(e, "code", 500), e.message)
+          current_app.logger.warn("Collection POST commit failed:")
+          current_app.logger.exception(e)
+          db.session.rollback()
+        res.append(src_res)
     headers = {"Content-Type": "application/json"}
     errors = []
     if wrap:
@@ -1345,10 +1927,13 @@ class Resource(ModelView):
     return format_date_time(time.mktime(timestamp.utctimetuple()))
 
   def json_success_response(self, response_object, last_modified,
-                            status=200, id=None, cache_op=None):
+                            status=200, id=None, cache_op=None,
+                            etag_value=None):
+    if etag_value is None:
+      etag_value = etag(response_object)
     headers = [
         ('Last-Modified', self.http_timestamp(last_modified)),
-        ('Etag', etag(response_object)),
+        ('Etag', etag_value),
         ('Content-Type', 'application/json'),
     ]
     if id is not None:
@@ -1455,6 +2040,71 @@ def filter_resource(resource, depth=0, user_permissions=None):  # noqa
     assert False, "Non-object passed to filter_resource"
 
 
+def _encode_cursor_value(value):
+  if isinstance(value, datetime.datetime):
+    return {'datetime': value.strftime('%Y-%m-%dT%H:%M:%S.%f')}
+  if isinstance(value, datetime.date):
+    return {'date': value.strftime('%Y-%m-%d')}
+  return value
+
+
+def _decode_cursor_value(value):
+  if isinstance(value, dict):
+    if 'datetime' in value:
+      return datetime.datetime.strptime(value['datetime'],
+                                        '%Y-%m-%dT%H:%M:%S.%f')
+    if 'date' in value:
+      return datetime.datetime.strptime(value['date'], '%Y-%m-%d').date()
+    raise ValueError('Unknown cursor value')
+  return value
+
+
+def _encode_cursor(values, direction):
+  """Encode sort key values of a row into an opaque cursor."""
+  data = {'d': direction, 'v': [_encode_cursor_value(v) for v in values]}
+  return base64.urlsafe_b64encode(json.dumps(data))
+
+
+def _decode_cursor(cursor):
+  """Decode a cursor into sort key values and the paging direction."""
+  try:
+    data = json.loads(base64.urlsafe_b64decode(str(cursor)))
+    direction = data['d']
+    if direction not in ('next', 'prev'):
+      raise ValueError('Unknown cursor direction')
+    return [_decode_cursor_value(v) for v in data['v']], direction
+  except (TypeError, ValueError, KeyError):
+    raise BadRequest('Invalid __cursor.')
+
+
+def _seek_filter(sort_keys, values):
+  """Filter rows that come after the given sort key values.
+
+  Null values sort first in ascending order, as they do in MySQL.
+  """
+  def after(attr, value, desc):
+    if desc:
+      if value is None:
+        return sqlalchemy.sql.false()
+      return or_(attr < value, attr.is_(None))
+    if value is None:
+      return attr.isnot(None)
+    return attr > value
+
+  def equal(attr, value):
+    if value is None:
+      return attr.is_(None)
+    return attr == value
+
+  clauses = []
+  for i, (attr, desc) in enumerate(sort_keys):
+    clauses.append(and_(*[
+        equal(prev_attr, value)
+        for (prev_attr, _), value in zip(sort_keys[:i], values[:i])
+    ] + [after(attr, values[i], desc)]))
+  return or_(*clauses)
+
+
 def _is_creator():
   current_user = get_current_user()
   return hasattr(current_user, 'system_wide_role') \
@@ -4,14 +4,22 @@
 # Maintained By: david@reciprocitylabs.com
 
 import json
+from itertools import groupby
 
-from flask import request, current_app
-
-import ggrc.models.relationship
+from flask import current_app
+from flask import request
+from flask import stream_with_context
+from werkzeug.exceptions import BadRequest
 
 from ggrc.fulltext import get_indexer
 from ggrc.utils import GrcEncoder, url_for, benchmark
-from ggrc import db
+
+
+# Paging is opt-in, see `get_paging`
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Number of rows fetched from the database at once
+SEARCH_BATCH_SIZE = 100
 
 
 def search():
@@ -63,15 +71,18 @@ def search():
     relevant_objects = [tuple(obj.split(':'))
                         for obj in relevant_objects.split(',')]
 
+  paging = get_paging()
+  type_limit = _get_int_arg('__type_limit', maximum=MAX_PAGE_SIZE)
+
   if should_just_count:
     return do_counts(terms, types, contact_id, extra_params, extra_columns)
   if should_group_by_type:
     return group_by_type_search(terms, types, contact_id, extra_params,
-                                relevant_objects)
+                                relevant_objects, paging, type_limit)
   return basic_search(
       terms, types,
       permission_type, permission_model,
-      contact_id, extra_params, relevant_objects
+      contact_id, extra_params, relevant_objects, paging
   )
 
 
@@ -101,95 +112,195 @@ def do_counts(terms, types=None, contact_id=None,
   ))
 
 
-def _build_relevant_filter(types, relevant_objects):
-  if relevant_objects is None:
-    relevant_objects = []
-  filters = []
-  for relevant_type, relevant_id in relevant_objects:
-    relationship = ggrc.models.relationship.Relationship
-    src_query = db.session.query(
-        relationship.source_type, relationship.source_id
-    ).filter(
-        relationship.source_type.in_(types) | (types is None),
-        relationship.destination_type == relevant_type,
-        relationship.destination_id == relevant_id
-    )
-    dst_query = db.session.query(
-        relationship.destination_type, relationship.destination_id
-    ).filter(
-        relationship.destination_type.in_(types) | (types is None),
-        relationship.source_type == relevant_type,
-        relationship.source_id == relevant_id
-    )
-    filters.append(set(src_query.union(dst_query)))
+def _get_int_arg(name, maximum=None):
+  """Get a positive integer query parameter, capped at maximum."""
+  value = request.args.get(name)
+  if value is None:
+    return None
+  try:
+    value = int(value)
+  except ValueError:
+    raise BadRequest('Query parameter "{}" must be an integer.'.format(name))
+  if value < 1:
+    raise BadRequest('Query parameter "{}" must be positive.'.format(name))
+  if maximum is not None:
+    value = min(value, maximum)
+  return value
 
-  def check(result_pair):
-    return all(result_pair in bucket for bucket in filters)
 
-  return check
+def get_paging():
+  """Get the requested page and page size.
 
+  Paging is only applied if `__page` or `__page_size` is given, so that
+  existing clients keep getting the full result set.
 
-def do_search(terms, list_for_type, types=None, permission_type='read',
+  Returns:
+    A (page, page_size) tuple or None.
+  """
+  page = _get_int_arg('__page')
+  page_size = _get_int_arg('__page_size', maximum=MAX_PAGE_SIZE)
+  if page is None and page_size is None:
+    return None
+  return page or 1, page_size or DEFAULT_PAGE_SIZE
+
+
+def do_search(terms, types=None, permission_type='read',
               permission_model=None, contact_id=None, extra_params=None,
-              relevant_objects=None):
+              relevant_objects=None, group_by_type=False, limit=None,
+              offset=None):
+  """Get the distinct objects matching the search.
+
+  Objects are de-duplicated, filtered by the relevant objects, ordered and
+  paged in the database and the rows are fetched in batches, so large results
+  are never loaded at once.
+
+  Returns:
+    A generator of search result entries.
+  """
   indexer = get_indexer()
   with benchmark("Search"):
-    results = indexer.search(
+    query = indexer.search_objects(
         terms, types=types, permission_type=permission_type,
         permission_model=permission_model, contact_id=contact_id,
-        extra_params=extra_params
+        extra_params=extra_params, group_by_type=group_by_type,
+        limit=limit, offset=offset, relevant_objects=relevant_objects
     )
+  for result in query.yield_per(SEARCH_BATCH_SIZE):
+    yield {
+        'id': result.key,
+        'type': result.type,
+        'href': url_for(result.type, id=result.key),
+    }
 
-  related_filter = _build_relevant_filter(types, relevant_objects)
-  seen_results = {}
 
-  for result in results:
-    id = result.key
-    model_type = result.type
-    result_pair = (model_type, id)
-    if result_pair not in seen_results and related_filter(result_pair):
-      seen_results[result_pair] = True
-      entries_list = list_for_type(model_type)
-      entries_list.append({
-          'id': id,
-          'type': model_type,
-          'href': url_for(model_type, id=id),
-      })
+class Page(object):
+  """Paging of a search result.
+
+  The entries of a page are fetched with one extra entry, which is only used
+  to find out if there is a next page.
+  """
+
+  def __init__(self, paging):
+    self.page, self.page_size = paging or (None, None)
+    self.has_next = False
+
+  @property
+  def limit(self):
+    return self.page_size + 1 if self.page_size else None
+
+  @property
+  def offset(self):
+    return (self.page - 1) * self.page_size if self.page_size else None
+
+  def entries(self, entries):
+    """Limit entries to the page size and record if there are more."""
+    for i, entry in enumerate(entries):
+      if self.page_size and i == self.page_size:
+        self.has_next = True
+        return
+      yield entry
+
+  def as_json(self):
+    if self.page_size is None:
+      return None
+    return {
+        'page': self.page,
+        'page_size': self.page_size,
+        'has_next': self.has_next,
+    }
 
 
-def make_search_result(entries):
-  return current_app.make_response((
-      json.dumps({
-          'results': {
-              'selfLink': request.url,
-              'entries': entries,
-          }
-      }, cls=GrcEncoder),
+def _stream_list(entries):
+  yield '['
+  for i, entry in enumerate(entries):
+    if i:
+      yield ', '
+    yield json.dumps(entry, cls=GrcEncoder)
+  yield ']'
+
+
+def _stream_groups(groups):
+  yield '{'
+  for i, (model_type, entries) in enumerate(groups):
+    if i:
+      yield ', '
+    yield json.dumps(model_type) + ': '
+    for chunk in _stream_list(entries):
+      yield chunk
+  yield '}'
+
+
+def make_search_result(entries_chunks, page=None):
+  """Stream the search result JSON.
+
+  Args:
+    entries_chunks: iterable of JSON chunks of the entries.
+    page: Page of the result, written after the entries are consumed.
+  """
+  def generate():
+    yield '{"results": {"selfLink": ' + json.dumps(request.url)
+    yield ', "entries": '
+    for chunk in entries_chunks:
+      yield chunk
+    paging = page.as_json() if page is not None else None
+    if paging is not None:
+      yield ', "paging": ' + json.dumps(paging)
+    yield '}}'
+
+  return current_app.response_class(
+      stream_with_context(generate()),
       200,
-      [('Content-Type', 'application/json')],
-  ))
+      mimetype='application/json',
+  )
 
 
 def basic_search(terms, types=None,
                  permission_type='read', permission_model=None,
-                 contact_id=None, extra_params=None, relevant_objects=None):
-  entries = []
+                 contact_id=None, extra_params=None, relevant_objects=None,
+                 paging=None):
+  page = Page(paging)
+  entries = do_search(terms, types, permission_type, permission_model,
+                      contact_id, extra_params, relevant_objects,
+                      limit=page.limit, offset=page.offset)
+  return make_search_result(_stream_list(page.entries(entries)), page)
 
-  def list_for_type(_):
-    return entries
 
-  do_search(terms, list_for_type, types, permission_type, permission_model,
-            contact_id, extra_params, relevant_objects)
-  return make_search_result(entries)
+def _get_matching_types(terms, types, contact_id, extra_params):
+  """Get the types that have any objects matching the search."""
+  results = get_indexer().counts(terms, types=types, contact_id=contact_id,
+                                 extra_params=extra_params)
+  return sorted(set(r[0] for r in results))
 
 
 def group_by_type_search(terms, types=None, contact_id=None, extra_params={},
-                         relevant_objects=None):
-  entries = {}
-
-  def list_for_type(t):
-    return entries[t] if t in entries else entries.setdefault(t, [])
-
-  do_search(terms, list_for_type, types, contact_id=contact_id,
-            extra_params=extra_params, relevant_objects=relevant_objects)
-  return make_search_result(entries)
+                         relevant_objects=None, paging=None,
+                         type_limit=None):
+  """Search with the entries grouped by type.
+
+  Paging applies to the entries of all types together. If type_limit is given
+  every type gets its own query returning at most type_limit entries and
+  paging is ignored.
+  """
+  page = Page(paging)
+  if type_limit is None:
+    entries = do_search(terms, types, contact_id=contact_id,
+                        extra_params=extra_params,
+                        relevant_objects=relevant_objects,
+                        group_by_type=True, limit=page.limit,
+                        offset=page.offset)
+    groups = groupby(page.entries(entries), lambda entry: entry['type'])
+  else:
+    matching_types = _get_matching_types(terms, types, contact_id,
+                                         extra_params)
+    # Entries of a type are bounded by type_limit, so they can be fetched
+    # at once to skip the types without any relevant objects.
+    groups = ((model_type, list(do_search(terms, [model_type],
+                                          contact_id=contact_id,
+                                          extra_params=extra_params,
+                                          relevant_objects=relevant_objects,
+                                          limit=type_limit)))
+              for model_type in matching_types)
+    groups = ((model_type, entries) for model_type, entries in groups
+              if entries)
+    page = None
+  return make_search_result(_stream_groups(groups), page)
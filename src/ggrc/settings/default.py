@@ -19,6 +19,21 @@ AUTOBUILD_ASSETS = False
 ENABLE_JASMINE = False
 DEBUG_ASSETS = False
 FULLTEXT_INDEXER = None
+# Use MATCH ... AGAINST for search terms, LIKE is used only for words shorter
+# than FULLTEXT_MIN_WORD_LENGTH, which must match MySQL `ft_min_word_len`
+FULLTEXT_MATCH_SEARCH = True
+FULLTEXT_MIN_WORD_LENGTH = 4
+# Worker processes and objects per batch of a full text reindex
+FULLTEXT_REINDEX_WORKERS = 1
+FULLTEXT_REINDEX_CHUNK_SIZE = 500
+# Worker threads that validate the rows of large dry run imports
+IMPORT_DRY_RUN_WORKERS = 1
+# Longer lists of permission resource ids are queried from a table instead of
+# being inlined into queries
+RESOURCE_ID_SET_THRESHOLD = 1000
+# Object representations kept in the process local tier in front of memcache
+REPRESENTATION_CACHE_SIZE = 10000
+REPRESENTATION_CACHE_TTL = 300  # 5 minutes
 USER_PERMISSIONS_PROVIDER = None
 EXTENSIONS = []
 exports = []
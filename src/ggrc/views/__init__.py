@@ -8,25 +8,25 @@ Handle non-RESTful views, e.g. routes which return HTML rather than JSON
 """
 
 import collections
+import datetime
 import json
 
 from flask import flash
 from flask import g
 from flask import render_template
+from flask import request
 from flask import url_for
+from werkzeug.exceptions import BadRequest
 from werkzeug.exceptions import Forbidden
 
 from ggrc import models
 from ggrc import settings
 from ggrc.app import app
-from ggrc.app import db
 from ggrc.builder.json import publish
 from ggrc.builder.json import publish_representation
 from ggrc.converters import get_importables, get_exportables
 from ggrc.extensions import get_extension_modules
-from ggrc.fulltext import get_indexer
-from ggrc.fulltext.recordbuilder import fts_record_for
-from ggrc.fulltext.recordbuilder import model_is_indexed
+from ggrc.fulltext import reindex as fulltext_reindex
 from ggrc.login import get_current_user
 from ggrc.login import login_required
 from ggrc.models import all_models
@@ -36,6 +36,8 @@ from ggrc.models.background_task import queued_task
 from ggrc.models.reflection import AttributeInfo
 from ggrc.rbac import permissions
 from ggrc.services.common import as_json
+from ggrc.services.common import get_permission_cache_stats
+from ggrc.services.common import get_representation_cache_stats
 from ggrc.services.common import inclusion_filter
 from ggrc.views import converters
 from ggrc.views import cron
@@ -51,42 +53,26 @@ from ggrc.utils import benchmark
 
 @app.route("/_background_tasks/reindex", methods=["POST"])
 @queued_task
-def reindex(_):
+def reindex(task):
   """
   Web hook to update the full text search index
   """
 
-  do_reindex()
+  do_reindex(task.parameters.get("since"))
 
   return app.make_response((
       'success', 200, [('Content-Type', 'text/html')]))
 
 
-def do_reindex():
+def do_reindex(since=None):
   """
   update the full text search index
-  """
-
-  indexer = get_indexer()
-  indexer.delete_all_records(False)
 
-  # Find all models then remove base classes
-  #   (If we don't remove base classes, we get duplicates in the index.)
-  inheritance_base_models = [
-      all_models.Directive, all_models.SystemOrProcess
-  ]
-  models_ = set(all_models.all_models) - set(inheritance_base_models)
-  models_ = [model for model in models_ if model_is_indexed(model)]
-
-  for model in models_:
-    mapper_class = model._sa_class_manager.mapper.base_mapper.class_
-    query = model.query.options(
-        db.undefer_group(mapper_class.__name__ + '_complete'),
-    )
-    for query_chunk in generate_query_chunks(query):
-      for instance in query_chunk:
-        indexer.create_record(fts_record_for(instance), False)
-      db.session.commit()
+  Args:
+    since: if given, only objects updated after this datetime are reindexed,
+      otherwise the whole index is rebuilt.
+  """
+  fulltext_reindex.reindex(since)
 
 
 def get_permissions_json():
@@ -239,12 +225,14 @@ def objectBrowser():
   return render_template("dashboard/index.haml")
 
 
-def generate_query_chunks(query):
-  """Generate query chunks used by pagination"""
-  chunk_size = 100
-  count = query.count()
-  for offset in range(0, count, chunk_size):
-    yield query.order_by('id').limit(chunk_size).offset(offset).all()
+def parse_since(value):
+  """Parse the time of an incremental reindex."""
+  for date_format in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+    try:
+      return datetime.datetime.strptime(value, date_format)
+    except ValueError:
+      pass
+  raise BadRequest("Invalid reindex time: {}".format(value))
 
 
 @app.route("/admin/reindex", methods=["POST"])
@@ -254,7 +242,11 @@ def admin_reindex():
   """
   if not permissions.is_allowed_read("/admin", None, 1):
     raise Forbidden()
-  task_queue = create_task("reindex", url_for(reindex.__name__), reindex)
+  since = request.form.get("since")
+  if since:
+    since = parse_since(since)
+  task_queue = create_task("reindex", url_for(reindex.__name__), reindex,
+                           parameters={"since": since})
   return task_queue.make_response(
       app.make_response(("scheduled %s" % task_queue.name, 200,
                          [('Content-Type', 'text/html')])))
@@ -270,6 +262,30 @@ def admin():
   return render_template("admin/index.haml")
 
 
+@app.route("/admin/permissions_cache")
+@login_required
+def admin_permissions_cache():
+  """Hit and miss counters of the cached user permissions
+  """
+  if not permissions.is_allowed_read("/admin", None, 1):
+    raise Forbidden()
+  return app.make_response((
+      as_json(get_permission_cache_stats()), 200,
+      [('Content-Type', 'application/json')]))
+
+
+@app.route("/admin/representation_cache")
+@login_required
+def admin_representation_cache():
+  """Hit ratios of the local and memcache object representation cache tiers
+  """
+  if not permissions.is_allowed_read("/admin", None, 1):
+    raise Forbidden()
+  return app.make_response((
+      as_json(get_representation_cache_stats()), 200,
+      [('Content-Type', 'application/json')]))
+
+
 @app.route("/assessments_view")
 @login_required
 def assessments_view():
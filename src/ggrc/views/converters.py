@@ -3,18 +3,25 @@
 # Created By: miha@reciprocitylabs.com
 # Maintained By: miha@reciprocitylabs.com
 
+import itertools
+
 from flask import current_app
 from flask import request
 from flask import json
 from flask import render_template
+from flask import stream_with_context
+from flask import url_for
 from werkzeug.exceptions import BadRequest
 
 from ggrc.app import app
 from ggrc.login import login_required
 from ggrc.converters.base import Converter
 from ggrc.converters.query_helper import QueryHelper, BadQueryException
-from ggrc.converters.import_helper import generate_csv_string
+from ggrc.converters.import_helper import CSV_LINES_PER_CHUNK
+from ggrc.converters.import_helper import generate_csv_stream
 from ggrc.converters.import_helper import read_csv_file
+from ggrc.models.background_task import create_task
+from ggrc.models.background_task import queued_task
 
 
 def check_required_headers(required_headers):
@@ -40,13 +47,36 @@ def parse_export_request():
   return request.json
 
 
+EXPORT_ERROR = u"Export failed due to server error."
+
+
+def with_error_row(rows):
+  """Yield csv rows, ending with an error row if generating them fails.
+
+  The response status is sent before the rows are generated, so a failed
+  export can only be marked in the file itself.
+  """
+  try:
+    for row in rows:
+      yield row
+  except Exception as e:  # pylint: disable=broad-except
+    current_app.logger.exception(e)
+    yield [EXPORT_ERROR + u" The file is incomplete."]
+
+
 def handle_export_request():
   try:
     data = parse_export_request()
     query_helper = QueryHelper(data)
     converter = Converter(ids_by_type=query_helper.get_ids())
-    csv_data = converter.to_array()
-    csv_string = generate_csv_string(csv_data)
+    converter.block_converters_from_ids()
+    rows = converter.to_block_rows()
+    # Rows of the first chunk are generated before the response is
+    # returned, so that early errors still get an error status
+    first_rows = list(itertools.islice(rows, CSV_LINES_PER_CHUNK))
+    csv_stream = generate_csv_stream(
+        itertools.chain(first_rows, with_error_row(rows)),
+        converter.get_csv_width())
 
     object_names = "_".join(converter.get_object_names())
     filename = "{}.csv".format(object_names)
@@ -55,12 +85,13 @@ def handle_export_request():
         ("Content-Type", "text/csv"),
         ("Content-Disposition", "attachment; filename='{}'".format(filename)),
     ]
-    return current_app.make_response((csv_string, 200, headers))
+    return current_app.response_class(stream_with_context(csv_stream),
+                                      headers=headers)
   except BadQueryException as e:
     raise BadRequest(e.message)
   except Exception as e:
     current_app.logger.exception(e)
-  raise BadRequest("Export failed due to server error.")
+  raise BadRequest(EXPORT_ERROR)
 
 
 def check_import_file():
@@ -85,15 +116,42 @@ def parse_import_request():
   return dry_run, csv_data
 
 
+def run_import(csv_data, dry_run, task=None, progress=None):
+  """Import csv data and return the import info as a json response."""
+  converter = Converter(dry_run=dry_run, csv_data=csv_data, task=task,
+                        progress=progress)
+  converter.import_csv()
+  response_json = json.dumps(converter.get_info())
+  headers = [("Content-Type", "application/json")]
+  return current_app.make_response((response_json, 200, headers))
+
+
+@queued_task
+def import_task(task):
+  """Run an import in a background task.
+
+  Rows committed by an earlier run of the task are stored in the task
+  progress, so a restarted task continues where the previous run stopped.
+  """
+  return run_import(task.parameters["csv_data"], False, task=task,
+                    progress=task.progress)
+
+
 def handle_import_request():
   try:
     dry_run, csv_data = parse_import_request()
-    converter = Converter(dry_run=dry_run, csv_data=csv_data)
-    converter.import_csv()
-    response_data = converter.get_info()
-    response_json = json.dumps(response_data)
-    headers = [("Content-Type", "application/json")]
-    return current_app.make_response((response_json, 200, headers))
+    if not dry_run and "X-GGRC-BackgroundTask" in request.headers:
+      task = create_task("import_csv", url_for("handle_import_task"),
+                         import_task, parameters={"csv_data": csv_data})
+      response_json = json.dumps({
+          "id": task.id,
+          "name": task.name,
+          "status": task.status,
+      })
+      headers = [("Content-Type", "application/json")]
+      return task.make_response(
+          current_app.make_response((response_json, 202, headers)))
+    return run_import(csv_data, dry_run)
   except Exception as e:
     current_app.logger.exception(e)
   raise BadRequest("Import failed due to server error.")
@@ -110,6 +168,11 @@ def init_converter_views():
   def handle_import_csv():
     return handle_import_request()
 
+  @app.route("/_background_tasks/import_csv", methods=["POST"])
+  @login_required
+  def handle_import_task():
+    return import_task()
+
   @app.route("/import")
   @login_required
   def import_view():
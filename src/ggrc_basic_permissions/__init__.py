@@ -26,6 +26,8 @@ from ggrc_basic_permissions.models import ContextImplication
 from ggrc_basic_permissions.models import get_ids_related_to
 from ggrc_basic_permissions.models import Role
 from ggrc_basic_permissions.models import UserRole
+from ggrc_basic_permissions.permissions_cache import \
+    get_users_with_stale_permissions
 from ggrc.login import get_current_user
 from ggrc.models import all_models
 from ggrc.models.audit import Audit
@@ -33,6 +35,8 @@ from ggrc.models.program import Program
 from ggrc.rbac import permissions
 from ggrc.rbac.permissions_provider import DefaultUserPermissions
 from ggrc.services.common import _get_cache_manager
+from ggrc.services.common import count_permission_cache_event
+from ggrc.services.common import PERMISSION_CACHE_TIMEOUT
 from ggrc.services.common import Resource
 from ggrc.services.registry import service
 from ggrc.utils import benchmark
@@ -375,7 +379,6 @@ def load_permissions_for(user):  # noqa
   'condition' is the string name of a conditional operator, such as 'contains'.
   'terms' are the arguments to the 'condition'.
   """
-  PERMISSION_CACHE_TIMEOUT = 1800  # 30 minutes
   permissions = {}
   key = 'permissions:{}'.format(user.id)
   cache = None
@@ -393,7 +396,9 @@ def load_permissions_for(user):  # noqa
       if permissions_cache:
         # If the key is both in permissions:list and in memcache itself
         # it is safe to return the cached permissions
+        count_permission_cache_event(cache, 'hits')
         return permissions_cache
+    count_permission_cache_event(cache, 'misses')
 
   # Add default `Help` and `NotificationConfig` permissions for everyone
   # FIXME: This should be made into a global base role so it can be extended
@@ -814,3 +819,4 @@ ROLE_DECLARATIONS = BasicRoleDeclarations()
 ROLE_IMPLICATIONS = BasicRoleImplications()
 
 contributed_get_ids_related_to = get_ids_related_to
+contributed_get_users_with_stale_permissions = get_users_with_stale_permissions
@@ -0,0 +1,217 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: dan@reciprocitylabs.com
+# Maintained By: dan@reciprocitylabs.com
+
+"""Dependency tracking for the cached user permissions.
+
+`load_permissions_for` caches the permissions of every user in memcache. The
+permissions of a user depend on their user roles, the context implications of
+the contexts they have roles in, the objects they own, the objects they are
+assigned to and the objects mapped to programs and audits they have roles in.
+The functions in this module find the users whose cached permissions are
+invalidated by the objects modified in a session, so that only their cache
+entries are dropped after commit.
+"""
+
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import or_
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc_basic_permissions.models import ContextImplication
+from ggrc_basic_permissions.models import Role
+from ggrc_basic_permissions.models import UserRole
+
+
+# Types whose mappings grant permissions to the users with roles in their
+# contexts (see `program_relationship_query` and `audit_relationship_query`).
+CONTEXT_GRANTING_TYPES = ("Program", "Audit")
+
+
+class FlushAll(Exception):
+  """Raised when a change affects the permissions of all users."""
+  pass
+
+
+def _users_in_contexts(context_ids):
+  """Query for the users with roles in or implied from the given contexts."""
+  implied_contexts = db.session.query(ContextImplication.context_id).filter(
+      ContextImplication.source_context_id.in_(context_ids))
+  return db.session.query(UserRole.person_id).filter(or_(
+      UserRole.context_id.in_(context_ids),
+      UserRole.context_id.in_(implied_contexts),
+  ))
+
+
+def _assignees_of(objects):
+  """Query for the people assigned to any of the given (type, id) pairs."""
+  rel = all_models.Relationship
+  attr = all_models.RelationshipAttr
+  ids_by_type = {}
+  for type_, id_ in objects:
+    ids_by_type.setdefault(type_, set()).add(id_)
+  object_filters = []
+  for type_, ids in ids_by_type.items():
+    object_filters.append(and_(
+        rel.source_type == type_,
+        rel.source_id.in_(ids),
+        rel.destination_type == "Person"))
+    object_filters.append(and_(
+        rel.destination_type == type_,
+        rel.destination_id.in_(ids),
+        rel.source_type == "Person"))
+  return db.session.query(
+      case([(rel.destination_type == "Person", rel.destination_id)],
+           else_=rel.source_id)
+  ).join(attr, and_(
+      attr.relationship_id == rel.id,
+      attr.attr_name == "AssigneeType",
+  )).filter(or_(*object_filters))
+
+
+def _owns_context(obj):
+  """Check if a deleted object owned its context.
+
+  Deleting such an object bulk deletes the user roles and the context
+  implications of its context in `handle_resource_deleted`, and those changes
+  are not visible in the session.
+  """
+  context_id = getattr(obj, "context_id", None)
+  if context_id is None:
+    return False
+  return db.session.query(all_models.Context.id).filter(
+      all_models.Context.id == context_id,
+      all_models.Context.related_object_id == obj.id,
+      all_models.Context.related_object_type == obj.__class__.__name__,
+  ).count() > 0
+
+
+class _Dependents(object):
+  """Permission dependents of the objects modified in a session.
+
+  Attributes:
+    user_ids: ids of the users that can be determined directly.
+    contexts: ids of the contexts whose users are affected.
+    mapped_objects: (type, id) pairs of objects whose assignees are affected.
+    granting_objects: (type, id) pairs of mapped programs and audits, whose
+        contexts are looked up together.
+  """
+
+  def __init__(self):
+    self.user_ids = set()
+    self.contexts = set()
+    self.mapped_objects = set()
+    self.granting_objects = set()
+
+  def collect(self, obj, deleted):
+    """Collect the permission dependents of a single modified object.
+
+    Raises:
+      FlushAll: if the change affects the permissions of every user.
+    """
+    if isinstance(obj, Role):
+      raise FlushAll()
+    elif isinstance(obj, (UserRole, all_models.ObjectOwner)):
+      self.user_ids.add(obj.person_id)
+    elif isinstance(obj, all_models.Person):
+      # Bootstrap admin permissions are granted by email
+      self.user_ids.add(obj.id)
+    elif isinstance(obj, ContextImplication):
+      self._collect_context_implication(obj)
+    elif isinstance(obj, all_models.Relationship):
+      self._collect_relationship(obj)
+    elif isinstance(obj, all_models.RelationshipAttr):
+      self._collect_relationship_attr(obj)
+    elif deleted and _owns_context(obj):
+      raise FlushAll()
+
+  def _collect_context_implication(self, implication):
+    if implication.source_context_id is None:
+      raise FlushAll()
+    self.contexts.add(implication.source_context_id)
+    if implication.context_id is not None:
+      self.contexts.add(implication.context_id)
+
+  def _collect_ends(self, ends):
+    for type_, id_ in ends:
+      if type_ == "Person":
+        self.user_ids.add(id_)
+      else:
+        self.mapped_objects.add((type_, id_))
+
+  def _collect_relationship(self, relationship):
+    ends = ((relationship.source_type, relationship.source_id),
+            (relationship.destination_type, relationship.destination_id))
+    self._collect_ends(ends)
+    self.granting_objects.update(
+        end for end in ends if end[0] in CONTEXT_GRANTING_TYPES)
+
+  def _collect_relationship_attr(self, relationship_attr):
+    # AssigneeType attrs decide which mapped people are assignees
+    relationship = db.session.query(
+        all_models.Relationship.source_type,
+        all_models.Relationship.source_id,
+        all_models.Relationship.destination_type,
+        all_models.Relationship.destination_id,
+    ).filter(
+        all_models.Relationship.id == relationship_attr.relationship_id
+    ).first()
+    if relationship is None:
+      # A relationship deleted together with its attrs is collected itself
+      return
+    source_type, source_id, destination_type, destination_id = relationship
+    self._collect_ends(((source_type, source_id),
+                        (destination_type, destination_id)))
+
+  def _collect_granting_contexts(self):
+    """Add the contexts of mapped programs and audits, one query per type."""
+    for type_ in CONTEXT_GRANTING_TYPES:
+      ids = [id_ for end_type, id_ in self.granting_objects
+             if end_type == type_]
+      if not ids:
+        continue
+      model = getattr(all_models, type_)
+      query = db.session.query(model.context_id).filter(model.id.in_(ids))
+      self.contexts.update(context_id for context_id, in query
+                           if context_id is not None)
+
+  def get_user_ids(self):
+    """Get ids of all users affected by the collected objects."""
+    self._collect_granting_contexts()
+    user_ids = set(self.user_ids)
+    if self.contexts:
+      user_ids.update(id_ for id_, in _users_in_contexts(self.contexts))
+    if self.mapped_objects:
+      user_ids.update(id_ for id_, in _assignees_of(self.mapped_objects))
+    return user_ids
+
+
+def get_users_with_stale_permissions(modified_objects):
+  """Get ids of users whose cached permissions are invalidated by a session.
+
+  This must be called before the session is committed, while the deleted
+  objects can still be inspected.
+
+  Args:
+    modified_objects: ggrc.models.cache.Cache with the new, dirty and deleted
+      objects of the session.
+
+  Returns:
+    A set of user ids, or None if the permissions of all users need to be
+    dropped.
+  """
+  if modified_objects is None:
+    return None
+  dependents = _Dependents()
+  try:
+    for obj in modified_objects.new:
+      dependents.collect(obj, False)
+    for obj in modified_objects.dirty:
+      dependents.collect(obj, False)
+    for obj in modified_objects.deleted:
+      dependents.collect(obj, True)
+  except FlushAll:
+    return None
+  return dependents.get_user_ids()
@@ -7,6 +7,7 @@
 """ Module for all special column handlers for workflow objects """
 
 import datetime
+from collections import defaultdict
 
 from ggrc import db
 from ggrc import models
@@ -50,31 +51,21 @@ class WorkflowColumnHandler(handlers.ParentColumnHandler):
 
   """ handler for workflow column in task groups """
 
-  def __init__(self, row_converter, key, **options):
-    """ init workflow handler """
-    self.parent = wf_models.Workflow
-    super(WorkflowColumnHandler, self).__init__(row_converter, key, **options)
+  parent = wf_models.Workflow
 
 
 class TaskGroupColumnHandler(handlers.ParentColumnHandler):
 
   """ handler for task group column in task group tasks """
 
-  def __init__(self, row_converter, key, **options):
-    """ init task group handler """
-    self.parent = wf_models.TaskGroup
-    super(TaskGroupColumnHandler, self).__init__(row_converter, key, **options)
+  parent = wf_models.TaskGroup
 
 
 class CycleTaskGroupColumnHandler(handlers.ParentColumnHandler):
 
   """ handler for task group column in task group tasks """
 
-  def __init__(self, row_converter, key, **options):
-    """ init task group handler """
-    self.parent = wf_models.CycleTaskGroup
-    super(CycleTaskGroupColumnHandler, self) \
-        .__init__(row_converter, key, **options)
+  parent = wf_models.CycleTaskGroup
 
 
 class TaskDateColumnHandler(handlers.ColumnHandler):
@@ -311,8 +302,23 @@ class ObjectsColumnHandler(handlers.ColumnHandler):
     self.new_slugs = row_converter.block_converter.converter.new_objects
     super(ObjectsColumnHandler, self).__init__(row_converter, key, **options)
 
+  @classmethod
+  def get_prefetch_lookups(cls, object_class, raw_values, **options):
+    mappable = get_importables()
+    slugs = defaultdict(set)
+    for line in handlers.get_lines(raw_values):
+      line = line.split(":", 1)
+      if len(line) != 2:
+        continue
+      class_ = mappable.get(line[0].strip().lower())
+      if class_ is not None:
+        slugs[class_].add(line[1].strip())
+    return [(mapped_class, "slug", class_slugs)
+            for mapped_class, class_slugs in slugs.items()]
+
   def parse_item(self):
     lines = [line.split(":", 1) for line in self.raw_value.splitlines()]
+    converter = self.row_converter.block_converter.converter
     objects = []
     for line in lines:
       if len(line) != 2:
@@ -325,7 +331,7 @@ class ObjectsColumnHandler(handlers.ColumnHandler):
         self.add_warning(errors.WRONG_VALUE, column_name=self.display_name)
         continue
       new_object_slugs = self.new_slugs[class_]
-      obj = class_.query.filter(class_.slug == slug).first()
+      obj = converter.find_object(class_, "slug", slug)
       if obj:
         objects.append(obj)
       elif not (slug in new_object_slugs and self.dry_run):
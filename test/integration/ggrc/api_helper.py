@@ -20,6 +20,7 @@ from ggrc.app import app
 from ggrc.services.common import Resource
 import flask
 import logging
+import urllib
 
 
 # style: should the class name be all capitals?
@@ -143,8 +144,11 @@ class Api():
     api_link = self.api_link(obj, obj.id)
     return self.tc.delete(api_link, headers=headers)
 
-  def search(self, types, q="", counts=False, relevant_objects=None):
+  def search(self, types, q="", counts=False, relevant_objects=None,
+             args=None):
     query = '/search?q={}&types={}&counts_only={}'.format(q, types, counts)
     if relevant_objects is not None:
       query += '&relevant_objects=' + relevant_objects
+    if args:
+      query += '&' + urllib.urlencode(args)
     return (self.tc.get(query), self.headers)
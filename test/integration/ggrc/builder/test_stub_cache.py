@@ -0,0 +1,47 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Tests for the stub cache of published representations."""
+
+from ggrc.builder.json import invalidate_stubs
+from ggrc.builder.json import LazyStubRepresentation
+from ggrc.builder.json import publish_representation
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestStubCache(TestCase):
+  """Test stubs are reused until their objects change."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.control = factories.ControlFactory()
+
+  def _publish(self):
+    return publish_representation({
+        "control": LazyStubRepresentation("Control", self.control.id),
+        "missing": LazyStubRepresentation("Control", 0),
+    })
+
+  def test_cached_stub(self):
+    """Cached stubs are rendered without querying the database."""
+    first = self._publish()
+    self.assertEqual(first["control"]["id"], self.control.id)
+    self.assertIsNone(first["missing"])
+    with QueryCounter() as counter:
+      second = self._publish()
+    self.assertEqual(second, first)
+    # Only the missing stub is queried again
+    self.assertEqual(len(counter.queries), 1)
+
+  def test_invalidated_stub(self):
+    """Stubs of modified objects are queried again."""
+    self._publish()
+    invalidate_stubs([self.control])
+    with QueryCounter() as counter:
+      self._publish()
+    self.assertEqual(len(counter.queries), 1)
+    self.assertIn("controls", counter.queries[0])
@@ -5,9 +5,12 @@
 
 from os.path import abspath, dirname, join
 from flask.json import dumps
+from mock import patch
 
 from ggrc.app import app
 from ggrc.converters import get_importables
+from ggrc.converters.base import Converter
+from ggrc.converters.import_helper import CSV_LINES_PER_CHUNK
 from ggrc.models.reflection import AttributeInfo
 from integration.ggrc import TestCase
 
@@ -15,6 +18,15 @@ THIS_ABS_PATH = abspath(dirname(__file__))
 CSV_DIR = join(THIS_ABS_PATH, 'test_csvs/')
 
 
+def failing_rows(count):
+  """Get a to_block_rows replacement that fails after count rows."""
+  def to_block_rows(converter):
+    for i in range(count):
+      yield [u"row {}".format(i)]
+    raise Exception("Rows failed")
+  return to_block_rows
+
+
 class TestExportEmptyTemplate(TestCase):
 
   def setUp(self):
@@ -85,6 +97,34 @@ class TestExportSingleObject(TestCase):
     return self.client.post("/_service/export_csv", data=dumps(data),
                             headers=self.headers)
 
+  def test_chunked_export(self):
+    """Objects loaded in several chunks are exported like in one chunk."""
+    data = [{"object_name": "Program", "fields": "all"}]
+    response = self.export_csv(data)
+    with patch("ggrc.converters.base_block.EXPORT_CHUNK_SIZE", 5):
+      chunked_response = self.export_csv(data)
+    self.assertEqual(response.data, chunked_response.data)
+    for i in range(1, 24):
+      self.assertIn(",Cat ipsum {},".format(i), chunked_response.data)
+
+  def test_failed_export_start(self):
+    """Errors in the first chunk of an export return an error status."""
+    data = [{"object_name": "Program", "fields": "all"}]
+    with patch.object(Converter, "to_block_rows", failing_rows(1)):
+      response = self.export_csv(data)
+    self.assert400(response)
+
+  def test_failed_export_stream(self):
+    """Errors while an export is streamed end the file with an error row."""
+    data = [{"object_name": "Program", "fields": "all"}]
+    count = CSV_LINES_PER_CHUNK + 1
+    with patch.object(Converter, "to_block_rows", failing_rows(count)):
+      response = self.export_csv(data)
+    self.assert200(response)
+    lines = response.data.splitlines()
+    self.assertEqual(len(lines), count + 1)
+    self.assertTrue(lines[-1].startswith("Export failed"))
+
   def test_simple_export_query(self):
     data = [{
         "object_name": "Program",
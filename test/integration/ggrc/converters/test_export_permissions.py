@@ -0,0 +1,112 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Tests for read permission filters of export queries."""
+
+from flask import g
+
+from ggrc.converters.query_helper import QueryHelper
+from ggrc.models import Control
+from ggrc.rbac import permissions
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestExportPermissions(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.contexts = [factories.ContextFactory() for _ in range(3)]
+    self.controls = [factories.ControlFactory(context=context)
+                     for context in self.contexts]
+    self.controls.append(factories.ControlFactory(context=None))
+
+  def tearDown(self):
+    g._request_permissions = {}
+    TestCase.tearDown(self)
+
+  def get_control_ids(self):
+    query_helper = QueryHelper([{
+        "object_name": "Control",
+        "filters": {"expression": {}},
+    }])
+    return set(query_helper.get_ids()[0]["ids"])
+
+  def get_allowed_ids(self):
+    return {control.id for control in Control.query
+            if permissions.is_allowed_read_for(control)}
+
+  def test_contexts_and_resources(self):
+    """Only ids of readable objects are queried."""
+    g._request_permissions = {
+        "read": {
+            "Control": {
+                "contexts": [self.contexts[0].id],
+                "resources": [self.controls[3].id],
+            },
+        },
+    }
+    expected = {self.controls[0].id, self.controls[3].id}
+    self.assertEqual(self.get_allowed_ids(), expected)
+    self.assertEqual(self.get_control_ids(), expected)
+
+  def test_sql_conditions(self):
+    """Conditions with a SQL form are part of the filter."""
+    g._request_permissions = {
+        "read": {
+            "Control": {
+                "contexts": [self.contexts[0].id, self.contexts[1].id],
+                "conditions": {
+                    self.contexts[1].id: [{
+                        "condition": "in",
+                        "terms": {
+                            "property_name": "title",
+                            "value": [self.controls[1].title],
+                        },
+                    }],
+                    self.contexts[2].id: [{
+                        "condition": "is",
+                        "terms": {
+                            "property_name": "title",
+                            "value": "unknown",
+                        },
+                    }],
+                },
+            },
+        },
+    }
+    self.assertIsNotNone(permissions.read_filter_for(Control))
+    expected = {self.controls[0].id, self.controls[1].id}
+    self.assertEqual(self.get_allowed_ids(), expected)
+    self.assertEqual(self.get_control_ids(), expected)
+
+  def test_instance_conditions(self):
+    """Conditions without a SQL form are checked on loaded objects."""
+    g._request_permissions = {
+        "read": {
+            "Control": {
+                "contexts": [self.contexts[0].id],
+                "conditions": {
+                    self.contexts[0].id: [{
+                        "condition": "relationship",
+                        "terms": {
+                            "property_name": "directive",
+                            "action": "read",
+                        },
+                    }],
+                },
+            },
+        },
+    }
+    self.assertIsNone(permissions.read_filter_for(Control))
+    self.assertEqual(self.get_control_ids(), self.get_allowed_ids())
+
+  def test_admin(self):
+    """Admins read all objects."""
+    g._request_permissions = {
+        "__GGRC_ADMIN__": {"__GGRC_ALL__": {"contexts": [0]}},
+    }
+    self.assertEqual(self.get_control_ids(),
+                     {control.id for control in self.controls})
@@ -0,0 +1,38 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for the block level mapping stage of imports."""
+
+from ggrc.models import OrgGroup
+from ggrc.models import Policy
+from ggrc.models import Relationship
+from integration.ggrc.converters import TestCase
+
+
+class TestImportMappings(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+
+  def test_reimport_mappings(self):
+    """Existing mappings in either direction are not created again."""
+    filename = "multi_basic_policy_orggroup_product_with_mappings.csv"
+    self.import_file(filename)
+    self.assertEqual(Relationship.query.count(), 13)
+    response = self.import_file(filename)
+    for block in response:
+      self.assertEqual(set(), set(block["row_warnings"]))
+      self.assertEqual(set(), set(block["row_errors"]))
+    self.assertEqual(Relationship.query.count(), 13)
+
+  def test_mapping_attributes(self):
+    """Bulk inserted mappings get the same values as ORM created ones."""
+    self.import_file("multi_basic_policy_orggroup_product_with_mappings.csv")
+    policy = Policy.query.filter_by(slug="p-2").first()
+    org_group = OrgGroup.query.filter_by(slug="org-1").first()
+    relationship = Relationship.find_related(policy, org_group)
+    self.assertEqual(relationship.status, "Draft")
+    self.assertIsNotNone(relationship.modified_by_id)
@@ -0,0 +1,77 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for prefetching objects looked up by import handlers."""
+
+from ggrc.converters.base import Converter
+from ggrc.models import Control
+from ggrc.models import Person
+from ggrc.utils import QueryCounter
+from integration.ggrc.converters import TestCase
+from integration.ggrc.models import factories
+
+
+class TestImportPrefetch(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.control = factories.ControlFactory(slug="CONTROL-1")
+    self.person = factories.PersonFactory(email="prefetch@example.com")
+    self.converter = Converter()
+
+  def test_prefetched_lookups(self):
+    """Prefetched values, found or not, are resolved without queries."""
+    self.converter.prefetch_by_key(
+        Control, "slug", ["control-1", "control-404"])
+    self.converter.prefetch_by_key(Person, "email", ["prefetch@example.com"])
+    with QueryCounter() as counter:
+      self.assertEqual(
+          self.converter.find_object(Control, "slug", "CONTROL-1"),
+          self.control)
+      self.assertIsNone(
+          self.converter.find_object(Control, "slug", "control-404"))
+      self.assertEqual(
+          self.converter.find_object(Person, "email", "prefetch@example.com"),
+          self.person)
+      self.assertEqual(counter.get, 0)
+
+  def test_lookup_without_prefetch(self):
+    """Values that were not prefetched are queried."""
+    with QueryCounter() as counter:
+      self.assertEqual(
+          self.converter.find_object(Control, "slug", "CONTROL-1"),
+          self.control)
+      self.assertEqual(counter.get, 1)
+
+  def test_block_prefetch(self):
+    """Blocks prefetch row keys and mapped objects of all rows."""
+    self.converter.csv_data = [
+        [u"Object type", u"", u"", u""],
+        [u"Control", u"Code", u"Title", u"Map:Control"],
+        [u"", u"control-1", u"Updated", u"control-2\ncontrol-3"],
+        [u"", u"control-2", u"New", u""],
+    ]
+    self.converter.block_converters_from_csv()
+    self.converter.prefetch_objects()
+    index = self.converter.object_index[(Control, "slug")]
+    self.assertEqual(index, {
+        "control-1": self.control,
+        "control-2": None,
+        "control-3": None,
+    })
+
+  def test_prefetched_unique_values(self):
+    """Unique values are compared with prefetched existing values."""
+    self.converter.prefetch_unique_values(
+        Control, "title", [self.control.title, "New title"])
+    with QueryCounter() as counter:
+      self.assertEqual(
+          self.converter.find_unique_ids(
+              Control, "title", self.control.title.upper()),
+          {self.control.id})
+      self.assertEqual(
+          self.converter.find_unique_ids(Control, "title", "new title"),
+          set())
+      self.assertEqual(counter.get, 0)
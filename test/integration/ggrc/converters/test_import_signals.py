@@ -0,0 +1,52 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for model signals sent by imports."""
+
+from ggrc.models import Policy
+from ggrc.services.common import Resource
+from integration.ggrc.converters import TestCase
+
+
+class TestImportSignals(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+    self.batches = []
+    self.pre_commit_batches = []
+    self.objects = []
+
+  def batch_listener(self, sender, objects=None, sources=None, service=None):
+    self.batches.append(list(objects))
+
+  def pre_commit_listener(self, sender, objects=None, sources=None,
+                          service=None):
+    self.pre_commit_batches.append(list(objects))
+
+  def listener(self, sender, obj=None, src=None, service=None):
+    self.objects.append(obj)
+
+  def test_batch_signals(self):
+    """Imported objects are sent in a batch and one by one."""
+    pre_commit_signal = Resource.model_posted_batch
+    batch_signal = Resource.model_posted_after_commit_batch
+    signal = Resource.model_posted_after_commit
+    pre_commit_signal.connect(self.pre_commit_listener, sender=Policy)
+    batch_signal.connect(self.batch_listener, sender=Policy)
+    signal.connect(self.listener, sender=Policy)
+    try:
+      self.import_file("policy_basic_import.csv")
+    finally:
+      pre_commit_signal.disconnect(self.pre_commit_listener, sender=Policy)
+      batch_signal.disconnect(self.batch_listener, sender=Policy)
+      signal.disconnect(self.listener, sender=Policy)
+
+    policies = set(Policy.query)
+    self.assertEqual(len(policies), 3)
+    self.assertEqual([len(batch) for batch in self.pre_commit_batches], [3])
+    self.assertEqual(len(self.batches), 1)
+    self.assertEqual(set(self.batches[0]), policies)
+    self.assertEqual(set(self.objects), policies)
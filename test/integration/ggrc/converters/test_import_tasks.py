@@ -0,0 +1,64 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for imports that run as background tasks."""
+
+from os.path import join
+
+from flask import json
+
+from ggrc import db
+from ggrc.converters.import_helper import read_csv_file
+from ggrc.models import Policy
+from ggrc.models.background_task import BackgroundTask
+from ggrc.views.converters import import_task
+from integration.ggrc.converters import TestCase
+
+
+class TestImportTasks(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+
+  def create_task(self, filename):
+    csv_data = read_csv_file(join(self.CSV_DIR, filename))
+    task = BackgroundTask(name="import_csv", status="Pending",
+                          parameters={"csv_data": csv_data})
+    db.session.add(task)
+    db.session.commit()
+    return task
+
+  def test_background_import(self):
+    """Background imports report the same info as direct imports."""
+    filename = "policy_basic_import.csv"
+    dry_run = self._import_file(filename, dry_run=True)
+    data = {"file": (open(join(self.CSV_DIR, filename)), filename)}
+    headers = {
+        "X-test-only": "false",
+        "X-requested-by": "gGRC",
+        "X-GGRC-BackgroundTask": "true",
+    }
+    response = self.client.post("/_service/import_csv",
+                                data=data, headers=headers)
+    self.assert200(response)
+    self.assertEqual(json.loads(response.data), dry_run)
+
+    task = BackgroundTask.query.one()
+    self.assertEqual(task.status, "Success")
+    self.assertEqual(task.progress_info["rows"], 3)
+    self.assertEqual(task.progress_info["processed"], 3)
+    self.assertNotIn("committed", task.progress_info)
+
+  def test_resume_import(self):
+    """A restarted task does not import committed rows again."""
+    task = self.create_task("policy_basic_import.csv")
+    first = json.loads(import_task(task).data)
+    self.assertEqual(Policy.query.count(), 3)
+
+    task = BackgroundTask.query.get(task.id)
+    second = json.loads(import_task(task).data)
+    self.assertEqual(Policy.query.count(), 3)
+    self.assertEqual(first, second)
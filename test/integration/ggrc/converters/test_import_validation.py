@@ -0,0 +1,62 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for parallel validation of dry run imports."""
+
+from mock import patch
+
+from ggrc import settings
+from ggrc.models import Policy
+from integration.ggrc.converters import TestCase
+
+
+class TestParallelValidation(TestCase):
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+
+  def parallel_dry_run(self, filename):
+    with patch.object(settings, "IMPORT_DRY_RUN_WORKERS", 3, create=True), \
+            patch("ggrc.converters.validation.DRY_RUN_CHUNK_SIZE", 2):
+      return self.import_file(filename, dry_run=True)
+
+  def assert_same_info(self, parallel, sequential):
+    self.assertEqual(len(parallel), len(sequential))
+    for parallel_block, block in zip(parallel, sequential):
+      for key in ("name", "rows", "created", "updated", "ignored", "deleted"):
+        self.assertEqual(parallel_block[key], block[key])
+      for key in ("block_errors", "block_warnings", "row_errors",
+                  "row_warnings"):
+        self.assertEqual(set(parallel_block[key]), set(block[key]))
+
+  def test_same_info(self):
+    """Parallel validation reports the same results as a sequential one."""
+    for filename in ("import_with_all_warnings_and_errors.csv",
+                     "multi_basic_policy_orggroup_product_with_mappings.csv",
+                     "policy_same_titles.csv"):
+      sequential = self.import_file(filename, dry_run=True)
+      parallel = self.parallel_dry_run(filename)
+      self.assert_same_info(parallel, sequential)
+
+  def test_mapping_to_failed_row(self):
+    """Rows with errors in other partitions are not valid mappings."""
+    filename = "policy_orggroup_mapping_to_failed_row.csv"
+    sequential = self.import_file(filename, dry_run=True)
+    parallel = self.parallel_dry_run(filename)
+    self.assert_same_info(parallel, sequential)
+    self.assertTrue(any("'p-2'" in warning
+                        for warning in parallel[1]["row_warnings"]))
+
+  def test_deterministic_messages(self):
+    """Messages are always merged in the same order."""
+    filename = "import_with_all_warnings_and_errors.csv"
+    self.assertEqual(self.parallel_dry_run(filename),
+                     self.parallel_dry_run(filename))
+
+  def test_nothing_written(self):
+    """Validated objects are not saved."""
+    self.parallel_dry_run("multi_basic_policy_orggroup_product.csv")
+    self.assertEqual(Policy.query.count(), 0)
@@ -0,0 +1,92 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: dan@reciprocitylabs.com
+# Maintained By: dan@reciprocitylabs.com
+
+"""Tests for rebuilding the full text index."""
+
+import datetime
+
+from ggrc import db
+from ggrc.fulltext import reindex
+from ggrc.fulltext.mysql import MysqlRecordProperty
+from ggrc.models import all_models
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestReindex(TestCase):
+  """Test full and incremental reindex."""
+
+  @staticmethod
+  def _titles(control):
+    return [content for content, in db.session.query(
+        MysqlRecordProperty.content).filter(
+            MysqlRecordProperty.type == "Control",
+            MysqlRecordProperty.key == control.id,
+            MysqlRecordProperty.property == "title")]
+
+  def test_full_reindex(self):
+    """All objects are indexed and the run tables are removed."""
+    control = factories.ControlFactory(title="Reindexed control")
+    reindex.reindex()
+    self.assertEqual(self._titles(control), ["Reindexed control"])
+    tables = [name for name, in db.session.execute("SHOW TABLES")]
+    self.assertNotIn(reindex.checkpoints_table.name, tables)
+    self.assertNotIn(MysqlRecordProperty.__tablename__ +
+                     reindex.SHADOW_SUFFIX, tables)
+
+  @staticmethod
+  def _set_updated_yesterday(controls):
+    # DATETIME columns only have second resolution, so a control updated in
+    # the same second as the run start would be caught up again
+    db.session.execute(all_models.Control.__table__.update().where(
+        all_models.Control.id.in_([control.id for control in controls])
+    ).values(updated_at=datetime.datetime.now() - datetime.timedelta(1)))
+    db.session.commit()
+
+  def test_resume(self):
+    """Finished models are skipped when an interrupted run is resumed."""
+    control = factories.ControlFactory()
+    self._set_updated_yesterday([control])
+    model_names = [model.__name__ for model in reindex.get_indexed_models()]
+    reindex._start_run(model_names)
+    db.session.execute(reindex.checkpoints_table.update().where(
+        reindex.checkpoints_table.c.model == "Control"
+    ).values(last_id=control.id, finished=True))
+    db.session.commit()
+    reindex.reindex()
+    self.assertEqual(self._titles(control), [])
+
+  def test_incremental_reindex(self):
+    """Only the objects updated since the given time are reindexed."""
+    old = factories.ControlFactory(title="Old control")
+    reindex.reindex(since=datetime.datetime.now() + datetime.timedelta(1))
+    self.assertEqual(self._titles(old), [])
+    reindex.reindex(since=datetime.datetime.now() - datetime.timedelta(1))
+    reindex.reindex(since=datetime.datetime.now() - datetime.timedelta(1))
+    self.assertEqual(self._titles(old), ["Old control"])
+
+  def test_resume_in_model(self):
+    """Rows written after the last checkpoint are replaced on resume."""
+    indexed, pending = [factories.ControlFactory(title="Control {}".format(i))
+                        for i in range(2)]
+    self._set_updated_yesterday([indexed, pending])
+    model_names = [model.__name__ for model in reindex.get_indexed_models()]
+    reindex._start_run(model_names)
+    db.session.execute(reindex.checkpoints_table.update().where(
+        reindex.checkpoints_table.c.model == "Control"
+    ).values(last_id=indexed.id))
+    # Rows of a chunk whose checkpoint was lost in a crash
+    db.session.execute(reindex._get_shadow_table().insert(), [{
+        "key": pending.id,
+        "type": "Control",
+        "context_id": None,
+        "tags": "",
+        "property": "title",
+        "content": "Control 1",
+    }])
+    db.session.commit()
+    reindex.reindex()
+    self.assertEqual(self._titles(indexed), [])
+    self.assertEqual(self._titles(pending), ["Control 1"])
@@ -0,0 +1,81 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Tests for the batched full text record writes."""
+
+from ggrc import db
+from ggrc.fulltext import get_indexer
+from ggrc.fulltext import Record
+from integration.ggrc import TestCase
+
+
+class TestSqlIndexer(TestCase):
+  """Test creating, updating and deleting records in batches."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.indexer = get_indexer()
+    self.indexer.delete_all_records()
+
+  def _properties(self, key, type_="Control"):
+    record_type = self.indexer.record_type
+    return dict(db.session.query(
+        record_type.property, record_type.content
+    ).filter(record_type.key == key, record_type.type == type_))
+
+  def test_create_and_delete(self):
+    """Records are created and deleted in batches."""
+    self.indexer.create_records([
+        Record(1, "Control", None, "", title="first", slug="C-1"),
+        Record(2, "Control", None, "", title="second", slug="C-2"),
+        Record(1, "Market", None, "", title="market"),
+    ])
+    self.assertEqual(self._properties(1),
+                     {"title": "first", "slug": "C-1"})
+    self.indexer.delete_records([(1, "Control"), (1, "Market")])
+    self.assertEqual(self._properties(1), {})
+    self.assertEqual(self._properties(1, "Market"), {})
+    self.assertEqual(self._properties(2),
+                     {"title": "second", "slug": "C-2"})
+
+  def test_update_diff(self):
+    """Diff updates rewrite changed and delete removed properties."""
+    self.indexer.create_records([
+        Record(1, "Control", None, "", title="old", slug="C-1", status=1),
+    ])
+    self.indexer.update_records([
+        Record(1, "Control", None, "", title="new", status=1),
+    ], diff=True)
+    self.assertEqual(self._properties(1), {"title": "new", "status": "1"})
+    self.indexer.update_records([
+        Record(1, "Control", None, "", title="newer"),
+    ])
+    self.assertEqual(self._properties(1), {"title": "newer"})
+
+  def test_update_diff_context(self):
+    """Diff updates move all properties of a record to its new context."""
+    self.indexer.create_records([
+        Record(1, "Control", None, "", title="title", slug="C-1"),
+    ])
+    self.indexer.update_records([
+        Record(1, "Control", 5, "", title="title", slug="C-1"),
+    ], diff=True)
+    record_type = self.indexer.record_type
+    self.assertEqual(
+        set(db.session.query(record_type.context_id).filter(
+            record_type.key == 1, record_type.type == "Control")),
+        {(5,)})
+
+  def test_update_diff_attribute_value(self):
+    """Diff updates of custom attribute values keep the object properties."""
+    self.indexer.create_records([
+        Record(1, "Control", None, "", title="title", slug="C-1"),
+        Record(1, "Control", 3, "", attribute_value_7="old"),
+    ])
+    self.indexer.update_records([
+        Record(1, "Control", 3, "", attribute_value_7="new"),
+    ], diff=True)
+    self.assertEqual(self._properties(1), {"title": "title", "slug": "C-1",
+                                           "attribute_value_7": "new"})
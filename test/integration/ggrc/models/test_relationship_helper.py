@@ -0,0 +1,35 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: miha@reciprocitylabs.com
+# Maintained By: miha@reciprocitylabs.com
+
+"""Tests for grouped related id queries."""
+
+from ggrc.models.relationship_helper import RelationshipHelper
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestRelationshipHelper(TestCase):
+
+  def test_ids_related_to_each(self):
+    """Grouped related ids match related ids of every single object."""
+    controls = [factories.ControlFactory() for _ in range(3)]
+    contract = factories.ContractFactory()
+    factories.RelationshipFactory(source=controls[0], destination=contract)
+    factories.RelationshipFactory(source=contract, destination=controls[1])
+    control_ids = [control.id for control in controls]
+
+    related = RelationshipHelper.get_ids_related_to_each(
+        "Contract", "Control", control_ids)
+
+    self.assertEqual(set(related), set(control_ids))
+    for control_id in control_ids:
+      expected = RelationshipHelper.get_ids_related_to(
+          "Contract", "Control", [control_id])
+      self.assertEqual(related[control_id], {id_ for id_, in expected})
+
+  def test_type_mappings_are_not_grouped(self):
+    """Types with mappings outside of relationships are not grouped."""
+    self.assertIsNone(RelationshipHelper.get_ids_related_to_each(
+        "Audit", "Program", [1]))
@@ -0,0 +1,68 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test collection GET requests with __cursor paging."""
+
+from ggrc.models import Control
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.models import factories
+
+
+class TestCollectionCursor(TestCase):
+  """Test keyset paging of collections."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+    self.controls = [factories.ControlFactory(title="Control {}".format(i))
+                     for i in range(5)]
+
+  def _get_page(self, url):
+    response = self.api.tc.get(url)
+    self.assert200(response)
+    collection = response.json["controls_collection"]
+    return [c["id"] for c in collection["controls"]], collection["paging"]
+
+  def _get_all_pages(self, query):
+    ids, paging = self._get_page("/api/controls?" + query)
+    pages = [ids]
+    while "next" in paging:
+      ids, paging = self._get_page(paging["next"])
+      pages.append(ids)
+    return pages, paging
+
+  def test_pages_match_offset_paging(self):
+    """Cursor pages contain all objects in the collection order."""
+    response = self.api.get_query(Control, "__stubs_only=true")
+    expected = [c["id"] for c in
+                response.json["controls_collection"]["controls"]]
+    pages, _ = self._get_all_pages("__cursor=&__page_size=2")
+    self.assertEqual([len(page) for page in pages], [2, 2, 1])
+    self.assertEqual(sum(pages, []), expected)
+
+  def test_sorted_pages(self):
+    """Pages follow the requested sort order in both directions."""
+    pages, paging = self._get_all_pages(
+        "__cursor=&__page_size=2&__sort=title&__sort_desc=true")
+    expected = [c.id for c in sorted(self.controls, key=lambda c: c.title,
+                                     reverse=True)]
+    self.assertEqual(sum(pages, []), expected)
+
+    ids, _ = self._get_page(paging["prev"])
+    self.assertEqual(ids, pages[1])
+
+  def test_total(self):
+    """The total count is only returned on request."""
+    _, paging = self._get_page("/api/controls?__cursor=&__page_size=2")
+    self.assertNotIn("total", paging)
+    _, paging = self._get_page(
+        "/api/controls?__cursor=&__page_size=2&__total=true")
+    self.assertEqual(paging["total"], 5)
+
+  def test_invalid_cursor(self):
+    """Malformed cursors are rejected."""
+    response = self.api.tc.get("/api/controls?__cursor=abc")
+    self.assert400(response)
@@ -0,0 +1,50 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test conditional collection GET requests."""
+
+from ggrc.models import Control
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.generator import ObjectGenerator
+
+
+class TestCollectionEtag(TestCase):
+  """Test collection etags change only with the collection version."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+    self.object_generator = ObjectGenerator()
+    _, self.control = self.object_generator.generate_object(Control)
+
+  def _get(self, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return self.api.tc.get("/api/controls", headers=headers)
+
+  def test_not_modified(self):
+    """Unchanged collections are not modified."""
+    response = self._get()
+    self.assert200(response)
+    self.assertIn("Last-Modified", response.headers)
+    response = self._get(response.headers["Etag"])
+    self.assertStatus(response, 304)
+
+  def test_modified(self):
+    """Changed objects and new objects change the collection version."""
+    etag = self._get().headers["Etag"]
+    self.api.modify_object(self.control, {"title": "new title"})
+    response = self._get(etag)
+    self.assert200(response)
+    etag = response.headers["Etag"]
+    self.object_generator.generate_object(Control)
+    self.assert200(self._get(etag))
+
+  def test_query_args(self):
+    """Different queries have different versions."""
+    etag = self._get().headers["Etag"]
+    response = self.api.tc.get("/api/controls?id={}".format(self.control.id),
+                               headers={"If-None-Match": etag})
+    self.assert200(response)
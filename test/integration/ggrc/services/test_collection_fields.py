@@ -0,0 +1,43 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test collection GET requests with __fields."""
+
+from ggrc.models import Control
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.generator import ObjectGenerator
+
+
+class TestCollectionFields(TestCase):
+  """Test collections with only the requested fields."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+    self.object_generator = ObjectGenerator()
+    _, self.control = self.object_generator.generate_object(
+        Control, data={"title": "Field control"})
+
+  def _get_controls(self, fields):
+    response = self.api.get_query(Control, "__fields=" + fields)
+    self.assert200(response)
+    return response.json["controls_collection"]["controls"]
+
+  def test_column_fields(self):
+    """Column fields are returned without the other attributes."""
+    self.assertEqual(self._get_controls("id,title,type"), [{
+        "id": self.control.id,
+        "title": "Field control",
+        "type": "Control",
+    }])
+
+  def test_non_column_fields(self):
+    """Fields that are not columns are taken from the full resources."""
+    controls = self._get_controls("id,selfLink")
+    self.assertEqual(controls, [{
+        "id": self.control.id,
+        "selfLink": "/api/controls/{}".format(self.control.id),
+    }])
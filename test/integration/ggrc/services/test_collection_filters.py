@@ -0,0 +1,47 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test collection GET requests with attribute filters."""
+
+from ggrc.models import Control
+from ggrc.services.attribute_query import AttributeQueryBuilder
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.models import factories
+
+
+class TestCollectionFilters(TestCase):
+  """Test compiled attribute filters of collections."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+    self.controls = [factories.ControlFactory(title="Control {}".format(i))
+                     for i in range(3)]
+
+  def _get_ids(self, query):
+    response = self.api.get_query(Control, query)
+    self.assert200(response)
+    return {c["id"] for c in
+            response.json["controls_collection"]["controls"]}
+
+  def test_same_shape_different_values(self):
+    """Compiled parameter shapes are filled with the values of each request.
+    """
+    for control in self.controls:
+      self.assertEqual(
+          self._get_ids("title={}&__stubs_only=true".format(control.title)),
+          {control.id})
+    self.assertIn((Control, ("__stubs_only", "title")),
+                  AttributeQueryBuilder._signatures)
+
+  def test_in_and_unknown_parameters(self):
+    """Unknown parameters are ignored, also when their shape is cached."""
+    ids = ",".join(str(c.id) for c in self.controls[:2])
+    for _ in range(2):
+      self.assertEqual(self._get_ids("id__in={}&unknown=1".format(ids)),
+                       {c.id for c in self.controls[:2]})
+    self.assertIsNone(
+        AttributeQueryBuilder._paths[(Control, "unknown")])
@@ -0,0 +1,79 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test transactional batch collection POST requests."""
+
+from mock import patch
+
+from ggrc.models import Control
+from ggrc.models import Relationship
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.models import factories
+
+
+class TestCollectionPostBatch(TestCase):
+  """Test collection POST requests with the X-GGRC-Batch header."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+
+  def _post_batch(self, model, data):
+    return self.api.send_request(self.api.tc.post, model, data,
+                                 headers={"X-GGRC-Batch": "true"})
+
+  def test_create_controls(self):
+    """All items are created with a status for each of them."""
+    data = [{"control": {"title": "Batch {}".format(i), "context": None}}
+            for i in range(3)]
+    response = self._post_batch(Control, data)
+    self.assert200(response)
+    self.assertEqual([status for status, _ in response.json], [201] * 3)
+    self.assertEqual({c.title for c in Control.query},
+                     {"Batch 0", "Batch 1", "Batch 2"})
+
+  def test_failed_item(self):
+    """Nothing is created if any item fails."""
+    data = [
+        {"control": {"title": "Batch 0", "context": None}},
+        {"contract": {"title": "Batch 1", "context": None}},
+    ]
+    response = self._post_batch(Control, data)
+    self.assertEqual([status for status, _ in response.json], [424, 400])
+    self.assertEqual(Control.query.count(), 0)
+
+  def test_failed_write(self):
+    """Nothing is created if writing the batch fails after the flush."""
+    data = [{"control": {"title": "Batch {}".format(i), "context": None}}
+            for i in range(2)]
+    with patch("ggrc.services.common.log_event",
+               side_effect=Exception("Log failed")):
+      response = self._post_batch(Control, data)
+    self.assertEqual(response.json, [[500, "Log failed"]] * 2)
+    self.assertEqual(Control.query.count(), 0)
+
+  def test_existing_relationships(self):
+    """Existing and repeated mappings are not created twice."""
+    controls = [factories.ControlFactory() for _ in range(3)]
+    factories.RelationshipFactory(source=controls[0],
+                                  destination=controls[1])
+
+    def mapping(source, destination):
+      return {"relationship": {
+          "source": {"id": source.id, "type": "Control"},
+          "destination": {"id": destination.id, "type": "Control"},
+          "context": None,
+      }}
+    data = [
+        mapping(controls[1], controls[0]),
+        mapping(controls[0], controls[2]),
+        mapping(controls[0], controls[2]),
+    ]
+    response = self._post_batch(Relationship, data)
+    self.assert200(response)
+    self.assertEqual([status for status, _ in response.json],
+                     [200, 201, 200])
+    self.assertEqual(Relationship.query.count(), 2)
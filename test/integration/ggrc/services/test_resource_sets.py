@@ -0,0 +1,49 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Test materialized permission resource id sets."""
+
+from mock import patch
+
+from ggrc import db
+from ggrc import settings
+from ggrc.models import Control
+from ggrc.rbac import resource_query_filter
+from ggrc.rbac.resource_sets import resource_id_sets
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestResourceSets(TestCase):
+  """Test filters with large lists of resource ids."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.controls = [factories.ControlFactory() for _ in range(4)]
+    self.ids = [control.id for control in self.controls[:3]]
+
+  def _set_rows(self):
+    return db.session.query(resource_id_sets).count()
+
+  def _filtered_ids(self):
+    return {id_ for id_, in db.session.query(Control.id).filter(
+        resource_query_filter(Control.id, self.ids))}
+
+  def test_inline_ids(self):
+    """Short lists of ids are not materialized."""
+    self.assertEqual(self._filtered_ids(), set(self.ids))
+    self.assertEqual(self._set_rows(), 0)
+
+  def test_materialized_ids(self):
+    """Long lists of ids are inserted once per transaction."""
+    with patch.object(settings, "RESOURCE_ID_SET_THRESHOLD", 2):
+      self.assertEqual(self._filtered_ids(), set(self.ids))
+      self.assertEqual(self._filtered_ids(), set(self.ids))
+      self.assertEqual(self._set_rows(), 3)
+      db.session.commit()
+      self.assertEqual(self._set_rows(), 0)
+      self.assertEqual(self._filtered_ids(), set(self.ids))
+      db.session.rollback()
+      self.assertEqual(self._set_rows(), 0)
@@ -72,3 +72,57 @@ class TestResource(TestCase):
     entries = self.search("Control", relevant_objects=ids)
     self.assertEqual({entry["id"] for entry in entries},
                      {self.objects[2].id})
+
+  def test_search_tokens(self):
+    """Test search by fulltext words and short tokens."""
+    titles = ["Quarterly access review", "Access log export", "Tax"]
+    ids = [
+        self.object_generator.generate_object(
+            Control, data={"title": title})[1].id
+        for title in titles
+    ]
+    self.assertEqual({e["id"] for e in self.search("Control", q="access")},
+                     set(ids[:2]))
+    self.assertEqual({e["id"] for e in self.search("Control", q="acce revi")},
+                     {ids[0]})
+    self.assertEqual({e["id"] for e in self.search("Control", q="tax")},
+                     {ids[2]})
+
+  def test_search_paging(self):
+    """Test search pages with distinct objects."""
+    ids = {control.id for control in self.objects}
+    res, _ = self.api.search("Control", args={"__page_size": 2})
+    results = res.json["results"]
+    self.assertEqual(len(results["entries"]), 2)
+    self.assertTrue(results["paging"]["has_next"])
+    seen = {entry["id"] for entry in results["entries"]}
+    for page in (2, 3):
+      res, _ = self.api.search("Control", args={"__page": page,
+                                                "__page_size": 2})
+      seen.update(entry["id"] for entry in res.json["results"]["entries"])
+    self.assertEqual(seen, ids)
+    self.assertFalse(res.json["results"]["paging"]["has_next"])
+
+  def test_search_type_limit(self):
+    """Test grouped search with a limit per type."""
+    res = self.client.get(
+        "/search?q=&types=Control&group_by_type=true&__type_limit=3")
+    self.assertEqual(len(res.json["results"]["entries"]["Control"]), 3)
+
+  def test_search_paging_relevant(self):
+    """Test paging is applied to the relevant objects."""
+    relevant_objects = "Control:{}".format(self.objects[2].id)
+    res, _ = self.api.search("Control", relevant_objects=relevant_objects,
+                             args={"__page": 2, "__page_size": 2})
+    results = res.json["results"]
+    self.assertEqual(len(results["entries"]), 1)
+    self.assertFalse(results["paging"]["has_next"])
+
+  def test_search_relevant_grouped(self):
+    """Test grouped search with 'relevant to' filter."""
+    res = self.client.get(
+        "/search?q=&types=Control&group_by_type=true"
+        "&relevant_objects=Control:{}".format(self.objects[4].id))
+    self.assertEqual(
+        {e["id"] for e in res.json["results"]["entries"]["Control"]},
+        {self.objects[2].id})
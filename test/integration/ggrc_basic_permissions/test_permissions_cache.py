@@ -0,0 +1,87 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: dan@reciprocitylabs.com
+# Maintained By: dan@reciprocitylabs.com
+
+"""Tests for the permission cache dependency tracking."""
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.models.cache import Cache
+from ggrc_basic_permissions.models import ContextImplication
+from ggrc_basic_permissions.models import Role
+from ggrc_basic_permissions.models import UserRole
+from ggrc_basic_permissions.permissions_cache import \
+    get_users_with_stale_permissions
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestPermissionsCache(TestCase):
+  """Test which users get their cached permissions invalidated."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.person = factories.PersonFactory(email="person@example.com")
+    self.other = factories.PersonFactory(email="other@example.com")
+    self.context = factories.ContextFactory()
+    role = db.session.query(Role).filter(Role.name == "ProgramEditor").first()
+    user_role = UserRole(person=self.person, role=role, context=self.context)
+    db.session.add(user_role)
+    db.session.commit()
+
+  @staticmethod
+  def _modified(new=(), dirty=(), deleted=()):
+    cache = Cache()
+    cache.new = {obj: None for obj in new}
+    cache.dirty = {obj: None for obj in dirty}
+    cache.deleted = {obj: None for obj in deleted}
+    return cache
+
+  def test_user_role(self):
+    """Only the user of a changed user role is affected."""
+    user_role = UserRole(person_id=self.other.id, role_id=1)
+    self.assertEqual(
+        get_users_with_stale_permissions(self._modified(new=[user_role])),
+        {self.other.id})
+
+  def test_unrelated_object(self):
+    """Objects that do not grant permissions don't affect any user."""
+    control = factories.ControlFactory()
+    self.assertEqual(
+        get_users_with_stale_permissions(self._modified(dirty=[control])),
+        set())
+
+  def test_program_mapping(self):
+    """Users with roles in a program are affected by its mappings."""
+    program = factories.ProgramFactory(context=self.context)
+    control = factories.ControlFactory()
+    relationship = all_models.Relationship(source=program, destination=control)
+    self.assertEqual(
+        get_users_with_stale_permissions(self._modified(new=[relationship])),
+        {self.person.id})
+
+  def test_public_context_implication(self):
+    """Implications from the default context affect all users."""
+    implication = ContextImplication(
+        source_context_id=None, context_id=self.context.id)
+    self.assertIsNone(
+        get_users_with_stale_permissions(self._modified(new=[implication])))
+
+  def test_assignee_attr(self):
+    """Assignee attrs affect the person and the other assignees."""
+    control = factories.ControlFactory()
+    relationship = factories.RelationshipFactory(source=control,
+                                                 destination=self.other)
+    assigned = factories.RelationshipFactory(source=self.person,
+                                             destination=control)
+    db.session.add(all_models.RelationshipAttr(
+        relationship_id=assigned.id, attr_name="AssigneeType",
+        attr_value="Verifier"))
+    db.session.commit()
+    attr = all_models.RelationshipAttr(
+        relationship_id=relationship.id, attr_name="AssigneeType",
+        attr_value="Assignee")
+    self.assertEqual(
+        get_users_with_stale_permissions(self._modified(new=[attr])),
+        {self.person.id, self.other.id})
@@ -0,0 +1,97 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Tests for the process local object representation cache tier."""
+
+import unittest
+
+import mock
+
+from ggrc.cache import representation_cache
+from ggrc.cache.representation_cache import RepresentationCache
+
+
+class FakeMemcacheClient(object):
+  """Dict based stand in for the memcache client methods in use."""
+
+  def __init__(self):
+    self.values = {}
+
+  def get(self, key):
+    return self.values.get(key)
+
+  def get_multi(self, keys):
+    return {key: self.values[key] for key in keys if key in self.values}
+
+  def add(self, key, value):
+    self.values.setdefault(key, value)
+
+  def set(self, key, value, time=0):
+    self.values[key] = value
+
+  def incr(self, key, delta=1, initial_value=None):
+    if key not in self.values:
+      if initial_value is None:
+        return None
+      self.values[key] = initial_value
+    self.values[key] += delta
+    return self.values[key]
+
+  def offset_multi(self, mapping, initial_value=0):
+    for key, delta in mapping.items():
+      self.incr(key, delta, initial_value)
+
+
+class TestRepresentationCache(unittest.TestCase):
+
+  def setUp(self):
+    self.memcache = FakeMemcacheClient()
+    self.cache = RepresentationCache(2, 60)
+
+  def _add(self, cache, mapping):
+    cache.set_multi(mapping, cache.sync(self.memcache))
+
+  def test_lru(self):
+    """Entries are copies and the least recently used ones are evicted."""
+    self._add(self.cache, {"a": {"id": 1}, "b": {"id": 2}})
+    entry = self.cache.get_multi(["a"])["a"]
+    entry["id"] = 3
+    self._add(self.cache, {"c": {"id": 4}})
+    self.assertEqual(self.cache.get_multi(["a", "b", "c"]),
+                     {"a": {"id": 1}, "c": {"id": 4}})
+
+  def test_ttl(self):
+    """Expired entries are not returned."""
+    with mock.patch("time.time", return_value=1000):
+      self._add(self.cache, {"a": 1})
+    with mock.patch("time.time", return_value=1061):
+      self.assertEqual(self.cache.get_multi(["a"]), {})
+
+  def test_invalidation(self):
+    """Invalidated keys are removed from the caches of all processes."""
+    other = RepresentationCache(2, 60)
+    self._add(self.cache, {"a": 1, "b": 2})
+    self._add(other, {"a": 1, "b": 2})
+    other.invalidate(self.memcache, ["a"])
+    self.assertEqual(other.get_multi(["a", "b"]), {"b": 2})
+    self.assertEqual(self.cache.get_multi(["a", "b"]), {"a": 1, "b": 2})
+    generation = self.cache.sync(self.memcache)
+    self.assertEqual(self.cache.get_multi(["a", "b"]), {"b": 2})
+
+    # Representations read before the invalidation are not stored
+    self.cache.set_multi({"a": 1}, generation - 1)
+    self.assertEqual(self.cache.get_multi(["a"]), {})
+
+  def test_missing_invalidations(self):
+    """The cache is flushed if the invalidated keys are not known."""
+    self._add(self.cache, {"a": 1, "b": 2})
+    self.memcache.values.clear()
+    self.cache.invalidate(self.memcache, ["c"])
+    self.memcache.values.pop(representation_cache.INVALIDATED_KEY.format(
+        self.memcache.get(representation_cache.GENERATION_KEY)))
+    self.cache.sync(self.memcache)
+    self.assertEqual(self.cache.get_multi(["a", "b"]), {})
+    self.assertEqual(representation_cache.get_stats(self.memcache)["flushes"],
+                     1)
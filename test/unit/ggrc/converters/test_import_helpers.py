@@ -153,3 +153,24 @@ class TestCulumnOrder(unittest.TestCase):
       random.shuffle(attr_list)
       column_order = import_helper.get_column_order(attr_list)
       self.assertEqual(original_list, column_order)
+
+
+class TestGenerateCsvStream(unittest.TestCase):
+  """Class for testing the streamed csv generation
+  """
+
+  def test_stream_matches_csv_string(self):
+    """Test that streamed chunks form the same file as generate_csv_string
+    """
+    rows = [
+        [u"Object type", u"Code", u"Title"],
+        [u"Control", u"code"],
+        [u"", u"CONTROL-1", u"T\xeftle, with comma"],
+        [u""],
+        [u""],
+    ]
+    chunks = list(import_helper.generate_csv_stream(
+        iter(rows), width=3, lines_per_chunk=2))
+    self.assertEqual(len(chunks), 3)
+    csv_string = import_helper.generate_csv_string(copy.deepcopy(rows))
+    self.assertEqual("".join(chunks), csv_string)
@@ -60,3 +60,30 @@ class TestQueryHelper(unittest.TestCase):
 
     for expected_result, expression in expressions:
       self.assertEqual(expected_result, helper.expression_keys(expression))
+
+  def test_plan_cache(self):
+    """Expressions of the same shape share a compiled plan."""
+    expression = {
+        "left": {"left": "title", "op": {"name": "~"}, "right": "a"},
+        "op": {"name": "AND"},
+        "right": {"object_name": "Program", "op": {"name": "relevant"},
+                  "ids": [1]},
+    }
+    same_shape = {
+        "right": {"ids": [2, 3], "op": {"name": "relevant"},
+                  "object_name": "Program"},
+        "op": {"name": "AND"},
+        "left": {"right": "b", "op": {"name": "~"}, "left": "title"},
+    }
+    other_shape = {"left": "title", "op": {"name": "="}, "right": "a"}
+    plan, values = query_helper.get_plan(expression)
+    self.assertEqual(values, ["a", "Program", [1]])
+    same_plan, same_values = query_helper.get_plan(same_shape)
+    self.assertIs(plan, same_plan)
+    self.assertEqual(same_values, ["b", "Program", [2, 3]])
+    self.assertIsNot(plan, query_helper.get_plan(other_shape)[0])
+
+  def test_unknown_operator(self):
+    """Unknown operators are rejected when the plan is compiled."""
+    with self.assertRaises(query_helper.BadQueryException):
+      query_helper.get_plan({"left": "a", "op": {"name": "?"}, "right": 1})
@@ -0,0 +1,61 @@
+# Copyright (C) 2016 Google Inc., authors, and contributors <see AUTHORS file>
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+# Created By: david@reciprocitylabs.com
+# Maintained By: david@reciprocitylabs.com
+
+"""Tests for the compiled permission structure."""
+
+import unittest
+
+from ggrc.rbac.permissions_provider import CompiledPermissions
+from ggrc.rbac.permissions_provider import DefaultUserPermissions
+
+
+ADMIN = DefaultUserPermissions.ADMIN_PERMISSION
+
+
+class TestCompiledPermissions(unittest.TestCase):
+
+  def setUp(self):
+    self.permissions = CompiledPermissions({
+        "read": {
+            "Control": {"contexts": [3, 4], "resources": [10, 11]},
+            "Help": {"contexts": [None]},
+            "__GGRC_ALL__": {"contexts": [7]},
+        },
+        "update": {
+            "Control": {"resources": [10]},
+        },
+        "__GGRC_ADMIN__": {
+            "__GGRC_ALL__": {"contexts": [5]},
+        },
+    }, ADMIN)
+
+  def test_match(self):
+    """Resources, contexts and per action admin contexts are matched."""
+    self.assertTrue(self.permissions.match("read", "Control", 10, 1))
+    self.assertTrue(self.permissions.match("read", "Control", 1, 3))
+    self.assertTrue(self.permissions.match("read", "Control", 1, 7))
+    self.assertTrue(self.permissions.match("read", "Help", 1, 1))
+    self.assertFalse(self.permissions.match("read", "Control", 1, 1))
+    self.assertFalse(self.permissions.match("update", "Control", 11, 3))
+
+  def test_admin(self):
+    """Admin contexts are not global admin permissions."""
+    self.assertFalse(self.permissions.is_admin)
+    self.assertTrue(self.permissions.is_admin_in(5))
+    self.assertFalse(self.permissions.is_admin_in(3))
+    global_admin = CompiledPermissions({
+        "__GGRC_ADMIN__": {"__GGRC_ALL__": {"contexts": [0]}},
+    }, ADMIN)
+    self.assertTrue(global_admin.is_admin)
+
+  def test_contexts_and_resources_for(self):
+    """Contexts include admin contexts and resources are merged."""
+    self.assertEqual(
+        self.permissions.contexts_for("read", ["Control"]),
+        frozenset([3, 4, 5]))
+    self.assertIsNone(self.permissions.contexts_for("read", ["Help"]))
+    self.assertEqual(
+        self.permissions.resources_for("read", ["Control", "Help"]),
+        frozenset([10, 11]))